@@ -0,0 +1,303 @@
+# pipeline_latency.py
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from ..audio_io import load_audio
+from ..sequence_layers import ARCHITECTURES
+
+# Stage-by-stage latency of the feature extraction and inference pipelines on
+# deterministic synthetic fixtures (written to a temporary directory, nothing is
+# downloaded):
+#   feature_extraction   feature_extraction.extract_features: load, pitch, framing,
+#                        frame features, aggregation, and the whole call
+#   stutter_classifier   stutter_classifier.extract_features: load, STFT, every feature
+#                        group, aggregation, scaling, inference, and the end-to-end clip
+#   text                 text vectorization and intent model inference
+# Clip stages run for every clip length, inference stages for every batch size. Every
+# stage reports mean/p50/p95/p99 latency and throughput; --json stores the results and
+# --baseline compares them with a previous run's file. Models are untrained stand-ins
+# built with the chosen architecture unless --model is given.
+PIPELINES = ('feature_extraction', 'stutter_classifier', 'text')
+
+# Collects the durations of named stages over repeated runs
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    # Function to call fn(*args), record its duration under name and return its result
+    def run(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples[name].append(time.perf_counter() - start)
+        return result
+
+# Function to summarize the durations of a stage; items is the number of clips or samples
+# processed per call and audio_seconds the audio length per call (clip stages)
+def summarize(durations, items=1, audio_seconds=None):
+    durations = np.asarray(durations)
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1000
+    summary = {
+        'repeat': len(durations),
+        'mean_ms': float(np.mean(durations) * 1000),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'items_per_second': float(items / np.median(durations)),
+    }
+    if audio_seconds is not None:
+        summary['realtime_factor'] = float(audio_seconds / np.median(durations))
+    return summary
+
+# Function to synthesize a deterministic speech-like signal: a voiced source with a
+# gliding pitch and harmonics, shaped into ~4 Hz syllables with pauses, plus noise
+def synthetic_speech(seconds, sample_rate=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.7 * t) + 10 * np.sin(2 * np.pi * 5.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 11))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, 2 * np.pi)), 0, None)
+    pauses = np.repeat(rng.random(int(np.ceil(seconds * 2))) > 0.2, sample_rate // 2)[:len(t)]
+    y = voiced * syllables * pauses + 0.01 * rng.standard_normal(len(t))
+    return (0.3 * y / np.max(np.abs(y))).astype(np.float32)
+
+# Function to write synthetic speech clips of the given lengths as WAV files
+def write_audio_fixtures(directory, durations, sample_rate=16000, seed=0):
+    import soundfile
+
+    paths = {}
+    for i, seconds in enumerate(durations):
+        path = os.path.join(directory, f"speech_{seconds:g}s.wav")
+        soundfile.write(path, synthetic_speech(seconds, sample_rate, seed=seed + i), sample_rate, subtype='PCM_16')
+        paths[seconds] = path
+    return paths
+
+# Function to generate deterministic utterances from the intent example vocabulary
+def synthetic_texts(num_texts, seed=0, min_words=3, max_words=20):
+    from ..nlp.intent_classification import EXAMPLE_TEXTS
+
+    rng = np.random.default_rng(seed)
+    words = sorted({word for text in EXAMPLE_TEXTS for word in text.split()})
+    lengths = rng.integers(min_words, max_words + 1, size=num_texts)
+    return [' '.join(rng.choice(words, size=length)) for length in lengths]
+
+# Function to time feature_extraction.extract_features and its stages on one clip
+def bench_feature_extraction(path, seconds, repeat, pitch_method='pyin', sample_rate=16000,
+                             frame_size=0.025, frame_stride=0.01):
+    import librosa
+    from ..stuttering_detection.feature_extraction import extract_features, extract_frame_features, track_pitch
+    from ..stuttering_detection.running_stats import RunningFeatureStats
+
+    frame_length = int(round(frame_size * sample_rate))
+    frame_step = int(round(frame_stride * sample_rate))
+
+    # Frames of a pre-emphasized, Hamming-windowed signal (as in extract_features)
+    def framing(y):
+        y = np.append(y[0], y[1:] - 0.97 * y[:-1])
+        return librosa.util.frame(y, frame_length=frame_length, hop_length=frame_step).T * np.hamming(frame_length)
+
+    def aggregate(frame_features):
+        stats = RunningFeatureStats(percentiles=(25, 75))
+        stats.update(frame_features)
+        return stats.result()
+
+    timer = StageTimer()
+    for i in range(repeat + 1):
+        y, sr = timer.run('load', load_audio, path, sr=sample_rate)
+        num_frames = 1 + (len(y) - frame_length) // frame_step
+        f0 = None
+        if pitch_method != 'frame':
+            f0 = timer.run('pitch', track_pitch, y, sample_rate, frame_length, frame_step, num_frames,
+                           method=pitch_method)
+        frames = timer.run('framing', framing, y)
+        frame_features = timer.run('frame_features', extract_frame_features, frames, sample_rate, f0=f0)
+        timer.run('aggregate', aggregate, frame_features)
+        timer.run('extract_features', extract_features, path, sample_rate=sample_rate,
+                  frame_size=frame_size, frame_stride=frame_stride, pitch_method=pitch_method)
+        if i == 0:
+            timer.samples.clear()  # Warm-up run (librosa/numba caches, filterbanks)
+
+    return [dict(pipeline='feature_extraction', stage=stage, clip_seconds=seconds, batch_size=1,
+                 **summarize(durations, audio_seconds=seconds))
+            for stage, durations in timer.samples.items()]
+
+# Function to build the classifier inference function: a trained model through
+# StutterInferencePipeline, or an untrained stand-in over the clip vector (as a
+# one-step sequence, since the builder's encoder needs a sequence input)
+def _stutter_predictor(num_features, model_path=None, architecture='conv'):
+    if model_path is not None:
+        from ..stuttering_detection.stutter_classifier import StutterInferencePipeline
+        pipeline = StutterInferencePipeline(model_path, scaler_path=None)
+        pipeline.model  # Load the model outside the timed runs
+        return pipeline.predict_proba
+
+    from ..stuttering_detection.stutter_classifier import create_stutter_classifier
+    model = create_stutter_classifier(input_shape=(1, num_features), architecture=architecture)
+    return lambda X: np.asarray(model.predict_on_batch(X[:, np.newaxis]))
+
+# Function to time stutter_classifier.extract_features stage by stage, scaling and
+# inference on one clip, and the whole clip end to end
+def bench_stutter_clip(path, seconds, repeat, predict, transform):
+    import librosa
+    from ..stuttering_detection.spectral_context import SpectralContext
+    from ..stuttering_detection.stutter_classifier import extract_features
+    from ..stuttering_detection.stutter_features import aggregate_features
+
+    def end_to_end():
+        return predict(transform(extract_features(path)))
+
+    timer = StageTimer()
+    for i in range(repeat + 1):
+        y, sr = timer.run('load', load_audio, path, sr=16000)
+        context = SpectralContext(y, sr=sr)
+        timer.run('stft', lambda: context.power)
+        # Feature groups in dependency order: mfcc reuses mel, tonnetz runs its own CQT
+        mel = timer.run('mel', lambda: context.mel)
+        mfcc = timer.run('mfcc', context.mfcc, n_mfcc=13)
+        chroma = timer.run('chroma', lambda: context.chroma)
+        contrast = timer.run('contrast', context.spectral_contrast)
+        tonnetz = timer.run('tonnetz', context.tonnetz)
+        zcr = timer.run('zcr', context.zero_crossing_rate)
+        frames = np.concatenate((mfcc, chroma, mel, contrast, tonnetz, zcr))
+        features = timer.run('aggregate', lambda: aggregate_features(np.mean(frames, axis=1), np.std(frames, axis=1)))
+        X = timer.run('scaling', transform, features)
+        timer.run('inference', predict, X)
+        timer.run('end_to_end', end_to_end)
+        if i == 0:
+            timer.samples.clear()
+
+    return [dict(pipeline='stutter_classifier', stage=stage, clip_seconds=seconds, batch_size=1,
+                 **summarize(durations, audio_seconds=seconds))
+            for stage, durations in timer.samples.items()]
+
+# Function to time scaling and inference of the stutter classifier on batches of clip vectors
+def bench_stutter_batches(batch_sizes, repeat, predict, transform, num_features, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for batch_size in batch_sizes:
+        features = rng.standard_normal((batch_size, num_features)).astype(np.float32)
+        timer = StageTimer()
+        for i in range(repeat + 1):
+            X = timer.run('scaling', transform, features)
+            timer.run('inference', predict, X)
+            if i == 0:
+                timer.samples.clear()
+        results += [dict(pipeline='stutter_classifier', stage=stage, clip_seconds=None, batch_size=batch_size,
+                         **summarize(durations, items=batch_size))
+                    for stage, durations in timer.samples.items()]
+    return results
+
+# Function to time text vectorization and intent model inference on batches of utterances
+def bench_text(batch_sizes, repeat, architecture='conv', seed=0):
+    from ..nlp.intent_classification import create_intent_classifier
+    from ..nlp.text_preprocessing import TextVectorizer
+
+    vectorizer = TextVectorizer(cache_size=0).fit(synthetic_texts(1000, seed=seed))
+    model = create_intent_classifier(vectorizer.vocab_size, 128, None, 6, architecture=architecture)
+    results = []
+    for batch_size in batch_sizes:
+        texts = synthetic_texts(batch_size, seed=seed + batch_size)
+        timer = StageTimer()
+        for i in range(repeat + 1):
+            X = timer.run('vectorize', vectorizer.transform, texts)
+            timer.run('inference', model.predict_on_batch, X)
+            if i == 0:
+                timer.samples.clear()
+        results += [dict(pipeline='text', stage=stage, clip_seconds=None, batch_size=batch_size,
+                         **summarize(durations, items=batch_size))
+                    for stage, durations in timer.samples.items()]
+    return results
+
+# Function to describe the machine and library versions a run was measured on
+def environment():
+    import librosa
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+    }
+
+# Function to print the p50 change of every stage against a previous results file
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['pipeline'], r['stage'], r['clip_seconds'], r['batch_size']): r
+                    for r in json.load(f)['results']}
+    for result in results:
+        previous = baseline.get((result['pipeline'], result['stage'], result['clip_seconds'], result['batch_size']))
+        if previous is not None:
+            change = result['p50_ms'] / previous['p50_ms'] - 1
+            print(f"{_label(result):55s} p50 {previous['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} ms  ({change:+.1%})")
+
+def _label(result):
+    size = f"{result['clip_seconds']:g} s clip" if result['clip_seconds'] is not None else f"batch {result['batch_size']}"
+    return f"{result['pipeline']}/{result['stage']} ({size})"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feature extraction and inference stage by stage")
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument('--durations', nargs='+', type=float, default=[1, 3, 10], help="clip lengths in seconds")
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=10, help="timed runs per stage (after one warm-up run)")
+    parser.add_argument('--sample-rate', type=int, default=16000,
+                        help="sample rate of the fixture files (other rates include resampling in 'load')")
+    parser.add_argument('--pitch-method', choices=('pyin', 'autocorr', 'frame'), default='pyin')
+    parser.add_argument('--model', help="trained stutter classifier (default: an untrained stand-in)")
+    parser.add_argument('--scaler', help="scaler .npz saved by fit_scaler (default: a synthetic one)")
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='conv', help="architecture of the stand-in models")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        paths = write_audio_fixtures(fixture_dir, args.durations, sample_rate=args.sample_rate, seed=args.seed)
+
+        if 'feature_extraction' in args.pipelines:
+            for seconds, path in paths.items():
+                results += bench_feature_extraction(path, seconds, args.repeat, pitch_method=args.pitch_method)
+
+        if 'stutter_classifier' in args.pipelines:
+            from ..stuttering_detection.stutter_classifier import StutterInferencePipeline, fit_scaler
+            from ..stuttering_detection.stutter_features import NUM_FRAME_FEATURES
+
+            num_features = 2 * NUM_FRAME_FEATURES
+            scaler_path = args.scaler
+            if scaler_path is None:
+                scaler_path = os.path.join(fixture_dir, 'scaler.npz')
+                fit_scaler(np.random.default_rng(args.seed).standard_normal((100, num_features)), scaler_path)
+            transform = StutterInferencePipeline(args.model or '', scaler_path).transform
+            predict = _stutter_predictor(num_features, args.model, architecture=args.architecture)
+
+            for seconds, path in paths.items():
+                results += bench_stutter_clip(path, seconds, args.repeat, predict, transform)
+            results += bench_stutter_batches(args.batch_sizes, args.repeat, predict, transform, num_features, seed=args.seed)
+
+        if 'text' in args.pipelines:
+            results += bench_text(args.batch_sizes, args.repeat, architecture=args.architecture, seed=args.seed)
+
+    for result in results:
+        throughput = (f"{result['realtime_factor']:8.1f}x realtime" if 'realtime_factor' in result
+                      else f"{result['items_per_second']:8.1f} items/s")
+        print(f"{_label(result):55s} p50 {result['p50_ms']:9.2f}  p95 {result['p95_ms']:9.2f}  "
+              f"p99 {result['p99_ms']:9.2f} ms  {throughput}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'config': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
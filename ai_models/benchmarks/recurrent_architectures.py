@@ -0,0 +1,116 @@
+# recurrent_architectures.py
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ..sequence_layers import ARCHITECTURES
+
+# Compares the sequence encoder architectures of every model builder: training step time
+# and single-request inference latency on random inputs, and (with --accuracy) validation
+# accuracy of the sentiment analyzer on a synthetic task that depends on token order.
+
+# Function to build every model with an architecture, paired with a random input batch
+def _models(architecture, batch_size, rng):
+    from ..nlp.intent_classification import create_intent_classifier
+    from ..nlp.sentiment_analysis import create_sentiment_analyzer
+    from ..speech_recognition.acoustic_model import create_acoustic_model
+    from ..speech_recognition.language_model import create_language_model
+    from ..stuttering_detection.stutter_classifier import create_stutter_classifier
+
+    tokens = rng.integers(1, 5000, size=(batch_size, 100))
+    return [
+        ('intent_classifier', create_intent_classifier(5000, 128, 100, 6, architecture=architecture), tokens),
+        ('sentiment_analyzer', create_sentiment_analyzer(5000, 128, 100, architecture=architecture), tokens),
+        ('language_model', create_language_model(5000, 128, 100, architecture=architecture), tokens),
+        ('acoustic_model', create_acoustic_model(architecture=architecture),
+         rng.standard_normal((batch_size, 128, 128, 1), dtype=np.float32)),
+        # The classifier's encoder needs a sequence: 94 frames (3 s) of per-frame features
+        ('stutter_classifier', create_stutter_classifier(input_shape=(94, 167), architecture=architecture),
+         rng.standard_normal((batch_size, 94, 167), dtype=np.float32)),
+    ]
+
+# Function to time training steps and batch-of-one predictions of a model
+def time_model(model, x, steps=10, warmup=2):
+    rng = np.random.default_rng(0)
+    y = rng.random((len(x),) + tuple(model.output_shape[1:]), dtype=np.float32)
+    model.compile(optimizer='adam', loss='mse')
+
+    for _ in range(warmup):
+        model.train_on_batch(x, y)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.train_on_batch(x, y)
+    step_seconds = (time.perf_counter() - start) / steps
+
+    for _ in range(warmup):
+        model.predict_on_batch(x[:1])
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.predict_on_batch(x[:1])
+    latency_seconds = (time.perf_counter() - start) / steps
+    return step_seconds, latency_seconds
+
+# Function to generate the synthetic sentiment task: class 1 or 2 when marker token 1 or 2
+# comes first in the sequence (both markers are present), class 0 without markers
+def synthetic_sentiment_data(num_samples, max_length=100, vocab_size=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(3, vocab_size, size=(num_samples, max_length))
+    y = rng.integers(0, 3, size=num_samples)
+    for i in np.flatnonzero(y):
+        first, second = np.sort(rng.choice(max_length, size=2, replace=False))
+        X[i, first], X[i, second] = (1, 2) if y[i] == 1 else (2, 1)
+    return X, y
+
+# Function to train the sentiment analyzer on the synthetic task and return its
+# validation accuracy and training time
+def sentiment_accuracy(architecture, epochs=5, num_samples=4000, batch_size=32):
+    import tensorflow as tf
+    from ..nlp.sentiment_analysis import create_sentiment_analyzer
+
+    tf.keras.utils.set_random_seed(0)
+    X, y = synthetic_sentiment_data(num_samples)
+    split = num_samples * 4 // 5
+    model = create_sentiment_analyzer(5000, 128, 100, architecture=architecture)
+    model.compile(loss='sparse_categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+
+    start = time.perf_counter()
+    history = model.fit(X[:split], y[:split], batch_size=batch_size, epochs=epochs,
+                        validation_data=(X[split:], y[split:]), verbose=0)
+    return max(history.history['val_accuracy']), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sequence encoder architectures of the model builders")
+    parser.add_argument('--architectures', nargs='+', choices=ARCHITECTURES, default=list(ARCHITECTURES))
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--accuracy', action='store_true', help="also train the sentiment analyzer on a synthetic task")
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for architecture in args.architectures:
+        rng = np.random.default_rng(0)
+        for name, model, x in _models(architecture, args.batch_size, rng):
+            step_seconds, latency_seconds = time_model(model, x, steps=args.steps)
+            results.append({'model': name, 'architecture': architecture,
+                            'train_step_ms': step_seconds * 1000, 'predict_latency_ms': latency_seconds * 1000})
+            print(f"{name:20s} {architecture:10s} train step {step_seconds * 1000:9.1f} ms   "
+                  f"predict (batch of 1) {latency_seconds * 1000:8.1f} ms")
+
+        if args.accuracy:
+            accuracy, seconds = sentiment_accuracy(architecture, epochs=args.epochs, batch_size=args.batch_size)
+            results.append({'model': 'sentiment_analyzer', 'architecture': architecture,
+                            'synthetic_val_accuracy': accuracy, 'train_seconds': seconds})
+            print(f"{'sentiment_analyzer':20s} {architecture:10s} synthetic val accuracy {accuracy:.3f} "
+                  f"({seconds:.1f} s for {args.epochs} epochs)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# startup_time.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules a worker imports before it can serve anything
+MODULES = [
+    'ai_models.nlp.intent_classification',
+    'ai_models.nlp.sentiment_analysis',
+    'ai_models.speech_recognition.acoustic_model',
+    'ai_models.speech_recognition.language_model',
+    'ai_models.stuttering_detection.feature_extraction',
+    'ai_models.stuttering_detection.stutter_classifier',
+    'ai_models.stuttering_detection.streaming',
+    'ai_models.stuttering_detection.inference_server',
+]
+
+# Heavy frameworks that should only be loaded by the code paths that need them
+HEAVY_MODULES = ['tensorflow', 'keras', 'sklearn', 'pandas', 'pywt', 'scipy.stats',
+                 'python_speech_features', 'librosa.core']
+
+# Each measurement runs in a fresh interpreter, so nothing is already in sys.modules
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# Function to measure the import time of a module in repeat fresh interpreters.
+# Returns the median and best time and the heavy modules the import pulled in.
+def measure_import(module, repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=root, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['seconds'])
+    return {
+        'module': module,
+        'median_seconds': statistics.median(times),
+        'best_seconds': min(times),
+        'heavy_modules_loaded': result['loaded'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import cost of the ai_models modules")
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = measure_import(module, repeat=args.repeat)
+        results.append(result)
+        loaded = ', '.join(result['heavy_modules_loaded']) or '-'
+        print(f"{module:55s} {result['median_seconds'] * 1000:8.1f} ms  (best {result['best_seconds'] * 1000:.1f} ms)  heavy: {loaded}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
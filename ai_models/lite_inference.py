@@ -0,0 +1,88 @@
+# lite_inference.py
+
+import threading
+
+import numpy as np
+
+# Lightweight inference from the TFLite artifacts written by model_export. The
+# interpreter comes from ai_edge_litert or tflite_runtime when one of them is installed,
+# so serving does not need TensorFlow; full TensorFlow is only the fallback.
+
+# Function to import the lightest available TFLite interpreter class
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+# Classifier backed by a TFLite model, a drop-in for a Keras model's predict_on_batch.
+# Models are exported with a fixed batch size (see model_export); larger inputs are run
+# in chunks of batch_size rows, the last one zero-padded. Other dimensions that are
+# dynamic in the model's shape signature (the sequence length of the text models) are
+# None in input_shape, like a Keras model's; the input tensor is resized to every new
+# length it is called with. Inputs are cast to the model's input type; quantized
+# (int8/uint8) inputs and outputs are converted with the tensor's scale and zero point.
+# The interpreter is not thread-safe, so calls are serialized.
+class LiteClassifier:
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self._interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self.batch_size = int(self._input['shape'][0])
+        signature = self._input.get('shape_signature', self._input['shape'])
+        self.input_shape = (self.batch_size,) + tuple(None if size < 0 else int(size) for size in signature[1:])
+        self._lock = threading.Lock()
+
+    # Function to resize the input tensor to shape when its dynamic dimensions change
+    def _resize(self, shape):
+        if shape == tuple(self._input['shape']):
+            return
+        if len(shape) != len(self.input_shape) or any(
+                size is not None and size != actual for size, actual in zip(self.input_shape[1:], shape[1:])):
+            raise ValueError(f"expected inputs of shape {self.input_shape}, got {shape}")
+        self._interpreter.resize_tensor_input(self._input['index'], shape)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+
+    def predict_on_batch(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(X), self.batch_size):
+                chunk = X[start:start + self.batch_size]
+                num_rows = len(chunk)
+                if num_rows < self.batch_size:
+                    padding = np.zeros((self.batch_size - num_rows,) + chunk.shape[1:], dtype=chunk.dtype)
+                    chunk = np.concatenate((chunk, padding))
+                self._resize(chunk.shape)
+                self._interpreter.set_tensor(self._input['index'], _quantize(chunk, self._input))
+                self._interpreter.invoke()
+                output = self._interpreter.get_tensor(self._output['index'])
+                outputs.append(_dequantize(output, self._output)[:num_rows])
+        return np.concatenate(outputs)
+
+    predict = predict_on_batch
+
+# Function to convert float values to a tensor's type (quantized tensors have a scale)
+def _quantize(values, details):
+    dtype = details['dtype']
+    scale, zero_point = details['quantization']
+    if scale == 0:
+        return values.astype(dtype, copy=False)
+    info = np.iinfo(dtype)
+    return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(dtype)
+
+# Function to convert a quantized tensor's values back to float32
+def _dequantize(values, details):
+    scale, zero_point = details['quantization']
+    if scale == 0:
+        return values.astype(np.float32, copy=False)
+    return ((values.astype(np.float32) - zero_point) * scale).astype(np.float32)
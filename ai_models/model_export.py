@@ -0,0 +1,150 @@
+# model_export.py
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .lite_inference import LiteClassifier
+
+# Export of the Keras classifiers (.h5) to TFLite. quantization:
+#   'none'     float32 weights and activations
+#   'dynamic'  int8 weights, float activations (no calibration data needed)
+#   'float16'  float16 weights
+#   'int8'     int8 weights and activations, calibrated on representative_data;
+#              the model keeps float inputs and outputs. The attention score matmuls
+#              (INT8_FLOAT_OPS) stay float: their range is too wide for int8 and the
+#              softmax saturates. Not available for the recurrent encoders (the
+#              converter cannot calibrate their while loops).
+# Models are exported with a fixed batch size: the LSTM builders only lower to builtin
+# TFLite ops (no Flex delegate, so no TensorFlow at runtime) when every tensor shape is
+# static. LiteClassifier runs larger inputs in chunks. Models that start with an
+# Embedding take int32 token ids, so the ids are never quantized; the sequence length of
+# the text models stays dynamic and LiteClassifier resizes the input to each length.
+QUANTIZATIONS = ('none', 'dynamic', 'float16', 'int8')
+INT8_FLOAT_OPS = ['BATCH_MATMUL']
+
+# Function to convert a Keras model file to a TFLite model file
+def export_tflite(model_path, output_path, quantization='dynamic', batch_size=1,
+                  representative_data=None, calibration_samples=200):
+    import tensorflow as tf
+    from tensorflow.keras.layers import RNN, Bidirectional, Embedding
+    from tensorflow.keras.models import load_model
+
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+    if quantization == 'int8' and representative_data is None:
+        raise ValueError("int8 quantization needs representative_data for calibration")
+
+    model = load_model(model_path, compile=False)
+    if quantization == 'int8' and any(isinstance(layer, (RNN, Bidirectional)) for layer in model.layers):
+        raise ValueError("int8 quantization is not supported for recurrent models, use 'dynamic'")
+    input_dtype = tf.int32 if any(isinstance(layer, Embedding) for layer in model.layers) else tf.float32
+    input_spec = tf.TensorSpec((batch_size,) + tuple(model.input_shape[1:]), input_dtype)
+
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        model.export(saved_model_dir, format='tf_saved_model', input_signature=[input_spec], verbose=False)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization != 'none':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        if quantization == 'int8':
+            samples = np.asarray(representative_data, dtype=input_dtype.as_numpy_dtype)[:calibration_samples]
+            batches = lambda: (
+                [samples[start:start + batch_size]]
+                for start in range(0, len(samples) - batch_size + 1, batch_size)
+            )
+            converter.representative_dataset = batches
+            # Selective quantization: the listed ops keep float kernels
+            debugger = tf.lite.experimental.QuantizationDebugger(
+                converter=converter, debug_dataset=batches,
+                debug_options=tf.lite.experimental.QuantizationDebugOptions(denylisted_ops=INT8_FLOAT_OPS),
+            )
+            tflite_model = debugger.get_nondebug_quantized_model()
+        else:
+            tflite_model = converter.convert()
+
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return output_path
+
+# Function to compare a TFLite export with its Keras original on the same inputs:
+# file size, load time, prediction agreement, accuracy (with labels y) and the latency
+# percentiles of single-sample predictions
+def compare_models(model_path, tflite_path, X, y=None, latency_samples=100):
+    X = np.asarray(X, dtype=np.float32)
+
+    start = time.perf_counter()
+    from tensorflow.keras.models import load_model
+    keras_model = load_model(model_path, compile=False)
+    keras_load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lite_model = LiteClassifier(tflite_path)
+    lite_load_seconds = time.perf_counter() - start
+
+    report = {}
+    keras_probabilities = np.asarray(keras_model.predict(X, verbose=0))
+    lite_probabilities = lite_model.predict_on_batch(X)
+    keras_labels = _labels(keras_probabilities)
+    lite_labels = _labels(lite_probabilities)
+    report['agreement'] = float(np.mean(keras_labels == lite_labels))
+    report['max_abs_difference'] = float(np.max(np.abs(keras_probabilities - lite_probabilities)))
+    if y is not None:
+        y = np.asarray(y).reshape(len(y), -1)[:, 0]
+        report['keras_accuracy'] = float(np.mean(keras_labels == y))
+        report['tflite_accuracy'] = float(np.mean(lite_labels == y))
+
+    for name, model, load_seconds, path in (('keras', keras_model, keras_load_seconds, model_path),
+                                            ('tflite', lite_model, lite_load_seconds, tflite_path)):
+        model.predict_on_batch(X[:1])
+        latencies = []
+        for i in range(min(latency_samples, len(X))):
+            start = time.perf_counter()
+            model.predict_on_batch(X[i:i + 1])
+            latencies.append(time.perf_counter() - start)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        report[name] = {'size_bytes': os.path.getsize(path), 'load_seconds': load_seconds,
+                        'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99}}
+    return report
+
+# Function to turn class probabilities into labels (single sigmoid output: threshold 0.5)
+def _labels(probabilities):
+    probabilities = probabilities.reshape(len(probabilities), -1)
+    if probabilities.shape[1] == 1:
+        return (probabilities[:, 0] >= 0.5).astype(int)
+    return np.argmax(probabilities, axis=1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Keras classifier to a quantized TFLite model")
+    parser.add_argument('model', help="Keras model file, e.g. stutter_classifier_model.h5")
+    parser.add_argument('--output', help="TFLite file (default: <model>-<quantization>.tflite)")
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default='dynamic')
+    parser.add_argument('--batch-size', type=int, default=1, help="fixed batch size of the exported model")
+    parser.add_argument('--data', help=".npz file with model inputs X (and labels y) for int8 calibration and the report")
+    parser.add_argument('--report', action='store_true', help="compare the export with the Keras model on --data")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.model)[0]}-{args.quantization}.tflite"
+    data = np.load(args.data) if args.data else None
+    if (args.report or args.quantization == 'int8') and data is None:
+        parser.error("--data is required for int8 quantization and --report")
+
+    export_tflite(args.model, output, quantization=args.quantization, batch_size=args.batch_size,
+                  representative_data=None if data is None else data['X'])
+    print(f"Wrote {output} ({os.path.getsize(output)} bytes)")
+
+    if args.report:
+        report = compare_models(args.model, output, data['X'], data['y'] if 'y' in data else None)
+        print(json.dumps(report, indent=2))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,37 @@
 # intent_classification.py
 
-import tensorflow as tf
-from tensorflow.keras.layers import Input, Embedding, LSTM, Dense, Dropout, Bidirectional, Attention
-from tensorflow.keras.models import Model
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from ..sequence_layers import ARCHITECTURES, sequence_encoder
+from .text_preprocessing import TextVectorizer
+
+# TensorFlow and scikit-learn are imported inside the functions that need them, so
+# importing this module stays cheap; training only runs through main().
 
 # Define the BiLSTM with Attention model architecture for intent classification
-def create_intent_classifier(vocab_size, embedding_dim, max_length, num_classes):
+# (max_length=None accepts padded batches of any length)
+def create_intent_classifier(vocab_size, embedding_dim, max_length, num_classes, architecture='lstm'):
+    from tensorflow.keras.layers import Input, Embedding, Dense, Dropout, Attention, GlobalMaxPooling1D
+    from tensorflow.keras.models import Model
+
     inputs = Input(shape=(max_length,))
     embedding_layer = Embedding(vocab_size, embedding_dim)(inputs)
 
-    # Bidirectional LSTM layers
-    lstm_layer = Bidirectional(LSTM(128, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(embedding_layer)
-    lstm_layer = Bidirectional(LSTM(64, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(lstm_layer)
+    # Sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    lstm_layer = sequence_encoder(embedding_layer, architecture=architecture)
 
     # Attention layer
     attention_layer = Attention()([lstm_layer, lstm_layer])
 
+    # Global Max Pooling layer (one prediction per utterance)
+    global_max_pooling_layer = GlobalMaxPooling1D()(attention_layer)
+
     # Dense layers for classification
-    dense_layer = Dense(64, activation='relu')(attention_layer)
+    dense_layer = Dense(64, activation='relu')(global_max_pooling_layer)
     dropout_layer = Dropout(0.5)(dense_layer)
     outputs = Dense(num_classes, activation='softmax')(dropout_layer)  # Use softmax for multi-class classification
 
@@ -31,11 +39,8 @@ def create_intent_classifier(vocab_size, embedding_dim, max_length, num_classes)
     model = Model(inputs=inputs, outputs=outputs)
     return model
 
-# Load and preprocess the dataset (implementation not shown)
-# ...
-
 # Example dataset:
-texts = [
+EXAMPLE_TEXTS = [
     "What's the weather like today?",
     "Book a table for two at 7 pm",
     "Play some relaxing music",
@@ -43,7 +48,7 @@ texts = [
     "Tell me a joke",
     "What is the capital of France?",
 ]
-intents = [
+EXAMPLE_INTENTS = [
     "weather",
     "booking",
     "music",
@@ -52,53 +57,87 @@ intents = [
     "knowledge",
 ]
 
-# Tokenize the text data
-tokenizer = Tokenizer(num_words=5000, oov_token='<OOV>')  # Adjust num_words as needed
-tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
-padded_sequences = pad_sequences(sequences, maxlen=100, padding='post', truncating='post')  # Adjust maxlen as needed
-
-# Encode the intents
-label_encoder = LabelEncoder()
-encoded_intents = label_encoder.fit_transform(intents)
-
-# Create the intent classification model
-vocab_size = len(tokenizer.word_index) + 1
-embedding_dim = 128  # Adjust embedding dimension as needed
-max_length = 100  # Adjust max length as needed
-num_classes = len(label_encoder.classes_)
-model = create_intent_classifier(vocab_size, embedding_dim, max_length, num_classes)
-
-# Compile the model
-optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
-model.compile(loss='sparse_categorical_crossentropy', optimizer=optimizer, metrics=['accuracy'])
-
-# Define callbacks
-early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-model_checkpoint = ModelCheckpoint('best_intent_classifier.h5', monitor='val_accuracy', save_best_only=True)
-
-# Train the model
-history = model.fit(
-    padded_sequences,
-    encoded_intents,
-    batch_size=32,  # Adjust batch size as needed
-    epochs=100,  # Adjust number of epochs as needed
-    validation_split=0.2,
-    callbacks=[early_stopping, model_checkpoint],
-)
-
-# Evaluate the model
-y_pred = model.predict(padded_sequences)
-y_pred_classes = np.argmax(y_pred, axis=1)
-accuracy = accuracy_score(encoded_intents, y_pred_classes)
-conf_matrix = confusion_matrix(encoded_intents, y_pred_classes)
-class_report = classification_report(encoded_intents, y_pred_classes, target_names=label_encoder.classes_)
-
-print(f"Accuracy: {accuracy}")
-print("Confusion Matrix:")
-print(conf_matrix)
-print("Classification Report:")
-print(class_report)
-
-# Save the trained model
-model.save('intent_classification_model.h5')
\ No newline at end of file
+# Function to train, evaluate and save the intent classifier, along with its vocabulary
+# and intent names (vocabulary_path, default <model>.vocab.json; see TextClassifier).
+# Returns the model and the fitted TextVectorizer.
+def train_intent_classifier(texts, intents, model_path='intent_classification_model.h5',
+                            epochs=100, batch_size=32, architecture='lstm', vocabulary_path=None):
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+
+    # Tokenize the text data
+    vectorizer = TextVectorizer(num_words=5000, oov_token='<OOV>', max_length=100)  # Adjust num_words and max_length as needed
+    vectorizer.fit(texts)
+    padded_sequences = vectorizer.transform(texts, length=vectorizer.max_length)
+
+    # Encode the intents
+    label_encoder = LabelEncoder()
+    encoded_intents = label_encoder.fit_transform(intents)
+
+    # Create the intent classification model
+    vocab_size = vectorizer.vocab_size
+    embedding_dim = 128  # Adjust embedding dimension as needed
+    num_classes = len(label_encoder.classes_)
+    model = create_intent_classifier(vocab_size, embedding_dim, None, num_classes, architecture=architecture)
+
+    # Compile the model
+    optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
+    model.compile(loss='sparse_categorical_crossentropy', optimizer=optimizer, metrics=['accuracy'])
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint('best_intent_classifier.h5', monitor='val_accuracy', save_best_only=True)
+
+    # Train the model
+    model.fit(
+        padded_sequences,
+        encoded_intents,
+        batch_size=batch_size,
+        epochs=epochs,
+        validation_split=0.2,
+        callbacks=[early_stopping, model_checkpoint],
+    )
+
+    # Evaluate the model
+    y_pred = model.predict(padded_sequences)
+    y_pred_classes = np.argmax(y_pred, axis=1)
+    accuracy = accuracy_score(encoded_intents, y_pred_classes)
+    conf_matrix = confusion_matrix(encoded_intents, y_pred_classes)
+    class_report = classification_report(encoded_intents, y_pred_classes, target_names=label_encoder.classes_)
+
+    print(f"Accuracy: {accuracy}")
+    print("Confusion Matrix:")
+    print(conf_matrix)
+    print("Classification Report:")
+    print(class_report)
+
+    # Save the trained model and its preprocessing
+    model.save(model_path)
+    vectorizer.labels = label_encoder.classes_.tolist()
+    vectorizer.save(vocabulary_path or os.path.splitext(model_path)[0] + '.vocab.json')
+    return model, vectorizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the intent classifier")
+    parser.add_argument('--data', help="CSV file with 'text' and 'intent' columns (default: the example dataset)")
+    parser.add_argument('--model', default='intent_classification_model.h5')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm',
+                        help="sequence encoder: 'fast_lstm' and 'conv' train and run much faster than 'lstm'")
+    args = parser.parse_args()
+
+    texts, intents = EXAMPLE_TEXTS, EXAMPLE_INTENTS
+    if args.data:
+        with open(args.data, newline='') as f:
+            rows = list(csv.DictReader(f))
+        texts = [row['text'] for row in rows]
+        intents = [row['intent'] for row in rows]
+
+    train_intent_classifier(texts, intents, model_path=args.model, epochs=args.epochs, batch_size=args.batch_size,
+                            architecture=args.architecture)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# joint_model.py
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from ..sequence_layers import ARCHITECTURES, sequence_encoder
+from .intent_classification import EXAMPLE_INTENTS, EXAMPLE_TEXTS as EXAMPLE_INTENT_TEXTS
+from .sentiment_analysis import EXAMPLE_SENTIMENTS, EXAMPLE_TEXTS as EXAMPLE_SENTIMENT_TEXTS
+from .text_classifier import TextClassifier
+from .text_preprocessing import TextVectorizer
+
+# Joint NLP model: one embedding + sequence encoder + attention pass per utterance,
+# followed by an intent head and a sentiment head, so both predictions cost about as
+# much as either separate model. Training data may label only one of the two tasks per
+# utterance (None); the unlabeled head gets a zero sample weight for that utterance.
+HEADS = ('intent', 'sentiment')
+
+# Define the shared-encoder model architecture (max_length=None accepts padded batches of any length)
+def create_joint_nlp_model(vocab_size, embedding_dim, max_length, num_intents, num_sentiments=3, architecture='lstm'):
+    from tensorflow.keras.layers import Input, Embedding, Dense, Dropout, Attention, GlobalMaxPooling1D
+    from tensorflow.keras.models import Model
+
+    inputs = Input(shape=(max_length,))
+    embedding_layer = Embedding(vocab_size, embedding_dim)(inputs)
+
+    # Shared sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    lstm_layer = sequence_encoder(embedding_layer, architecture=architecture)
+
+    # Shared attention and pooling layers
+    attention_layer = Attention()([lstm_layer, lstm_layer])
+    global_max_pooling_layer = GlobalMaxPooling1D()(attention_layer)
+
+    # One dense classification head per task
+    outputs = []
+    for name, num_classes in (('intent', num_intents), ('sentiment', num_sentiments)):
+        dense_layer = Dense(64, activation='relu')(global_max_pooling_layer)
+        dropout_layer = Dropout(0.5)(dense_layer)
+        outputs.append(Dense(num_classes, activation='softmax', name=name)(dropout_layer))
+
+    # Create the model
+    model = Model(inputs=inputs, outputs=outputs)
+    return model
+
+# Function to encode labels that may be missing (None): returns the class names, the
+# encoded labels (0 where missing) and the sample weights (0 where missing)
+def _encode_partial_labels(labels):
+    classes = sorted({label for label in labels if label is not None})
+    index = {label: i for i, label in enumerate(classes)}
+    encoded = np.array([index.get(label, 0) for label in labels])
+    weights = np.array([label is not None for label in labels], dtype=np.float32)
+    return classes, encoded, weights
+
+# Function to train, evaluate and save the joint model, along with its vocabulary and the
+# class names of both heads (vocabulary_path, default <model>.vocab.json; see
+# JointTextClassifier). Returns the model and the fitted TextVectorizer.
+def train_joint_model(texts, intents, sentiments, model_path='joint_nlp_model.keras', epochs=100,
+                      batch_size=32, architecture='lstm', vocabulary_path=None):
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+
+    # Tokenize the text data
+    vectorizer = TextVectorizer(num_words=5000, oov_token='<OOV>', max_length=100)  # Adjust num_words and max_length as needed
+    vectorizer.fit(texts)
+    padded_sequences = vectorizer.transform(texts, length=vectorizer.max_length)
+
+    # Encode both label sets
+    intent_classes, encoded_intents, intent_weights = _encode_partial_labels(intents)
+    sentiment_classes, encoded_sentiments, sentiment_weights = _encode_partial_labels(sentiments)
+
+    # Split the data into training and validation sets
+    (X_train, X_val, intent_train, intent_val, sentiment_train, sentiment_val,
+     intent_weights_train, intent_weights_val, sentiment_weights_train, sentiment_weights_val) = train_test_split(
+        padded_sequences, encoded_intents, encoded_sentiments, intent_weights, sentiment_weights,
+        test_size=0.2, random_state=42,
+    )
+
+    # Create the joint model
+    model = create_joint_nlp_model(vectorizer.vocab_size, 128, None, len(intent_classes), len(sentiment_classes),
+                                   architecture=architecture)  # Adjust embedding dimension as needed
+
+    # Compile the model
+    optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
+    model.compile(
+        loss={'intent': 'sparse_categorical_crossentropy', 'sentiment': 'sparse_categorical_crossentropy'},
+        optimizer=optimizer,
+        weighted_metrics={'intent': ['accuracy'], 'sentiment': ['accuracy']},
+    )
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint('best_joint_nlp_model.keras', monitor='val_loss', save_best_only=True)
+
+    # Train the model (targets and sample weights in HEADS order)
+    model.fit(
+        X_train,
+        [intent_train, sentiment_train],
+        sample_weight=[intent_weights_train, sentiment_weights_train],
+        batch_size=batch_size,
+        epochs=epochs,
+        validation_data=(X_val, [intent_val, sentiment_val], [intent_weights_val, sentiment_weights_val]),
+        callbacks=[early_stopping, model_checkpoint],
+    )
+
+    # Evaluate the model (on the utterances labeled for each task)
+    intent_pred, sentiment_pred = model.predict(X_val)
+    for name, y_pred, y_true, weights in (('Intent', intent_pred, intent_val, intent_weights_val),
+                                          ('Sentiment', sentiment_pred, sentiment_val, sentiment_weights_val)):
+        labeled = weights > 0
+        if labeled.any():
+            accuracy = np.mean(np.argmax(y_pred[labeled], axis=1) == y_true[labeled])
+            print(f"{name} accuracy: {accuracy}")
+
+    # Save the trained model and its preprocessing
+    model.save(model_path)
+    vectorizer.labels = {'intent': intent_classes, 'sentiment': sentiment_classes}
+    vectorizer.save(vocabulary_path or os.path.splitext(model_path)[0] + '.vocab.json')
+    return model, vectorizer
+
+# Inference for the joint model: one forward pass returns both heads. Predictions are
+# cached per utterance like TextClassifier's. Needs the Keras model (LiteClassifier only
+# reads a single output).
+class JointTextClassifier(TextClassifier):
+    def _rows(self, outputs):
+        intent, sentiment = (np.asarray(output) for output in outputs)
+        return [{'intent': intent_row, 'sentiment': sentiment_row}
+                for intent_row, sentiment_row in zip(intent, sentiment)]
+
+    # Function to return {'intent': probabilities, 'sentiment': probabilities}
+    def predict_proba(self, texts):
+        rows = self._predict_rows(texts)
+        return {head: np.array([row[head] for row in rows]) for head in HEADS}
+
+    # Function to return one {'intent': name, 'sentiment': name} dict per text
+    def predict(self, texts):
+        probabilities = self.predict_proba(texts)
+        indices = {head: np.argmax(probabilities[head], axis=1) for head in HEADS}
+        return [{head: self.labels[head][indices[head][i]] for head in HEADS} for i in range(len(texts))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the joint intent and sentiment model")
+    parser.add_argument('--data', help="CSV file with 'text', 'intent' and 'sentiment' columns; leave a cell "
+                                       "empty when an utterance is labeled for one task only "
+                                       "(default: the intent and sentiment example datasets)")
+    parser.add_argument('--model', default='joint_nlp_model.keras')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm',
+                        help="sequence encoder: 'fast_lstm' and 'conv' train and run much faster than 'lstm'")
+    args = parser.parse_args()
+
+    texts = EXAMPLE_INTENT_TEXTS + EXAMPLE_SENTIMENT_TEXTS
+    intents = EXAMPLE_INTENTS + [None] * len(EXAMPLE_SENTIMENT_TEXTS)
+    sentiments = [None] * len(EXAMPLE_INTENT_TEXTS) + EXAMPLE_SENTIMENTS
+    if args.data:
+        with open(args.data, newline='') as f:
+            rows = list(csv.DictReader(f))
+        texts = [row['text'] for row in rows]
+        intents = [row['intent'] or None for row in rows]
+        sentiments = [row['sentiment'] or None for row in rows]
+
+    train_joint_model(texts, intents, sentiments, model_path=args.model, epochs=args.epochs,
+                      batch_size=args.batch_size, architecture=args.architecture)
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,23 @@
 # sentiment_analysis.py
 
-import tensorflow as tf
-from tensorflow.keras.layers import Input, Embedding, LSTM, Dense, Dropout, Bidirectional, Attention, Conv1D, MaxPooling1D, GlobalMaxPooling1D
-from tensorflow.keras.models import Model
-from tensorflow.keras.optimizers import AdamW
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+import argparse
+import csv
+import os
+
 import numpy as np
 
+from ..sequence_layers import ARCHITECTURES, sequence_encoder
+from .text_preprocessing import TextVectorizer
+
+# TensorFlow and scikit-learn are imported inside the functions that need them, so
+# importing this module stays cheap; training only runs through main().
+
 # Define the CNN-BiLSTM with Attention model architecture for sentiment analysis
-def create_sentiment_analyzer(vocab_size, embedding_dim, max_length, num_classes=3):  # 3 classes: positive, negative, neutral
+# (max_length=None accepts padded batches of any length)
+def create_sentiment_analyzer(vocab_size, embedding_dim, max_length, num_classes=3, architecture='lstm'):  # 3 classes: positive, negative, neutral
+    from tensorflow.keras.layers import Input, Embedding, Dense, Dropout, Attention, Conv1D, MaxPooling1D, GlobalMaxPooling1D
+    from tensorflow.keras.models import Model
+
     inputs = Input(shape=(max_length,))
     embedding_layer = Embedding(vocab_size, embedding_dim)(inputs)
 
@@ -20,9 +25,8 @@ def create_sentiment_analyzer(vocab_size, embedding_dim, max_length, num_classes
     conv_layer = Conv1D(128, 5, activation='relu')(embedding_layer)
     pooling_layer = MaxPooling1D(pool_size=4)(conv_layer)
 
-    # Bidirectional LSTM layers
-    lstm_layer = Bidirectional(LSTM(128, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(pooling_layer)
-    lstm_layer = Bidirectional(LSTM(64, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(lstm_layer)
+    # Sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    lstm_layer = sequence_encoder(pooling_layer, architecture=architecture)
 
     # Attention layer
     attention_layer = Attention()([lstm_layer, lstm_layer])
@@ -39,11 +43,8 @@ def create_sentiment_analyzer(vocab_size, embedding_dim, max_length, num_classes
     model = Model(inputs=inputs, outputs=outputs)
     return model
 
-# Load and preprocess the dataset (implementation not shown)
-# ...
-
 # Example dataset:
-texts = [
+EXAMPLE_TEXTS = [
     "This movie is amazing! I loved it.",
     "The food was terrible, I wouldn't recommend it.",
     "The service was okay, nothing special.",
@@ -51,7 +52,7 @@ texts = [
     "This is the worst experience I've ever had.",
     "The weather is nice today.",
 ]
-sentiments = [
+EXAMPLE_SENTIMENTS = [
     "positive",
     "negative",
     "neutral",
@@ -60,56 +61,92 @@ sentiments = [
     "neutral",
 ]
 
-# Tokenize the text data
-tokenizer = Tokenizer(num_words=5000, oov_token='<OOV>')  # Adjust num_words as needed
-tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
-padded_sequences = pad_sequences(sequences, maxlen=100, padding='post', truncating='post')  # Adjust maxlen as needed
-
-# Encode the sentiments
-label_encoder = LabelEncoder()
-encoded_sentiments = label_encoder.fit_transform(sentiments)
-
-# Split the data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(
-    padded_sequences, encoded_sentiments, test_size=0.2, random_state=42
-)
-
-# Create the sentiment analysis model
-vocab_size = len(tokenizer.word_index) + 1
-embedding_dim = 128  # Adjust embedding dimension as needed
-max_length = 100  # Adjust max length as needed
-model = create_sentiment_analyzer(vocab_size, embedding_dim, max_length)
-
-# Compile the model
-optimizer = AdamW(learning_rate=0.001)  # Adjust learning rate as needed
-model.compile(loss='sparse_categorical_crossentropy', optimizer=optimizer, metrics=['accuracy'])
-
-# Define callbacks
-early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-model_checkpoint = ModelCheckpoint('best_sentiment_analyzer.h5', monitor='val_accuracy', save_best_only=True)
-reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=5, min_lr=0.00001)
-
-# Train the model
-history = model.fit(
-    X_train,
-    y_train,
-    batch_size=32,  # Adjust batch size as needed
-    epochs=100,  # Adjust number of epochs as needed
-    validation_data=(X_test, y_test),
-    callbacks=[early_stopping, model_checkpoint, reduce_lr],
-)
-
-# Evaluate the model
-y_pred = model.predict(X_test)
-y_pred_classes = np.argmax(y_pred, axis=1)
-accuracy = accuracy_score(y_test, y_pred_classes)
-precision, recall, f1, _ = precision_recall_fscore_support(y_test, y_pred_classes, average='weighted')
-
-print(f"Accuracy: {accuracy}")
-print(f"Precision: {precision}")
-print(f"Recall: {recall}")
-print(f"F1-score: {f1}")
-
-# Save the trained model
-model.save('sentiment_analysis_model.h5')
\ No newline at end of file
+# Function to train, evaluate and save the sentiment analyzer, along with its vocabulary
+# and sentiment names (vocabulary_path, default <model>.vocab.json; see TextClassifier).
+# Returns the model and the fitted TextVectorizer.
+def train_sentiment_analyzer(texts, sentiments, model_path='sentiment_analysis_model.h5',
+                             epochs=100, batch_size=32, architecture='lstm', vocabulary_path=None):
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+    from tensorflow.keras.optimizers import AdamW
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
+
+    # Tokenize the text data
+    vectorizer = TextVectorizer(num_words=5000, oov_token='<OOV>', max_length=100)  # Adjust num_words and max_length as needed
+    vectorizer.fit(texts)
+    padded_sequences = vectorizer.transform(texts, length=vectorizer.max_length)
+
+    # Encode the sentiments
+    label_encoder = LabelEncoder()
+    encoded_sentiments = label_encoder.fit_transform(sentiments)
+
+    # Split the data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(
+        padded_sequences, encoded_sentiments, test_size=0.2, random_state=42
+    )
+
+    # Create the sentiment analysis model
+    vocab_size = vectorizer.vocab_size
+    embedding_dim = 128  # Adjust embedding dimension as needed
+    model = create_sentiment_analyzer(vocab_size, embedding_dim, None, num_classes=len(label_encoder.classes_),
+                                      architecture=architecture)
+
+    # Compile the model
+    optimizer = AdamW(learning_rate=0.001)  # Adjust learning rate as needed
+    model.compile(loss='sparse_categorical_crossentropy', optimizer=optimizer, metrics=['accuracy'])
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint('best_sentiment_analyzer.h5', monitor='val_accuracy', save_best_only=True)
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=5, min_lr=0.00001)
+
+    # Train the model
+    model.fit(
+        X_train,
+        y_train,
+        batch_size=batch_size,
+        epochs=epochs,
+        validation_data=(X_test, y_test),
+        callbacks=[early_stopping, model_checkpoint, reduce_lr],
+    )
+
+    # Evaluate the model
+    y_pred = model.predict(X_test)
+    y_pred_classes = np.argmax(y_pred, axis=1)
+    accuracy = accuracy_score(y_test, y_pred_classes)
+    precision, recall, f1, _ = precision_recall_fscore_support(y_test, y_pred_classes, average='weighted')
+
+    print(f"Accuracy: {accuracy}")
+    print(f"Precision: {precision}")
+    print(f"Recall: {recall}")
+    print(f"F1-score: {f1}")
+
+    # Save the trained model and its preprocessing
+    model.save(model_path)
+    vectorizer.labels = label_encoder.classes_.tolist()
+    vectorizer.save(vocabulary_path or os.path.splitext(model_path)[0] + '.vocab.json')
+    return model, vectorizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the sentiment analyzer")
+    parser.add_argument('--data', help="CSV file with 'text' and 'sentiment' columns (default: the example dataset)")
+    parser.add_argument('--model', default='sentiment_analysis_model.h5')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm',
+                        help="sequence encoder: 'fast_lstm' and 'conv' train and run much faster than 'lstm'")
+    args = parser.parse_args()
+
+    texts, sentiments = EXAMPLE_TEXTS, EXAMPLE_SENTIMENTS
+    if args.data:
+        with open(args.data, newline='') as f:
+            rows = list(csv.DictReader(f))
+        texts = [row['text'] for row in rows]
+        sentiments = [row['sentiment'] for row in rows]
+
+    train_sentiment_analyzer(texts, sentiments, model_path=args.model, epochs=args.epochs, batch_size=args.batch_size,
+                             architecture=args.architecture)
+
+if __name__ == '__main__':
+    main()
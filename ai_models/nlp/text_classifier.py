@@ -0,0 +1,78 @@
+# text_classifier.py
+
+import argparse
+import threading
+
+import numpy as np
+
+from ..lite_inference import LiteClassifier
+from .text_preprocessing import LRUCache, TextVectorizer
+
+# Inference for the text classifiers (intent_classification, sentiment_analysis) from the
+# model and the vocabulary artifact saved by their train_* functions. The model is loaded
+# on first use (a .tflite model_path is run with LiteClassifier). The models have no
+# padding mask and are trained on sequences padded to the vectorizer's max_length, so
+# utterances are always padded to that length (or to a fixed-length model's input
+# length): a text's prediction then does not depend on the other texts of its batch.
+# Predictions of recurring utterances are served from a bounded LRU cache.
+class TextClassifier:
+    def __init__(self, model_path, vocabulary_path, cache_size=4096):
+        self.model_path = model_path
+        self.vectorizer = TextVectorizer.load(vocabulary_path, cache_size=cache_size)
+        self.labels = self.vectorizer.labels
+        self.cache = LRUCache(cache_size)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None and self.model_path.endswith('.tflite'):
+                    self._model = LiteClassifier(self.model_path)
+                elif self._model is None:
+                    from tensorflow.keras.models import load_model
+                    self._model = load_model(self.model_path)
+        return self._model
+
+    # Function to return the (cached) model output of every text, one row per text
+    def _predict_rows(self, texts):
+        texts = list(texts)
+        rows = [self.cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, row in zip(texts, rows) if row is None))
+        if missing:
+            length = self.model.input_shape[1] or self.vectorizer.max_length
+            X = self.vectorizer.transform(missing, length=length)
+            predicted = dict(zip(missing, self._rows(self.model.predict_on_batch(X))))
+            for text, row in predicted.items():
+                self.cache.put(text, row)
+            rows = [predicted[text] if row is None else row for text, row in zip(texts, rows)]
+        return rows
+
+    # Function to split a batch of model outputs into per-text rows
+    def _rows(self, outputs):
+        return np.asarray(outputs)
+
+    def predict_proba(self, texts):
+        return np.array(self._predict_rows(texts))
+
+    # Function to predict the class name (or index, without saved labels) of every text
+    def predict(self, texts):
+        indices = np.argmax(self.predict_proba(texts), axis=1)
+        if self.labels is None:
+            return indices.tolist()
+        return [self.labels[i] for i in indices]
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify utterances with a trained intent or sentiment model")
+    parser.add_argument('model', help="model file, e.g. intent_classification_model.h5")
+    parser.add_argument('vocabulary', help="vocabulary artifact saved with the model (<model>.vocab.json)")
+    parser.add_argument('texts', nargs='+')
+    args = parser.parse_args()
+
+    classifier = TextClassifier(args.model, args.vocabulary)
+    for text, label in zip(args.texts, classifier.predict(args.texts)):
+        print(f"{label}\t{text}")
+
+if __name__ == '__main__':
+    main()
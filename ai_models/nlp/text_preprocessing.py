@@ -0,0 +1,146 @@
+# text_preprocessing.py
+
+import json
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+# Text preprocessing shared by the intent and sentiment models, compatible with the Keras
+# Tokenizer(num_words, oov_token) they were trained with (same filters, lowercasing,
+# word order and OOV handling), but:
+#   - the fitted vocabulary is saved to / loaded from a small JSON artifact
+#   - a batch is cleaned with one lower()/translate() over the joined texts
+#   - token ids of recurring texts are memoized in a bounded LRU cache
+#   - batches are padded to their longest sequence, rounded up to a multiple of
+#     bucket_size (so the model sees few distinct shapes), instead of always max_length
+KERAS_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# Bounded, thread-safe LRU cache
+class LRUCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+class TextVectorizer:
+    def __init__(self, num_words=5000, oov_token='<OOV>', max_length=100, bucket_size=8,
+                 cache_size=4096, filters=KERAS_FILTERS, labels=None):
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.max_length = max_length
+        self.bucket_size = bucket_size
+        self.filters = filters
+        self.labels = labels  # class names of the model trained with this vocabulary
+        self.words = []
+        self.cache = LRUCache(cache_size)
+        self._table = str.maketrans(filters, ' ' * len(filters))
+        self._index = {}
+
+    # Function to build the vocabulary: words by decreasing count (ties in order of
+    # first appearance), the OOV token first, keeping the num_words - 1 most frequent
+    def fit(self, texts):
+        counts = Counter()
+        for words in self._split(texts):
+            counts.update(words)
+        words = [word for word, count in sorted(counts.items(), key=lambda item: -item[1])]
+        if self.oov_token is not None:
+            words.insert(0, self.oov_token)
+        self._set_words(words[:self.num_words - 1] if self.num_words else words)
+        return self
+
+    def _set_words(self, words):
+        self.words = list(words)
+        self._index = {word: i for i, word in enumerate(self.words, start=1)}
+        self.cache = LRUCache(self.cache.maxsize)
+
+    # Embedding input size of a model trained with this vocabulary
+    @property
+    def vocab_size(self):
+        return len(self.words) + 1
+
+    def _split(self, texts):
+        # One pass over the whole batch; '\0' separates texts and is not a filter character
+        cleaned = '\0'.join(texts).lower().translate(self._table)
+        return [[word for word in text.split(' ') if word] for text in cleaned.split('\0')]
+
+    # Function to convert texts to arrays of token ids (unpadded, memoized per text)
+    def texts_to_sequences(self, texts):
+        sequences = [self.cache.get(text) for text in texts]
+        missing = [i for i, sequence in enumerate(sequences) if sequence is None]
+        if missing:
+            oov_index = self._index.get(self.oov_token)
+            for i, words in zip(missing, self._split([texts[i] for i in missing])):
+                ids = [self._index.get(word, oov_index) for word in words]
+                sequence = np.array([i for i in ids if i is not None], dtype=np.int32)
+                self.cache.put(texts[i], sequence)
+                sequences[i] = sequence
+        return sequences
+
+    # Function to pad/truncate sequences at the end ('post'), to length or, by default,
+    # to the longest sequence rounded up to a multiple of bucket_size (at most max_length)
+    def pad(self, sequences, length=None):
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+        if length is None:
+            longest = max(int(lengths.max(initial=0)), 1)
+            length = -(-longest // self.bucket_size) * self.bucket_size
+            if self.max_length is not None:
+                length = min(length, self.max_length)
+        lengths = np.minimum(lengths, length)
+
+        padded = np.zeros((len(sequences), length), dtype=np.int32)
+        if len(sequences):
+            mask = np.arange(length) < lengths[:, np.newaxis]
+            padded[mask] = np.concatenate([sequence[:length] for sequence in sequences])
+        return padded
+
+    # Function to tokenize and pad a batch of texts
+    def transform(self, texts, length=None):
+        return self.pad(self.texts_to_sequences(list(texts)), length=length)
+
+    def save(self, path):
+        config = {
+            'num_words': self.num_words,
+            'oov_token': self.oov_token,
+            'max_length': self.max_length,
+            'bucket_size': self.bucket_size,
+            'filters': self.filters,
+            'labels': self.labels,
+            'words': self.words,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, cache_size=4096):
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        words = config.pop('words')
+        vectorizer = cls(cache_size=cache_size, **config)
+        vectorizer._set_words(words)
+        return vectorizer
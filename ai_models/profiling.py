@@ -0,0 +1,237 @@
+# profiling.py
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger('ai_models')
+
+# Per-stage instrumentation of the audio analysis and inference pipelines. Code marks
+# its stages with
+#     with stage('feature_extraction.load'):
+#         ...
+# (or decorates whole functions with @profiled(name)) and the profiler records, per
+# stage name: calls, failures (exceptions leaving the block), wall time (total and a
+# Prometheus histogram) and, optionally, peak traced memory allocated inside the block
+# (tracemalloc; slows Python allocations down, so it is a separate option). Metrics are
+# exported in the Prometheus text format (render_prometheus) or as a dict (snapshot);
+# with log=True every finished stage is also logged as a JSON line on the 'ai_models'
+# logger.
+#
+# Profiling is off unless enabled with profiler.enable() or the AI_MODELS_PROFILE
+# environment variable ('1', or a comma-separated list of options: 'allocations',
+# 'log'). When off, stage() returns a shared no-op context manager: one attribute check
+# and an empty __enter__/__exit__ per stage.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# No-op stage used while profiling is disabled
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+# Accumulated metrics of one stage name
+class StageMetrics:
+    def __init__(self, buckets):
+        self.calls = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.bucket_counts = [0] * len(buckets)
+        self.allocated_bytes = 0  # sum of per-call peaks
+        self.max_allocated_bytes = 0
+
+# Timed block of a stage (created by Profiler.stage while profiling is enabled)
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.allocations = self.profiler.allocations
+        if self.allocations:
+            self.profiler._enter_allocations()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        allocated = self.profiler._exit_allocations() if self.allocations else None
+        self.profiler.record(self.name, seconds, allocated_bytes=allocated, failed=exc_type is not None)
+        return False
+
+class Profiler:
+    def __init__(self, enabled=False, allocations=False, log=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.allocations = allocations
+        self.log = log
+        self.buckets = tuple(buckets)
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if enabled and allocations:
+            self._start_tracemalloc()
+
+    # Function to configure the profiler from an AI_MODELS_PROFILE style value
+    @classmethod
+    def from_env(cls, value=None):
+        value = os.environ.get('AI_MODELS_PROFILE', '') if value is None else value
+        options = {option.strip() for option in value.lower().split(',') if option.strip()}
+        enabled = bool(options - {'0', 'false', 'off'})
+        return cls(enabled=enabled, allocations='allocations' in options, log='log' in options)
+
+    def enable(self, allocations=False, log=False):
+        self.allocations = allocations
+        self.log = log
+        if allocations:
+            self._start_tracemalloc()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    # Function to return the context manager that times a stage
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    # Function decorator timing every call of a function as a stage
+    def profiled(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Function to add one call of a stage to its metrics
+    def record(self, name, seconds, allocated_bytes=None, failed=False):
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = self._metrics[name] = StageMetrics(self.buckets)
+            metrics.calls += 1
+            metrics.failures += failed
+            metrics.seconds += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    metrics.bucket_counts[i] += 1
+                    break
+            if allocated_bytes is not None:
+                metrics.allocated_bytes += allocated_bytes
+                metrics.max_allocated_bytes = max(metrics.max_allocated_bytes, allocated_bytes)
+        if self.log:
+            event = {'event': 'stage', 'stage': name, 'seconds': seconds, 'failed': failed}
+            if allocated_bytes is not None:
+                event['allocated_bytes'] = allocated_bytes
+            logger.info(json.dumps(event))
+
+    # Function to report an error handled by the pipeline (e.g. a file that could not be
+    # processed): always logged as a JSON line, counted as a failure of the stage when
+    # profiling is enabled
+    def failure(self, name, error, **context):
+        if self.enabled:
+            with self._lock:
+                metrics = self._metrics.get(name)
+                if metrics is None:
+                    metrics = self._metrics[name] = StageMetrics(self.buckets)
+                metrics.failures += 1
+        event = {'event': 'failure', 'stage': name, 'error': f"{type(error).__name__}: {error}"}
+        event.update({key: str(value) for key, value in context.items()})
+        logger.error(json.dumps(event))
+
+    # Allocation peaks of nested stages: every open stage keeps [start, peak] and the
+    # global tracemalloc peak is folded into all of them before it is reset
+    def _start_tracemalloc(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _enter_allocations(self):
+        stack = self._allocation_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in stack:
+            frame[1] = max(frame[1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+
+    def _exit_allocations(self):
+        stack = self._allocation_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        start, frame_peak = stack.pop()
+        frame_peak = max(frame_peak, peak)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], frame_peak)
+        return frame_peak - start
+
+    def _allocation_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    # Function to return the metrics of every stage as a dict
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    'calls': metrics.calls,
+                    'failures': metrics.failures,
+                    'seconds': metrics.seconds,
+                    'mean_seconds': metrics.seconds / metrics.calls if metrics.calls else 0.0,
+                    'allocated_bytes': metrics.allocated_bytes,
+                    'max_allocated_bytes': metrics.max_allocated_bytes,
+                }
+                for name, metrics in sorted(self._metrics.items())
+            }
+
+    # Function to render the metrics in the Prometheus text exposition format
+    def render_prometheus(self, prefix='ai_models'):
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time of pipeline stages.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted(self._metrics.items())
+            for name, metrics in items:
+                cumulative = 0
+                for bound, count in zip(self.buckets, metrics.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {metrics.calls}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {metrics.seconds!r}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {metrics.calls}')
+
+            lines += [f"# HELP {prefix}_stage_failures_total Failed pipeline stage calls.",
+                      f"# TYPE {prefix}_stage_failures_total counter"]
+            lines += [f'{prefix}_stage_failures_total{{stage="{name}"}} {metrics.failures}' for name, metrics in items]
+
+            if self.allocations:
+                lines += [f"# HELP {prefix}_stage_allocated_bytes_total Sum of the peak memory allocated per stage call.",
+                          f"# TYPE {prefix}_stage_allocated_bytes_total counter"]
+                lines += [f'{prefix}_stage_allocated_bytes_total{{stage="{name}"}} {metrics.allocated_bytes}'
+                          for name, metrics in items]
+        return '\n'.join(lines) + '\n'
+
+# Process-wide profiler used by the pipelines
+profiler = Profiler.from_env()
+
+# Function to time a stage with the process-wide profiler
+def stage(name):
+    return profiler.stage(name)
+
+# Function decorator timing a function with the process-wide profiler
+def profiled(name):
+    return profiler.profiled(name)
@@ -0,0 +1,33 @@
+# sequence_layers.py
+
+# Sequence encoder shared by the model builders. architecture selects the layers:
+#   'lstm'       Bidirectional LSTMs with recurrent_dropout (the original models). Recurrent
+#                dropout rules out TensorFlow's fused LSTM kernel, so every time step runs
+#                through the generic loop, in training and in inference.
+#   'fast_lstm'  the same stack with dropout on the inputs only, which keeps the fused
+#                (cuDNN-compatible) kernel
+#   'conv'       dilated 1-D convolutions with the same output widths; there is no
+#                recurrence, so all time steps are computed in parallel
+ARCHITECTURES = ('lstm', 'fast_lstm', 'conv')
+
+# Function to stack one encoder layer per entry of units on x. With
+# return_sequences=False the last layer returns one vector per sequence.
+def sequence_encoder(x, units=(128, 64), return_sequences=True, dropout=0.2, architecture='lstm'):
+    from tensorflow.keras.layers import LSTM, Bidirectional, Conv1D, Dropout, GlobalMaxPooling1D
+
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"unknown architecture {architecture!r}, expected one of {ARCHITECTURES}")
+
+    for i, layer_units in enumerate(units):
+        sequences = return_sequences or i < len(units) - 1
+        if architecture == 'conv':
+            # 2 * units channels to match the Bidirectional output width
+            x = Conv1D(2 * layer_units, 3, padding='same', dilation_rate=2 ** i, activation='relu')(x)
+            x = Dropout(dropout)(x)
+            if not sequences:
+                x = GlobalMaxPooling1D()(x)
+        else:
+            recurrent_dropout = dropout if architecture == 'lstm' else 0.0
+            x = Bidirectional(LSTM(layer_units, return_sequences=sequences, dropout=dropout,
+                                   recurrent_dropout=recurrent_dropout))(x)
+    return x
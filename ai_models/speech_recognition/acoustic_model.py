@@ -1,14 +1,22 @@
 # acoustic_model.py
 
-import tensorflow as tf
-from tensorflow.keras.layers import Input, Conv2D, BatchNormalization, Activation, MaxPooling2D, Flatten, Dense, Dropout, LSTM, Bidirectional
-from tensorflow.keras.models import Model
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-from tensorflow.keras.regularizers import l2
+import argparse
+import os
+
+import numpy as np
+
+from ..sequence_layers import ARCHITECTURES, sequence_encoder
+from .spectrogram_shards import spectrogram_dataset
+
+# TensorFlow is imported inside the functions that need it, so importing this module
+# stays cheap; training only runs through main().
 
 # Define the CNN-BiLSTM model architecture
-def create_acoustic_model(input_shape=(128, 128, 1), num_classes=1):  # Adjust input_shape as needed
+def create_acoustic_model(input_shape=(128, 128, 1), num_classes=1, architecture='lstm'):  # Adjust input_shape as needed
+    from tensorflow.keras.layers import Input, Conv2D, BatchNormalization, Activation, MaxPooling2D, Permute, Reshape, Dense, Dropout
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.regularizers import l2
+
     inputs = Input(shape=input_shape)
 
     # Convolutional layers
@@ -27,12 +35,12 @@ def create_acoustic_model(input_shape=(128, 128, 1), num_classes=1):  # Adjust i
     x = Activation('relu')(x)
     x = MaxPooling2D(pool_size=(2, 2))(x)
 
-    # Flatten for LSTM input
-    x = Flatten()(x)
+    # Sequence of frames for the encoder: (mel bands, frames, channels) -> (frames, mel bands * channels)
+    x = Permute((2, 1, 3))(x)
+    x = Reshape((x.shape[1], x.shape[2] * x.shape[3]))(x)
 
-    # Bidirectional LSTM layers
-    x = Bidirectional(LSTM(128, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(x)
-    x = Bidirectional(LSTM(64, dropout=0.2, recurrent_dropout=0.2))(x)
+    # Sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    x = sequence_encoder(x, return_sequences=False, architecture=architecture)
 
     # Dense layers for classification
     x = Dense(64, activation='relu')(x)
@@ -43,30 +51,78 @@ def create_acoustic_model(input_shape=(128, 128, 1), num_classes=1):  # Adjust i
     model = Model(inputs=inputs, outputs=outputs)
     return model
 
-# Compile the model
-model = create_acoustic_model()
-optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
-model.compile(loss='binary_crossentropy', optimizer=optimizer, metrics=['accuracy'])  # Use binary_crossentropy for binary classification
-
-# Define callbacks
-early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-model_checkpoint = ModelCheckpoint('best_acoustic_model.h5', monitor='val_accuracy', save_best_only=True)
-
-# Load and preprocess the dataset (implementation not shown)
-# ...
-
-# Train the model
-history = model.fit(
-    X_train,
-    y_train,
-    batch_size=32,  # Adjust batch size as needed
-    epochs=100,  # Adjust number of epochs as needed
-    validation_data=(X_val, y_val),
-    callbacks=[early_stopping, model_checkpoint],
-)
-
-# Evaluate the model (implementation not shown)
-# ...
-
-# Save the trained model
-model.save('acoustic_model.h5')
\ No newline at end of file
+# Function to compile, train and save the acoustic model on in-memory arrays
+def train_acoustic_model(X_train, y_train, X_val, y_val, model_path='acoustic_model.h5',
+                         epochs=100, batch_size=32, architecture='lstm'):
+    return _fit_acoustic_model(X_train.shape[1:], model_path, epochs, architecture, x=X_train, y=y_train,
+                               batch_size=batch_size, validation_data=(X_val, y_val))
+
+# Function to compile, train and save the acoustic model on spectrogram shards written by
+# spectrogram_shards.write_spectrogram_shards. The shards are streamed through tf.data,
+# so only shuffle_buffer rows (plus the prefetched batches) are held in memory.
+def train_acoustic_model_from_shards(train_shard_dir, val_shard_dir, input_shape=(128, 128, 1),
+                                     model_path='acoustic_model.h5', epochs=100, batch_size=32,
+                                     shuffle_buffer=4096, cache=None, architecture='lstm'):
+    train_data = spectrogram_dataset(train_shard_dir, input_shape=input_shape, batch_size=batch_size,
+                                     shuffle_buffer=shuffle_buffer, cache=cache)
+    validation_data = spectrogram_dataset(val_shard_dir, input_shape=input_shape, batch_size=batch_size,
+                                          shuffle=False)
+    return _fit_acoustic_model(input_shape, model_path, epochs, architecture, x=train_data,
+                               validation_data=validation_data)
+
+def _fit_acoustic_model(input_shape, model_path, epochs, architecture, **fit_kwargs):
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+
+    # Compile the model
+    model = create_acoustic_model(input_shape=input_shape, architecture=architecture)
+    optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
+    model.compile(loss='binary_crossentropy', optimizer=optimizer, metrics=['accuracy'])  # Use binary_crossentropy for binary classification
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint('best_acoustic_model.h5', monitor='val_accuracy', save_best_only=True)
+
+    # Train the model
+    model.fit(
+        epochs=epochs,
+        callbacks=[early_stopping, model_checkpoint],
+        **fit_kwargs,
+    )
+
+    # Evaluate the model (implementation not shown)
+    # ...
+
+    # Save the trained model
+    model.save(model_path)
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the acoustic model")
+    parser.add_argument('data', help=".npz file with X_train, y_train, X_val and y_val arrays, "
+                                     "or a directory of training spectrogram shards")
+    parser.add_argument('--val-data', help="directory of validation spectrogram shards (with a shard directory)")
+    parser.add_argument('--model', default='acoustic_model.h5')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm',
+                        help="sequence encoder: 'fast_lstm' and 'conv' train and run much faster than 'lstm'")
+    parser.add_argument('--shuffle-buffer', type=int, default=4096)
+    parser.add_argument('--cache', help="cache the training rows in this file after the first epoch ('' for memory)")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.data):
+        if args.val_data is None:
+            parser.error("--val-data is required with a shard directory")
+        train_acoustic_model_from_shards(args.data, args.val_data, model_path=args.model, epochs=args.epochs,
+                                         batch_size=args.batch_size, shuffle_buffer=args.shuffle_buffer,
+                                         cache=args.cache, architecture=args.architecture)
+        return
+
+    data = np.load(args.data)
+    train_acoustic_model(data['X_train'], data['y_train'], data['X_val'], data['y_val'],
+                         model_path=args.model, epochs=args.epochs, batch_size=args.batch_size,
+                         architecture=args.architecture)
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,25 @@
 # language_model.py
 
-import tensorflow as tf
-from tensorflow.keras.layers import Input, Embedding, LSTM, Dense, Dropout, Bidirectional, Attention
-from tensorflow.keras.models import Model
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+import argparse
+import csv
+
+import numpy as np
+
+from ..sequence_layers import ARCHITECTURES, sequence_encoder
+
+# TensorFlow is imported inside the functions that need it, so importing this module
+# stays cheap; training only runs through main().
 
 # Define the BiLSTM with Attention model architecture
-def create_language_model(vocab_size, embedding_dim, max_length, num_classes=1):
+def create_language_model(vocab_size, embedding_dim, max_length, num_classes=1, architecture='lstm'):
+    from tensorflow.keras.layers import Input, Embedding, Dense, Dropout, Attention
+    from tensorflow.keras.models import Model
+
     inputs = Input(shape=(max_length,))
     embedding_layer = Embedding(vocab_size, embedding_dim)(inputs)
 
-    # Bidirectional LSTM layers
-    lstm_layer = Bidirectional(LSTM(128, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(embedding_layer)
-    lstm_layer = Bidirectional(LSTM(64, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(lstm_layer)
+    # Sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    lstm_layer = sequence_encoder(embedding_layer, architecture=architecture)
 
     # Attention layer
     attention_layer = Attention()([lstm_layer, lstm_layer])
@@ -29,41 +33,69 @@ def create_language_model(vocab_size, embedding_dim, max_length, num_classes=1):
     model = Model(inputs=inputs, outputs=outputs)
     return model
 
-# Load and preprocess the dataset (implementation not shown)
-# ...
-
-# Tokenize the text data
-tokenizer = Tokenizer(num_words=5000, oov_token='<OOV>')  # Adjust num_words as needed
-tokenizer.fit_on_texts(texts)
-sequences = tokenizer.texts_to_sequences(texts)
-padded_sequences = pad_sequences(sequences, maxlen=100, padding='post', truncating='post')  # Adjust maxlen as needed
-
-# Create the language model
-vocab_size = len(tokenizer.word_index) + 1
-embedding_dim = 128  # Adjust embedding dimension as needed
-max_length = 100  # Adjust max length as needed
-model = create_language_model(vocab_size, embedding_dim, max_length)
-
-# Compile the model
-optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
-model.compile(loss='binary_crossentropy', optimizer=optimizer, metrics=['accuracy'])  # Use binary_crossentropy for binary classification
-
-# Define callbacks
-early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
-model_checkpoint = ModelCheckpoint('best_language_model.h5', monitor='val_accuracy', save_best_only=True)
-
-# Train the model
-history = model.fit(
-    padded_sequences,
-    labels,
-    batch_size=32,  # Adjust batch size as needed
-    epochs=100,  # Adjust number of epochs as needed
-    validation_split=0.2,
-    callbacks=[early_stopping, model_checkpoint],
-)
-
-# Evaluate the model (implementation not shown)
-# ...
-
-# Save the trained model
-model.save('language_model.h5')
\ No newline at end of file
+# Function to train and save the language model on texts with binary labels
+# (fluency or disfluency). Returns the model with the fitted tokenizer.
+def train_language_model(texts, labels, model_path='language_model.h5', epochs=100, batch_size=32,
+                         architecture='lstm'):
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+    # Tokenize the text data
+    tokenizer = Tokenizer(num_words=5000, oov_token='<OOV>')  # Adjust num_words as needed
+    tokenizer.fit_on_texts(texts)
+    sequences = tokenizer.texts_to_sequences(texts)
+    padded_sequences = pad_sequences(sequences, maxlen=100, padding='post', truncating='post')  # Adjust maxlen as needed
+
+    # Create the language model
+    vocab_size = len(tokenizer.word_index) + 1
+    embedding_dim = 128  # Adjust embedding dimension as needed
+    max_length = 100  # Adjust max length as needed
+    model = create_language_model(vocab_size, embedding_dim, max_length, architecture=architecture)
+
+    # Compile the model
+    optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
+    model.compile(loss='binary_crossentropy', optimizer=optimizer, metrics=['accuracy'])  # Use binary_crossentropy for binary classification
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint('best_language_model.h5', monitor='val_accuracy', save_best_only=True)
+
+    # Train the model
+    model.fit(
+        padded_sequences,
+        np.asarray(labels, dtype=np.float32),
+        batch_size=batch_size,
+        epochs=epochs,
+        validation_split=0.2,
+        callbacks=[early_stopping, model_checkpoint],
+    )
+
+    # Evaluate the model (implementation not shown)
+    # ...
+
+    # Save the trained model
+    model.save(model_path)
+    return model, tokenizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the language model")
+    parser.add_argument('data', help="CSV file with 'text' and 'label' (0 or 1) columns")
+    parser.add_argument('--model', default='language_model.h5')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm',
+                        help="sequence encoder: 'fast_lstm' and 'conv' train and run much faster than 'lstm'")
+    args = parser.parse_args()
+
+    with open(args.data, newline='') as f:
+        rows = list(csv.DictReader(f))
+    texts = [row['text'] for row in rows]
+    labels = [int(row['label']) for row in rows]
+
+    train_language_model(texts, labels, model_path=args.model, epochs=args.epochs, batch_size=args.batch_size,
+                         architecture=args.architecture)
+
+if __name__ == '__main__':
+    main()
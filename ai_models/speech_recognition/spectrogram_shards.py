@@ -0,0 +1,113 @@
+# spectrogram_shards.py
+
+import argparse
+import glob
+import os
+from functools import partial
+from multiprocessing import Pool
+
+import librosa
+import numpy as np
+
+from ..audio_io import load_audio
+from ..stuttering_detection.feature_store import ShardFeatureWriter
+
+# Training data for the acoustic model lives on disk as .npy shards written by
+# ShardFeatureWriter: every row is a flattened log-mel spectrogram followed by its
+# label, stored as float16 to halve the I/O. spectrogram_dataset() streams the shards
+# through tf.data, so the corpus never has to fit in memory.
+
+# Function to compute a fixed-size log-mel spectrogram (n_mels x num_frames) of an audio
+# file. Longer recordings are cropped and shorter ones padded with the -top_db floor.
+def compute_spectrogram(audio_file, sample_rate=16000, n_mels=128, num_frames=128,
+                        n_fft=1024, hop_length=512, top_db=80.0):
+    y, sr = load_audio(audio_file, sr=sample_rate)
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels)
+    spectrogram = librosa.power_to_db(mel, ref=np.max, top_db=top_db)[:, :num_frames]
+    return np.pad(spectrogram, ((0, 0), (0, num_frames - spectrogram.shape[1])), constant_values=-top_db)
+
+# Function to compute one spectrogram in a worker process (None on failure)
+def _spectrogram_file(filename, **kwargs):
+    try:
+        return filename, compute_spectrogram(filename, **kwargs)
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return filename, None
+
+# Function to write the spectrograms of all audio files in a directory to shards.
+# Like extract_features_from_directory, runs can be interrupted and resumed, and
+# several directories (one per label) can be written to the same shard_dir.
+def write_spectrogram_shards(directory, label, shard_dir, num_workers=1, shard_size=1000,
+                             dtype=np.float16, retry_failed=False, **kwargs):
+    writer = ShardFeatureWriter(shard_dir, shard_size=shard_size, dtype=dtype, retry_failed=retry_failed)
+    filenames = [filename for filename in librosa.util.find_files(directory) if filename not in writer.done]
+    compute = partial(_spectrogram_file, **kwargs)
+
+    pool = Pool(num_workers) if num_workers != 1 else None
+    try:
+        results = map(compute, filenames) if pool is None else pool.imap(compute, filenames)
+        for filename, spectrogram in results:
+            writer.append(filename, None if spectrogram is None else spectrogram.ravel(), label)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+
+# Function to read the rows of one shard in blocks from a memory map
+def _read_shard(shard_file, block_rows):
+    rows = np.load(shard_file, mmap_mode='r')
+    for start in range(0, len(rows), block_rows):
+        yield np.array(rows[start:start + block_rows])
+
+# Function to build a tf.data pipeline of (spectrogram, label) batches from shards.
+# Shard order is shuffled, cycle_length shards are read in parallel and their rows are
+# mixed in a shuffle buffer of shuffle_buffer rows, then batches are decoded to float32
+# in parallel and prefetched. cache='' keeps the shard rows in memory after the first
+# epoch and a path caches them to a file (both replay the first epoch's shard order);
+# None reads the shards every epoch.
+def spectrogram_dataset(shard_dir, input_shape=(128, 128, 1), batch_size=32, shuffle=True,
+                        shuffle_buffer=4096, cycle_length=4, block_rows=256, cache=None, seed=None):
+    import tensorflow as tf
+
+    shard_files = sorted(glob.glob(os.path.join(shard_dir, 'shard-*.npy')))
+    if not shard_files:
+        raise ValueError(f"no shards in {shard_dir}")
+    sample = np.load(shard_files[0], mmap_mode='r')
+    row_spec = tf.TensorSpec(shape=(None, sample.shape[1]), dtype=tf.as_dtype(sample.dtype))
+
+    def read_shard(shard_file):
+        return tf.data.Dataset.from_generator(
+            _read_shard, args=(shard_file, block_rows), output_signature=row_spec,
+        ).unbatch()
+
+    def decode(rows):
+        rows = tf.cast(rows, tf.float32)
+        return tf.reshape(rows[:, :-1], (-1,) + tuple(input_shape)), rows[:, -1]
+
+    dataset = tf.data.Dataset.from_tensor_slices(shard_files)
+    if shuffle:
+        dataset = dataset.shuffle(len(shard_files), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(read_shard, cycle_length=cycle_length, num_parallel_calls=tf.data.AUTOTUNE,
+                                 deterministic=not shuffle)
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(decode, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write log-mel spectrogram shards for the acoustic model")
+    parser.add_argument('directory', help="directory of audio files")
+    parser.add_argument('label', type=float, help="label of every file in the directory (e.g. 0 fluent, 1 disfluent)")
+    parser.add_argument('shard_dir')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=1000)
+    parser.add_argument('--retry-failed', action='store_true', help="retry files that failed in earlier runs")
+    args = parser.parse_args()
+
+    write_spectrogram_shards(args.directory, args.label, args.shard_dir,
+                             num_workers=args.workers, shard_size=args.shard_size, retry_failed=args.retry_failed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# batch_scoring.py
+
+import argparse
+import csv
+import json
+import os
+import time
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from .feature_cache import FeatureCache
+from .stutter_classifier import StutterInferencePipeline, extract_features
+
+# Batch scoring of audio corpora with the stutter classifier. Feature extraction is
+# spread over a process pool; the extracted vectors stream back to the parent process,
+# which groups them into batches of batch_size for one predict call each and appends
+# every scored file to the predictions CSV as soon as its batch is done. Files are
+# scored in completion order. Workers never import TensorFlow: the model is only loaded
+# by the parent, after the pool has started.
+#
+# Inputs are directories (every audio file below them) or CSV manifests with a 'path'
+# column (relative paths are relative to the manifest) and an optional 'label' column;
+# a directory can carry one label for all its files as DIR=LABEL. Labels are class
+# indices, or names when class_names is given; they are checked before any file is
+# scored. Labeled files get an accuracy, confusion matrix and classification report.
+
+# Function to list the (path, label) pairs of the inputs (label None when unknown)
+def collect_files(inputs):
+    import librosa
+
+    files = []
+    for item in inputs:
+        path, _, label = item.partition('=')
+        if os.path.isdir(path):
+            files += [(filename, label or None) for filename in librosa.util.find_files(path)]
+        else:
+            root = os.path.dirname(path)
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    files.append((os.path.join(root, row['path']), row.get('label') or label or None))
+    return files
+
+# Function to map every distinct label of the (path, label) pairs to its class index.
+# Raises ValueError for a label that is neither one of class_names nor an integer.
+def encode_labels(files, class_names=None):
+    names = class_names or []
+    indices = {}
+    for path, label in files:
+        if label is None or label in indices:
+            continue
+        if label in names:
+            indices[label] = names.index(label)
+            continue
+        try:
+            indices[label] = int(label)
+        except ValueError:
+            expected = f"one of the class names {names}" if names else "a class index (give --class-names to use names)"
+            raise ValueError(f"label {label!r} of {path} is not {expected}") from None
+    return indices
+
+# Function to extract the features of one file in a worker process
+def _extract_file(item, cache_dir=None, vad=False):
+    path, label = item
+    cache = FeatureCache(cache_dir) if cache_dir is not None else None
+    return path, label, extract_features(path, cache=cache, vad=vad)
+
+# Function to score every file; writes the predictions CSV (path, label, prediction,
+# probability of every class; files whose features could not be extracted are listed
+# last, with an empty prediction) and returns the labels, predictions and counters.
+# Labels are checked with encode_labels first, before any file is extracted.
+def score_files(files, pipeline, predictions_path, num_workers=None, batch_size=256, cache_dir=None,
+                vad=False, class_names=None):
+    label_indices = encode_labels(files, class_names)
+    extract = partial(_extract_file, cache_dir=cache_dir, vad=vad)
+    names = class_names or []
+    y_true, y_pred = [], []
+    failed = []
+
+    with open(predictions_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        header_written = False
+        batch = []
+
+        def flush():
+            nonlocal header_written
+            probabilities = pipeline.predict_proba(np.stack([features for path, label, features in batch]))
+            if not header_written:
+                writer.writerow(['path', 'label', 'prediction'] + [f"probability_{_name(i, names)}"
+                                                                     for i in range(probabilities.shape[1])])
+                header_written = True
+            for (path, label, features), row in zip(batch, probabilities):
+                prediction = int(np.argmax(row))
+                writer.writerow([path, label or '', _name(prediction, names)] + [f"{p:.6f}" for p in row])
+                if label is not None:
+                    y_true.append(label_indices[label])
+                    y_pred.append(prediction)
+            batch.clear()
+
+        pool = Pool(num_workers) if num_workers != 1 else None
+        try:
+            results = map(extract, files) if pool is None else pool.imap_unordered(extract, files, chunksize=4)
+            for path, label, features in results:
+                if features is None:
+                    failed.append((path, label))
+                    continue
+                batch.append((path, label, features))
+                if len(batch) == batch_size:
+                    flush()
+            if batch:
+                flush()
+            if not header_written:
+                writer.writerow(['path', 'label', 'prediction'])
+            writer.writerows([path, label or '', ''] for path, label in failed)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    return np.array(y_true, dtype=int), np.array(y_pred, dtype=int), {'files': len(files), 'failed': len(failed)}
+
+def _name(index, class_names):
+    return class_names[index] if index < len(class_names) else str(index)
+
+# Function to compute the evaluation report of the labeled predictions
+def evaluation_report(y_true, y_pred, class_names=None):
+    from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
+
+    labels = sorted(set(y_true.tolist()) | set(y_pred.tolist()))
+    target_names = [_name(i, class_names or []) for i in labels]
+    return {
+        'accuracy': float(accuracy_score(y_true, y_pred)),
+        'labels': target_names,
+        'confusion_matrix': confusion_matrix(y_true, y_pred, labels=labels).tolist(),
+        'classification_report': classification_report(y_true, y_pred, labels=labels, target_names=target_names,
+                                                        output_dict=True, zero_division=0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Score audio files with the stutter classifier")
+    parser.add_argument('inputs', nargs='+', help="directories (DIR or DIR=LABEL) or CSV manifests with 'path' "
+                                                  "and optional 'label' columns")
+    parser.add_argument('--model', default='stutter_classifier_model.h5')
+    parser.add_argument('--scaler', default='stutter_classifier_scaler.npz',
+                        help="scaler artifact from stutter_classifier.fit_scaler ('' to skip scaling)")
+    parser.add_argument('--predictions', default='predictions.csv')
+    parser.add_argument('--report', help="also write the evaluation report to this JSON file")
+    parser.add_argument('--workers', type=int, default=None, help="feature extraction processes (default: every core)")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--cache-dir', help="FeatureCache directory shared by the workers")
+    parser.add_argument('--vad', action='store_true', help="only analyse the speech segments of every file")
+    parser.add_argument('--class-names', nargs='+', help="class names in model output order, e.g. fluent stutter")
+    args = parser.parse_args()
+
+    files = collect_files(args.inputs)
+    try:
+        encode_labels(files, args.class_names)
+    except ValueError as e:
+        parser.error(str(e))
+    pipeline = StutterInferencePipeline(args.model, args.scaler or None)
+
+    start = time.perf_counter()
+    y_true, y_pred, counts = score_files(files, pipeline, args.predictions, num_workers=args.workers,
+                                         batch_size=args.batch_size, cache_dir=args.cache_dir, vad=args.vad,
+                                         class_names=args.class_names)
+    seconds = time.perf_counter() - start
+    print(f"Scored {counts['files'] - counts['failed']} of {counts['files']} files in {seconds:.1f} s "
+          f"({counts['files'] / seconds:.1f} files/s), predictions in {args.predictions}")
+
+    if len(y_true):
+        report = evaluation_report(y_true, y_pred, args.class_names)
+        report.update(counts, seconds=seconds)
+        print(f"Accuracy: {report['accuracy']}")
+        print("Confusion Matrix:")
+        print(np.array(report['confusion_matrix']))
+        print("Classification Report:")
+        for name in report['labels']:
+            scores = report['classification_report'][name]
+            print(f"{name:>12s}  precision {scores['precision']:.3f}  recall {scores['recall']:.3f}  "
+                  f"f1 {scores['f1-score']:.3f}  support {scores['support']}")
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# feature_cache.py
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Persistent feature cache. Entries are addressed by a hash of the audio file content
+# plus the extraction parameters (including a feature set version), so an unchanged
+# recording processed with unchanged settings is never extracted twice, whatever its
+# path. The cache is bounded to max_bytes; the least recently used entries (by file
+# modification time, refreshed on every hit) are evicted first.
+class FeatureCache:
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    # Function to build the cache key of an audio file for a set of extraction parameters
+    def key(self, audio_file, **params):
+        digest = hashlib.sha256()
+        with open(audio_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npy')
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.npy'):
+                    yield os.path.join(root, name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            features = np.load(path)
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        except (ValueError, EOFError):
+            # Truncated or corrupt entry: drop it so the features are recomputed
+            self.misses += 1
+            self._remove(path)
+            return None
+        self.hits += 1
+        return features
+
+    def put(self, key, features):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, features)
+        try:
+            replaced_size = os.path.getsize(path)
+        except OSError:
+            replaced_size = 0
+        os.replace(tmp_path, path)
+        self._size += os.path.getsize(path) - replaced_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self._size -= size
+
+    def _evict(self):
+        # Rescan the directory: other processes may share the cache
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self._size}
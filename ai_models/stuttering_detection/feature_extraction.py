@@ -2,121 +2,501 @@
 
 import librosa
 import numpy as np
-import pandas as pd
-from scipy.stats import skew, kurtosis
-from python_speech_features import mfcc, logfbank, delta
-import pywt
+from functools import partial
+from multiprocessing import Pool
+
+from ..audio_io import load_audio
+from ..profiling import profiled, profiler, stage
+from .feature_store import CsvFeatureWriter, FeatureStoreWriter, ShardFeatureWriter
+from .running_stats import RunningFeatureStats
+from .spectral_context import SpectralContext
+from .voice_activity import detect_speech
+
+# scipy, python_speech_features and pywt are imported by the functions that use them;
+# librosa loads its submodules on first use, so importing this module is cheap.
+
+# The per-frame features are computed by a batched engine that works on the whole
+# framed array at once (one STFT for all frames, one filterbank product, one wavelet
+# decomposition). It reproduces the original frame-by-frame loop (one call to
+# mfcc/logfbank/spectral_*/chroma_stft/pyin/wavedec per frame) to within
+# FEATURE_TOLERANCE (with pitch_method='frame'); the remaining differences come from
+# float32 FFT/BLAS summation order. NaN columns (e.g. MFCC skew/kurtosis of a single
+# analysis window) are kept.
+FEATURE_TOLERANCE = {'rtol': 1e-5, 'atol': 1e-6}
+
+# Frame statistics are accumulated in float64 (see RunningFeatureStats); the feature
+# vectors handed out (and cached and stored) are float32.
+
+# Stages are timed by the profiling hooks (see ai_models.profiling) under
+# 'feature_extraction.<stage>' names. Worker processes keep their own metrics.
+
+# Bump when the feature layout or computation changes (invalidates FeatureCache entries)
+FEATURE_SET_VERSION = 1
+
+# Function to split frames into python_speech_features analysis windows (vectorized framesig)
+def _psf_windows(frames, sample_rate, winlen=0.025, winstep=0.01, preemph=0.97):
+    from python_speech_features.sigproc import round_half_up
+
+    emphasized = np.concatenate((frames[:, :1], frames[:, 1:] - preemph * frames[:, :-1]), axis=1)
+
+    window_length = int(round_half_up(winlen * sample_rate))
+    window_step = int(round_half_up(winstep * sample_rate))
+    frame_length = frames.shape[1]
+    if frame_length <= window_length:
+        num_windows = 1
+    else:
+        num_windows = 1 + int(np.ceil((frame_length - window_length) / window_step))
+
+    padded = np.zeros((frames.shape[0], (num_windows - 1) * window_step + window_length))
+    padded[:, :frame_length] = emphasized
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window_length, axis=1)
+    return windows[:, ::window_step]
+
+# Function to compute python_speech_features filterbank energies for all windows at once
+def _psf_fbank(windows, sample_rate, nfilt=26, nfft=512):
+    from python_speech_features.base import get_filterbanks
+
+    pspec = np.square(np.abs(np.fft.rfft(windows[..., :nfft], nfft, axis=-1))) / nfft
+    energy = np.sum(pspec, axis=-1)
+    energy = np.where(energy == 0, np.finfo(float).eps, energy)
+
+    fb = get_filterbanks(nfilt, nfft, sample_rate, 0, sample_rate / 2)
+    feat = np.dot(pspec, fb.T)
+    feat = np.where(feat == 0, np.finfo(float).eps, feat)
+    return feat, energy
+
+# Function to compute python_speech_features MFCCs from filterbank energies
+def _psf_mfcc(feat, energy, numcep=13, ceplifter=22):
+    from scipy.fftpack import dct
+
+    mfcc_feat = dct(np.log(feat), type=2, axis=-1, norm='ortho')[..., :numcep]
+    n = np.arange(numcep)
+    mfcc_feat = (1 + (ceplifter / 2.) * np.sin(np.pi * n / ceplifter)) * mfcc_feat
+    mfcc_feat[..., 0] = np.log(energy)
+    return mfcc_feat
+
+# Function to compute delta features along the analysis-window axis
+def _psf_delta(feat, N):
+    denominator = 2 * sum(i ** 2 for i in range(1, N + 1))
+    num_windows = feat.shape[1]
+    padded = np.pad(feat, ((0, 0), (N, N), (0, 0)), mode='edge')
+    return sum(n * padded[:, N + n:N + n + num_windows] for n in range(-N, N + 1)) / denominator
+
+# Function to estimate the chroma tuning of every frame (librosa.estimate_tuning, per frame)
+def _frame_tuning(S, sr, n_fft=2048, resolution=0.01, bins_per_octave=12):
+    pitch, mag = librosa.piptrack(S=S, sr=sr, n_fft=n_fft)
+    pitch = pitch.reshape(len(pitch), -1)
+    mag = mag.reshape(len(mag), -1)
+
+    # Median magnitude of the pitched bins of each frame
+    pitch_mask = pitch > 0
+    num_pitched = np.sum(pitch_mask, axis=1)
+    ranked = np.sort(np.where(pitch_mask, mag, np.inf), axis=1)
+    rows = np.arange(len(ranked))
+    lower = ranked[rows, np.maximum(num_pitched - 1, 0) // 2]
+    upper = ranked[rows, num_pitched // 2]
+    threshold = np.where(num_pitched > 0, (lower + upper) / 2, 0.0)
+
+    # Histogram of the deviation from the nearest semitone
+    selected = (mag >= threshold[:, None]) & pitch_mask
+    frame_idx = np.nonzero(selected)[0]
+    residual = np.mod(bins_per_octave * librosa.hz_to_octs(pitch[selected]), 1.0)
+    residual[residual >= 0.5] -= 1.0
+
+    bins = np.linspace(-0.5, 0.5, int(np.ceil(1.0 / resolution)) + 1)
+    num_bins = len(bins) - 1
+    bin_idx = np.clip(np.searchsorted(bins, residual, side='right') - 1, 0, num_bins - 1)
+    counts = np.bincount(frame_idx * num_bins + bin_idx, minlength=len(S) * num_bins)
+    counts = counts.reshape(len(S), num_bins)
+
+    return np.where(np.any(selected, axis=1), bins[np.argmax(counts, axis=1)], 0.0)
+
+# Function to compute chroma_stft for every frame from a batched power spectrogram
+def _frame_chroma(S, sr, n_fft=2048, n_chroma=12):
+    tuning = _frame_tuning(S, sr, n_fft=n_fft, bins_per_octave=n_chroma)
+
+    # Frames sharing a tuning estimate share a chroma filterbank
+    raw_chroma = np.empty((S.shape[0], n_chroma, S.shape[-1]), dtype=S.dtype)
+    for t in np.unique(tuning):
+        chromafb = librosa.filters.chroma(sr=sr, n_fft=n_fft, tuning=t, n_chroma=n_chroma)
+        selected = tuning == t
+        raw_chroma[selected] = np.einsum('cf,...ft->...ct', chromafb, S[selected], optimize=True)
+
+    return librosa.util.normalize(raw_chroma, norm=np.inf, axis=-2)
+
+# Function to run pyin on every frame independently (legacy F0 column)
+def _frame_pitch(frames):
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        frames,
+        fmin=librosa.note_to_hz('C2'),
+        fmax=librosa.note_to_hz('C7')
+    )
+    num_voiced = np.sum(np.isfinite(f0), axis=1)
+    return np.where(num_voiced > 0, np.nansum(f0, axis=1) / np.maximum(num_voiced, 1), 0)
+
+# Function to estimate F0 with a normalized autocorrelation peak picker (0 where unvoiced)
+def _autocorr_pitch(y, sr, fmin, fmax, frame_length, hop_length, voicing_threshold=0.45,
+                    block_frames=1024):
+    y_frames = librosa.util.frame(np.pad(y, frame_length // 2), frame_length=frame_length,
+                                  hop_length=hop_length, axis=0)
+    min_lag = max(int(np.floor(sr / fmax)), 1)
+    max_lag = min(int(np.ceil(sr / fmin)), frame_length - 2)
+
+    # Blocks of frames keep the FFT buffers small on long recordings
+    f0 = np.zeros(len(y_frames))
+    for start in range(0, len(y_frames), block_frames):
+        block = y_frames[start:start + block_frames]
+        block = block - np.mean(block, axis=1, keepdims=True)
+
+        acf = np.fft.irfft(np.abs(np.fft.rfft(block, 2 * frame_length, axis=1)) ** 2, axis=1)
+        power = acf[:, :1]
+        acf = acf[:, :max_lag + 2] / np.where(power > 1e-10, power, np.inf)
+
+        # Strongest local maximum between 1/fmax and 1/fmin, refined by parabolic interpolation
+        candidates = acf[:, min_lag:max_lag + 1]
+        is_peak = (candidates > acf[:, min_lag - 1:max_lag]) & (candidates >= acf[:, min_lag + 1:max_lag + 2])
+        lag = min_lag + np.argmax(np.where(is_peak, candidates, -np.inf), axis=1)
+
+        rows = np.arange(len(acf))
+        left, peak, right = acf[rows, lag - 1], acf[rows, lag], acf[rows, lag + 1]
+        curvature = np.minimum(left - 2 * peak + right, -1e-10)
+        shift = 0.5 * (left - right) / curvature
+
+        voiced = is_peak[rows, lag - min_lag] & (peak >= voicing_threshold)
+        f0[start:start + block_frames] = np.where(voiced, sr / (lag + shift), 0)
+
+    return f0
+
+# Function to run pyin over a signal in blocks of block_frames pitch frames, so memory
+# does not grow with the length of the recording. Every block is analysed with
+# margin_frames extra frames on both sides (plus half an analysis window), so its frames
+# see the same audio as in one call over the whole signal; only the Viterbi smoothing is
+# cut at the far ends of the margins, and it settles well within them.
+def _blocked_pyin(y, sr, fmin, fmax, frame_length, hop_length, block_frames=1024, margin_frames=50):
+    margin_frames += -(-frame_length // (2 * hop_length))
+    num_pitch_frames = 1 + len(y) // hop_length
+    f0 = np.zeros(num_pitch_frames)
+    for start in range(0, num_pitch_frames, block_frames):
+        stop = min(start + block_frames, num_pitch_frames)
+        first = max(start - margin_frames, 0)
+        last = min(stop + margin_frames, num_pitch_frames)
+        block_f0, voiced_flag, voiced_probs = librosa.pyin(
+            y[first * hop_length:(last - 1) * hop_length + 1],
+            fmin=fmin,
+            fmax=fmax,
+            sr=sr,
+            frame_length=frame_length,
+            hop_length=hop_length
+        )
+        f0[start:stop] = np.nan_to_num(block_f0[start - first:stop - first])
+    return f0
+
+# Function to track the pitch of the whole signal once and return one F0 value per frame
+# (pyin and autocorr process block_frames pitch frames at a time)
+def track_pitch(y, sample_rate, frame_length, frame_step, num_frames, method='pyin', block_frames=1024):
+    fmin = librosa.note_to_hz('C2')
+    fmax = librosa.note_to_hz('C7')
+    # Analysis window covering four periods of the lowest pitch
+    pitch_frame_length = int(2 ** np.ceil(np.log2(4 * sample_rate / fmin)))
+
+    if method == 'pyin':
+        f0 = _blocked_pyin(y, sample_rate, fmin, fmax, pitch_frame_length, frame_step, block_frames=block_frames)
+    elif method == 'autocorr':
+        f0 = _autocorr_pitch(y, sample_rate, fmin, fmax, pitch_frame_length, frame_step,
+                             block_frames=block_frames)
+    else:
+        raise ValueError(f"Unknown pitch method: {method}")
+
+    # Pick the pitch estimate centred closest to the centre of each frame
+    offset = int(round(frame_length / 2 / frame_step))
+    return f0[np.minimum(np.arange(num_frames) + offset, len(f0) - 1)]
+
+# Function to compute the per-frame feature matrix for an array of windowed frames
+def extract_frame_features(frames, sample_rate=16000, f0=None):
+    import pywt
+    from scipy.stats import skew, kurtosis
+
+    frame_length = frames.shape[1]
+    context = SpectralContext(frames, sr=sample_rate)
+    with stage('feature_extraction.stft'):
+        context.power
+
+    # 1. Zero-crossing rate (ZCR)
+    with stage('feature_extraction.zcr'):
+        zcr = context.zero_crossing_rate()[:, 0, 0]
+
+    # 2. Energy
+    with stage('feature_extraction.energy'):
+        energy = np.sum(frames ** 2, axis=1) / frame_length
+
+    # 3. Pitch (fundamental frequency - F0), unless tracked over the whole signal
+    if f0 is None:
+        with stage('feature_extraction.frame_pitch'):
+            f0 = _frame_pitch(frames)
+
+    # 4. MFCCs and filterbank energies (python_speech_features windows of each frame)
+    with stage('feature_extraction.mfcc'):
+        windows = _psf_windows(frames, sample_rate)
+        fbank_feat, fbank_energy = _psf_fbank(windows, sample_rate)
+        mfcc_feat = _psf_mfcc(fbank_feat, fbank_energy)
+        fbank_feat = np.log(fbank_feat)
+
+    # 5. Delta features
+    with stage('feature_extraction.delta'):
+        delta_mfcc_feat = _psf_delta(mfcc_feat, 2)
+        delta_fbank_feat = _psf_delta(fbank_feat, 2)
+
+    # 6. Spectral features (one STFT over all frames)
+    with stage('feature_extraction.spectral'):
+        spectral_centroid = context.spectral_centroid()[:, 0, 0]
+        spectral_bandwidth = context.spectral_bandwidth()[:, 0, 0]
+        spectral_rolloff = context.spectral_rolloff()[:, 0, 0]
+        spectral_flatness = context.spectral_flatness()[:, 0, 0]
+
+    # 7. Chroma features
+    with stage('feature_extraction.chroma'):
+        chroma_stft = _frame_chroma(context.power, sample_rate)
+
+    # 8. Wavelet Transform
+    with stage('feature_extraction.wavelet'):
+        wavelet = 'db4'  # Example wavelet
+        coeffs = pywt.wavedec(frames, wavelet, level=4, axis=-1)
+
+    # 9. Other features (e.g., LPC, PLP, etc.)
+    # ...
+
+    # Concatenate all features for every frame
+    with stage('feature_extraction.window_stats'):
+        return np.concatenate((
+            np.stack((zcr, energy, f0), axis=1),
+            np.mean(mfcc_feat, axis=1), np.std(mfcc_feat, axis=1),
+            skew(mfcc_feat, axis=1), kurtosis(mfcc_feat, axis=1),
+            np.mean(fbank_feat, axis=1), np.std(fbank_feat, axis=1),
+            np.mean(delta_mfcc_feat, axis=1), np.std(delta_mfcc_feat, axis=1),
+            np.mean(delta_fbank_feat, axis=1), np.std(delta_fbank_feat, axis=1),
+            np.stack((spectral_centroid, spectral_bandwidth, spectral_rolloff, spectral_flatness), axis=1),
+            np.mean(chroma_stft, axis=1), np.std(chroma_stft, axis=1),
+            *coeffs
+        ), axis=1)
+
+# Function to name the per-frame features of extract_frame_features, in column order
+# (chroma mean and std are taken over the 12 chroma bins)
+def frame_feature_names(frame_length=400, numcep=13, nfilt=26):
+    import pywt
+
+    names = ['zcr', 'energy', 'f0']
+    for group, size in (('mfcc', numcep), ('fbank', nfilt), ('delta_mfcc', numcep), ('delta_fbank', nfilt)):
+        stats = ('mean', 'std', 'skew', 'kurtosis') if group == 'mfcc' else ('mean', 'std')
+        names += [f"{group}_{stat}[{i}]" for stat in stats for i in range(size)]
+    names += ['spectral_centroid', 'spectral_bandwidth', 'spectral_rolloff', 'spectral_flatness',
+              'chroma_mean', 'chroma_std']
+
+    # Wavelet coefficients: approximation of level 4, then details of levels 4 to 1
+    lengths = []
+    length = frame_length
+    for level in range(4):
+        length = pywt.dwt_coeff_len(length, pywt.Wavelet('db4').dec_len, 'symmetric')
+        lengths.append(length)
+    for band, size in zip(('a4', 'd4', 'd3', 'd2', 'd1'), [lengths[3]] + lengths[::-1]):
+        names += [f"wavelet_{band}[{i}]" for i in range(size)]
+    return names
+
+# Function to name the features of extract_features for a sample rate and frame size
+def feature_names(sample_rate=16000, frame_size=0.025):
+    names = frame_feature_names(int(round(frame_size * sample_rate)))
+    return [f"{stat}({name})" for stat in ('mean', 'std', 'p25', 'p75') for name in names]
+
+# Function to aggregate the frame features of frame ranges [start, stop) of a signal:
+# one vector over all ranges, or one per range (per_range=True)
+def _aggregate_frame_ranges(y, ranges, sample_rate, frame_length, frame_step, pitch_method,
+                            block_frames, exact_max_frames, per_range=False):
+    num_frames = 1 + (len(y) - frame_length) // frame_step
+
+    # 1. Pitch tracking over every range (the whole signal without VAD)
+    f0 = None
+    if pitch_method != 'frame':
+        f0 = np.zeros(num_frames)
+        with stage('feature_extraction.pitch'):
+            for start, stop in ranges:
+                segment = y if (start, stop) == (0, num_frames) else y[start * frame_step:(stop - 1) * frame_step + frame_length]
+                f0[start:stop] = track_pitch(segment, sample_rate, frame_length, frame_step, stop - start,
+                                             method=pitch_method, block_frames=block_frames)
+
+    # 2. Pre-emphasis (optional)
+    pre_emphasis = 0.97
+    y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
+
+    # 3. Framing (a read-only view of y, windowed block by block below)
+    frames = librosa.util.frame(y, frame_length=frame_length, hop_length=frame_step).T
+    window = np.hamming(frame_length)
+
+    results = []
+    stats = None
+    for start, stop in ranges:
+        if stats is None or per_range:
+            stats = RunningFeatureStats(percentiles=(25, 75), exact_max_frames=exact_max_frames)
+
+        for block_start in range(start, stop, block_frames):
+            block_stop = min(block_start + block_frames, stop)
+
+            # 4. Hamming window on a copy of the block
+            with stage('feature_extraction.framing'):
+                block = np.array(frames[block_start:block_stop])
+                block *= window
+
+            # 5. Feature extraction for all frames of the block at once
+            block_f0 = None if f0 is None else f0[block_start:block_stop]
+            frame_features = extract_frame_features(block, sample_rate, f0=block_f0)
+            with stage('feature_extraction.aggregate'):
+                stats.update(frame_features)
+
+        # 6. Aggregate features across frames (mean, std, 25th and 75th percentiles)
+        if per_range:
+            with stage('feature_extraction.aggregate'):
+                results.append(stats.result().astype(np.float32))
+
+    if not per_range:
+        with stage('feature_extraction.aggregate'):
+            results.append(stats.result().astype(np.float32))
+    return results
+
+# Function to convert (n, 2) speech segments in seconds to the [start, stop) ranges of the
+# frames they contain (empty, stop <= start, for segments shorter than a frame)
+def _frame_ranges(segments, sample_rate, frame_length, frame_step, num_frames):
+    start = np.ceil(segments[:, 0] * sample_rate / frame_step)
+    stop = np.minimum((segments[:, 1] * sample_rate - frame_length) // frame_step + 1, num_frames)
+    return np.stack((start, stop), axis=1).astype(int)
 
 # Function to extract comprehensive acoustic features from an audio file
-def extract_features(audio_file, sample_rate=16000, frame_size=0.025, frame_stride=0.01):
+# pitch_method: 'pyin' or 'autocorr' track F0 once over the whole signal; 'frame' runs
+# pyin on every frame separately like the original loop (slow, kept for old feature sets).
+# With a FeatureCache, previously extracted vectors are returned without decoding the audio.
+# Frames (and pitch tracking) are processed block_frames at a time and aggregated in one
+# pass; clips longer than exact_max_frames frames get streamed mean/std and sketched
+# (approximate) percentiles. Memory does not grow with the clip beyond the decoded signal.
+# vad=True only processes the speech segments found by voice_activity.detect_speech
+# (pitch is tracked per segment) and aggregates their frames; recordings without
+# detected speech are processed whole.
+# Errors are logged (and counted by the profiler) and return None.
+@profiled('feature_extraction.extract_features')
+def extract_features(audio_file, sample_rate=16000, frame_size=0.025, frame_stride=0.01,
+                     pitch_method='pyin', cache=None, block_frames=1024, exact_max_frames=6000, vad=False):
     try:
-        # 1. Load audio file
-        y, sr = librosa.load(audio_file, sr=sample_rate)
-
-        # 2. Pre-emphasis (optional)
-        pre_emphasis = 0.97
-        y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
+        # 0. Cached result for this audio content and these parameters
+        if cache is not None:
+            cache_key = cache.key(
+                audio_file,
+                feature_set=f"feature_extraction/{FEATURE_SET_VERSION}",
+                sample_rate=sample_rate,
+                frame_size=frame_size,
+                frame_stride=frame_stride,
+                pitch_method=pitch_method,
+                exact_max_frames=exact_max_frames,
+                **({'vad': True} if vad else {})  # Keys of whole-recording extractions are unchanged
+            )
+            cached_features = cache.get(cache_key)
+            if cached_features is not None:
+                return cached_features.astype(np.float32, copy=False)  # Older entries are float64
 
-        # 3. Framing and windowing
+        # 1. Load audio file
+        with stage('feature_extraction.load'):
+            y, sr = load_audio(audio_file, sr=sample_rate)
         frame_length = int(round(frame_size * sample_rate))
         frame_step = int(round(frame_stride * sample_rate))
-        frames = librosa.util.frame(y, frame_length=frame_length, hop_length=frame_step).T
+        num_frames = 1 + (len(y) - frame_length) // frame_step
 
-        # 4. Hamming window
-        frames *= np.hamming(frame_length)
+        # 2. Speech segments, as frame ranges
+        ranges = [(0, num_frames)]
+        if vad:
+            with stage('feature_extraction.vad'):
+                segments = detect_speech(y, sample_rate, frame_length, frame_step)
+            speech_ranges = _frame_ranges(segments, sample_rate, frame_length, frame_step, num_frames)
+            speech_ranges = speech_ranges[speech_ranges[:, 1] > speech_ranges[:, 0]]
+            if len(speech_ranges):
+                ranges = speech_ranges
 
-        # 5. Feature extraction for each frame
-        features = []
-        for frame in frames:
-            # 5.1. Zero-crossing rate (ZCR)
-            zcr = librosa.feature.zero_crossing_rate(frame)[0, 0]
+        # 3. Frame features, aggregated over all frames of the ranges
+        aggregated_features = _aggregate_frame_ranges(y, ranges, sample_rate, frame_length, frame_step, pitch_method,
+                                                      block_frames, exact_max_frames)[0]
 
-            # 5.2. Energy
-            energy = np.sum(frame ** 2) / frame_length
+        if cache is not None:
+            cache.put(cache_key, aggregated_features)
+        return aggregated_features
 
-            # 5.3. Pitch (fundamental frequency - F0)
-            f0, voiced_flag, voiced_probs = librosa.pyin(
-                frame,
-                fmin=librosa.note_to_hz('C2'),
-                fmax=librosa.note_to_hz('C7')
-            )
-            f0 = np.nanmean(f0) if np.any(np.isfinite(f0)) else 0
-
-            # 5.4. MFCCs
-            mfcc_feat = mfcc(frame, samplerate=sample_rate, numcep=13, nfilt=26)
-            mfcc_feat_mean = np.mean(mfcc_feat, axis=0)
-            mfcc_feat_std = np.std(mfcc_feat, axis=0)
-            mfcc_feat_skew = skew(mfcc_feat, axis=0)
-            mfcc_feat_kurtosis = kurtosis(mfcc_feat, axis=0)
-
-            # 5.5. Filterbank energies
-            fbank_feat = logfbank(frame, samplerate=sample_rate, nfilt=26)
-            fbank_feat_mean = np.mean(fbank_feat, axis=0)
-            fbank_feat_std = np.std(fbank_feat, axis=0)
-
-            # 5.6. Delta features
-            delta_mfcc_feat = delta(mfcc_feat, 2)
-            delta_mfcc_feat_mean = np.mean(delta_mfcc_feat, axis=0)
-            delta_mfcc_feat_std = np.std(delta_mfcc_feat, axis=0)
-
-            delta_fbank_feat = delta(fbank_feat, 2)
-            delta_fbank_feat_mean = np.mean(delta_fbank_feat, axis=0)
-            delta_fbank_feat_std = np.std(delta_fbank_feat, axis=0)
-
-            # 5.7. Spectral features
-            spectral_centroid = librosa.feature.spectral_centroid(y=frame, sr=sample_rate)[0, 0]
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=frame, sr=sample_rate)[0, 0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=frame, sr=sample_rate)[0, 0]
-            spectral_flatness = librosa.feature.spectral_flatness(y=frame)[0, 0]
-
-            # 5.8. Chroma features
-            chroma_stft = librosa.feature.chroma_stft(y=frame, sr=sample_rate)
-            chroma_stft_mean = np.mean(chroma_stft, axis=0)
-            chroma_stft_std = np.std(chroma_stft, axis=0)
-
-            # 5.9. Wavelet Transform
-            wavelet = 'db4'  # Example wavelet
-            coeffs = pywt.wavedec(frame, wavelet, level=4)
-            wavelet_features = np.concatenate(coeffs)
-
-            # 5.10. Other features (e.g., LPC, PLP, etc.)
-            # ...
-
-            # Concatenate all features for the current frame
-            frame_features = np.concatenate((
-                [zcr, energy, f0],
-                mfcc_feat_mean, mfcc_feat_std, mfcc_feat_skew, mfcc_feat_kurtosis,
-                fbank_feat_mean, fbank_feat_std,
-                delta_mfcc_feat_mean, delta_mfcc_feat_std,
-                delta_fbank_feat_mean, delta_fbank_feat_std,
-                [spectral_centroid, spectral_bandwidth, spectral_rolloff, spectral_flatness],
-                chroma_stft_mean, chroma_stft_std,
-                wavelet_features
-            ))
-            features.append(frame_features)
-
-        # 6. Aggregate features across frames (e.g., mean, std, percentiles)
-        features = np.array(features)
-        aggregated_features = np.concatenate((
-            np.mean(features, axis=0),
-            np.std(features, axis=0),
-            np.percentile(features, 25, axis=0),
-            np.percentile(features, 75, axis=0)
-        ))
+    except Exception as e:
+        profiler.failure('feature_extraction.extract_features', e, audio_file=audio_file)
+        return None
 
-        return aggregated_features
+# Function to extract one feature vector per speech segment (utterance) of an audio file.
+# Returns the (n, 2) segment times in seconds and the (n, num_features) feature matrix
+# (empty when no speech is found), or None on errors. vad_options are passed to
+# voice_activity.detect_speech.
+@profiled('feature_extraction.extract_segment_features')
+def extract_segment_features(audio_file, sample_rate=16000, frame_size=0.025, frame_stride=0.01,
+                             pitch_method='pyin', block_frames=1024, exact_max_frames=6000, **vad_options):
+    try:
+        with stage('feature_extraction.load'):
+            y, sr = load_audio(audio_file, sr=sample_rate)
+        frame_length = int(round(frame_size * sample_rate))
+        frame_step = int(round(frame_stride * sample_rate))
+        num_frames = 1 + (len(y) - frame_length) // frame_step
+
+        with stage('feature_extraction.vad'):
+            segments = detect_speech(y, sample_rate, frame_length, frame_step, **vad_options)
+        ranges = _frame_ranges(segments, sample_rate, frame_length, frame_step, num_frames)
+        keep = ranges[:, 1] > ranges[:, 0]
+        segments, ranges = segments[keep], ranges[keep]
+        if not len(ranges):
+            return segments, np.zeros((0, 0), dtype=np.float32)
+
+        features = _aggregate_frame_ranges(y, ranges, sample_rate, frame_length, frame_step, pitch_method,
+                                           block_frames, exact_max_frames, per_range=True)
+        return segments, np.array(features)
 
     except Exception as e:
-        print(f"Error extracting features from {audio_file}: {e}")
+        profiler.failure('feature_extraction.extract_segment_features', e, audio_file=audio_file)
         return None
 
-# Function to extract features from a directory of audio files
-def extract_features_from_directory(directory, label, csv_file):
-    features = []
-    for filename in librosa.util.find_files(directory):
-        feature_vector = extract_features(filename)
-        if feature_vector is not None:
-            features.append(np.append(feature_vector, label))
+# Function to extract features from one file in a worker process
+def _extract_file(filename, **kwargs):
+    return filename, extract_features(filename, **kwargs)
+
+# Function to extract features from a directory of audio files.
+# Files are spread over num_workers processes (None uses every core) and each finished
+# file is checkpointed, so rerunning after an interruption only processes the files
+# that are not done yet (retry_failed=True also retries the files that failed). Rows (features followed by the label) go to csv_file, and/or
+# the features and integer labels go to memory-mappable .npy shards of shard_size rows
+# in shard_dir (labels in their own files, see load_shard_labels) and/or to the binary
+# feature store in store_dir with the feature names in its header. Shards and store
+# hold store_dtype values (float32, or float16 for half the size).
+def extract_features_from_directory(directory, label, csv_file=None, shard_dir=None, store_dir=None,
+                                    num_workers=1, shard_size=1000, store_dtype=np.float32, retry_failed=False,
+                                    **kwargs):
+    writers = []
+    if csv_file is not None:
+        writers.append(CsvFeatureWriter(csv_file, retry_failed=retry_failed))
+    if shard_dir is not None:
+        writers.append(ShardFeatureWriter(shard_dir, shard_size=shard_size, dtype=store_dtype, separate_labels=True,
+                                          retry_failed=retry_failed))
+    if store_dir is not None:
+        names = feature_names(kwargs.get('sample_rate', 16000), kwargs.get('frame_size', 0.025))
+        writers.append(FeatureStoreWriter(store_dir, feature_names=names, dtype=store_dtype,
+                                          retry_failed=retry_failed))
+    if not writers:
+        raise ValueError("csv_file, shard_dir or store_dir is required")
 
-    df = pd.DataFrame(features)
-    df.to_csv(csv_file, index=False, header=False)
\ No newline at end of file
+    done = set.intersection(*(writer.done for writer in writers))
+    filenames = [filename for filename in librosa.util.find_files(directory) if filename not in done]
+    extract = partial(_extract_file, **kwargs)
+
+    pool = Pool(num_workers) if num_workers != 1 else None
+    try:
+        results = map(extract, filenames) if pool is None else pool.imap(extract, filenames)
+        for filename, feature_vector in results:
+            for writer in writers:
+                writer.append(filename, feature_vector, label)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        for writer in writers:
+            writer.close()
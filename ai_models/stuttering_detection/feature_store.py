@@ -0,0 +1,406 @@
+# feature_store.py
+
+import glob
+import json
+import os
+import struct
+
+import numpy as np
+
+# Checkpointing writers for extracted feature rows. Every appended file is journaled
+# as soon as its row is on disk, so a writer reopened on the same output knows which
+# files are already done (done) and continues after the last complete row. Features of
+# None record a file that failed to extract (failed); it is journaled but writes no data.
+# Failed files count as done, so reruns skip them, unless the writer is opened with
+# retry_failed=True: then they are extracted again, and a retry that succeeds takes the
+# file off the failure report.
+
+# Writer for the original CSV layout (features followed by the label, no header)
+class CsvFeatureWriter:
+    def __init__(self, csv_file, retry_failed=False):
+        self.csv_file = csv_file
+        self.progress_file = csv_file + '.progress'
+        self.done = set()
+        self.failed = set()
+
+        # Journal lines are "<csv size after the row>\t<file name>"; a failure leaves the
+        # size unchanged
+        offset = 0
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file) as f:
+                for line in f:
+                    size, filename = line.rstrip('\n').split('\t', 1)
+                    if int(size) == offset:
+                        self.failed.add(filename)
+                    else:
+                        self.done.add(filename)
+                        self.failed.discard(filename)
+                    offset = int(size)
+        if not retry_failed:
+            self.done.update(self.failed)
+
+        # Drop anything written after the last journaled row
+        self._csv = open(csv_file, 'ab')
+        self._csv.truncate(offset)
+        self._csv.seek(0, os.SEEK_END)
+        self._progress = open(self.progress_file, 'a')
+
+    def append(self, filename, features, label):
+        if filename in self.done:
+            return
+        if features is not None:
+            import pandas as pd
+            # The label is its own column, so it keeps its type and the features theirs
+            row = pd.DataFrame([np.asarray(features)])
+            row[row.shape[1]] = label
+            self._csv.write(row.to_csv(index=False, header=False).encode())
+            self._csv.flush()
+            self.failed.discard(filename)
+        else:
+            self.failed.add(filename)
+        self._progress.write(f"{self._csv.tell()}\t{filename}\n")
+        self._progress.flush()
+        self.done.add(filename)
+
+    def close(self):
+        self._csv.close()
+        self._progress.close()
+
+# Writer for memory-mappable .npy shards of shard_size rows. shard-NNNNN.npy holds the
+# rows and shard-NNNNN.txt the matching file names; rows of the shard being filled are
+# appended to pending.bin (journal pending.txt) until the shard is complete. Rows are
+# stored as dtype (e.g. float16 for large spectrogram corpora). By default the label is
+# the last value of every row; with separate_labels the rows hold only the features and
+# the int32 labels go to shard-NNNNN.labels.npy (pending.labels.bin while pending), see
+# load_shard_labels. The dtype, label layout and row width are recorded in layout.json
+# (inferred from the first shard for directories written before it existed); reopening
+# with another dtype or separate_labels, or appending rows of another width, raises
+# ValueError instead of misreading the rows already written.
+class ShardFeatureWriter:
+    def __init__(self, shard_dir, shard_size=1000, dtype=np.float64, separate_labels=False, retry_failed=False):
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.dtype = np.dtype(dtype)
+        self.separate_labels = separate_labels
+        os.makedirs(shard_dir, exist_ok=True)
+
+        self.done = set()
+        shard_files = _shard_files(shard_dir)
+        for shard_file in shard_files:
+            self.done.update(_read_lines(shard_file[:-len('.npy')] + '.txt'))
+        self._num_shards = len(shard_files)
+
+        self._layout_file = os.path.join(shard_dir, 'layout.json')
+        layout = _read_shard_layout(self._layout_file, shard_files)
+        if layout is not None and (np.dtype(layout['dtype']) != self.dtype
+                                   or layout['separate_labels'] != separate_labels):
+            raise ValueError(f"{shard_dir} holds {layout['dtype']} rows with separate_labels="
+                             f"{layout['separate_labels']}, not {self.dtype.str} with separate_labels={separate_labels}")
+
+        self._failed_file = os.path.join(shard_dir, 'failed.txt')
+        self.failed = set(_read_lines(self._failed_file)) - self.done
+        if not retry_failed:
+            self.done.update(self.failed)
+        self._retried = False
+
+        # Journal lines are "<row width>\t<file name>"; keep only rows fully on disk
+        self._pending_file = os.path.join(shard_dir, 'pending.bin')
+        self._pending_names_file = os.path.join(shard_dir, 'pending.txt')
+        pending = [line.split('\t', 1) for line in _read_lines(self._pending_names_file)]
+        if pending and pending[0][1] in self.done - self.failed:
+            # The shard was written but the pending files were not cleared
+            pending = []
+        self._pending_names = [filename for width, filename in pending]
+        self.failed.difference_update(self._pending_names)
+        self._width = int(pending[0][0]) if pending else None
+        if layout is not None and self._width is None:
+            self._width = layout['width']
+
+        # Journaled rows are on disk: shorter files were written with another layout
+        self._pending_labels_file = os.path.join(shard_dir, 'pending.labels.bin')
+        pending_sizes = [(self._pending_file, len(pending) * (self._width or 0) * self.dtype.itemsize)]
+        if separate_labels:
+            pending_sizes.append((self._pending_labels_file, len(pending) * np.dtype('<i4').itemsize))
+        for path, size in pending_sizes:
+            if size and (not os.path.exists(path) or os.path.getsize(path) < size):
+                raise ValueError(f"{path} is shorter than its {len(pending)} journaled rows")
+
+        with open(self._pending_names_file, 'w') as f:
+            f.writelines(f"{width}\t{filename}\n" for width, filename in pending)
+        self._pending = open(self._pending_file, 'ab')
+        self._pending.truncate(pending_sizes[0][1])
+        self._pending_labels = None
+        if separate_labels:
+            self._pending_labels = open(self._pending_labels_file, 'ab')
+            self._pending_labels.truncate(pending_sizes[1][1])
+        if not os.path.exists(self._layout_file) or layout['width'] != self._width:
+            self._write_layout()
+        self._pending_names_out = open(self._pending_names_file, 'a')
+        self._failed = open(self._failed_file, 'a')
+        self.done.update(self._pending_names)
+
+    def append(self, filename, features, label):
+        if filename in self.done:
+            return
+        if features is None:
+            _journal_failure(self, filename)
+        else:
+            _clear_failure(self, filename)
+            if self.separate_labels:
+                row = np.asarray(features, dtype=self.dtype)
+                self._pending_labels.write(np.int32(label).tobytes())
+                self._pending_labels.flush()
+            else:
+                row = np.empty(len(features) + 1, dtype=self.dtype)
+                row[:-1] = features
+                row[-1] = label
+            if self._width is None:
+                self._width = len(row)
+                self._write_layout()
+            elif len(row) != self._width:
+                raise ValueError(f"{filename}: row of {len(row)} values, the shards have {self._width}")
+            self._pending.write(row.tobytes())
+            self._pending.flush()
+            self._pending_names_out.write(f"{self._width}\t{filename}\n")
+            self._pending_names_out.flush()
+            self._pending_names.append(filename)
+            if len(self._pending_names) >= self.shard_size:
+                self._write_shard()
+        self.done.add(filename)
+
+    def _write_layout(self):
+        layout = {'dtype': self.dtype.str, 'separate_labels': self.separate_labels, 'width': self._width}
+        with open(self._layout_file + '.tmp', 'w') as f:
+            json.dump(layout, f)
+        os.replace(self._layout_file + '.tmp', self._layout_file)
+
+    def _write_shard(self):
+        rows = np.fromfile(self._pending_file, dtype=self.dtype).reshape(-1, self._width)
+        base = os.path.join(self.shard_dir, f"shard-{self._num_shards:05d}")
+
+        # The .npy file is renamed last: a shard exists once its rows are in place
+        with open(base + '.txt.tmp', 'w') as f:
+            f.writelines(filename + '\n' for filename in self._pending_names)
+        with open(base + '.npy.tmp', 'wb') as f:
+            np.save(f, rows[:len(self._pending_names)])
+        os.replace(base + '.txt.tmp', base + '.txt')
+        if self.separate_labels:
+            labels = np.fromfile(self._pending_labels_file, dtype='<i4')
+            with open(base + '.labels.npy.tmp', 'wb') as f:
+                np.save(f, labels[:len(self._pending_names)])
+            os.replace(base + '.labels.npy.tmp', base + '.labels.npy')
+        os.replace(base + '.npy.tmp', base + '.npy')
+        self._num_shards += 1
+
+        self._pending.truncate(0)
+        if self.separate_labels:
+            self._pending_labels.truncate(0)
+        self._pending_names_out.truncate(0)
+        self._pending_names = []
+
+    def close(self):
+        if self._pending_names:
+            self._write_shard()
+        self._pending.close()
+        if self.separate_labels:
+            self._pending_labels.close()
+        self._pending_names_out.close()
+        _close_failures(self)
+
+# Writer for the binary feature store, a directory of:
+#   features.bin  a header followed by the rows, row-major float32 (or float16) values
+#   labels.bin    the int32 label of every row, in row order
+#   files.txt     the file name of every row, in row order (the journal)
+#   failed.txt    files that failed to extract
+# The header is FEATURE_STORE_MAGIC, the little-endian uint32 length of a JSON object
+# (version, dtype, label_dtype, num_features and feature_names, or null without names)
+# and the JSON object, padded so the rows start on a 64-byte boundary. The number of
+# rows is the number of lines of files.txt. load_feature_store memory-maps a store.
+FEATURE_STORE_MAGIC = b'AIFEATS\x00'
+FEATURE_STORE_VERSION = 1
+
+class FeatureStoreWriter:
+    def __init__(self, store_dir, feature_names=None, dtype=np.float32, retry_failed=False):
+        self.store_dir = store_dir
+        self.feature_names = None if feature_names is None else list(feature_names)
+        self.dtype = np.dtype(dtype)
+        os.makedirs(store_dir, exist_ok=True)
+        self._features_file = os.path.join(store_dir, 'features.bin')
+        self._labels_file = os.path.join(store_dir, 'labels.bin')
+        self._files_file = os.path.join(store_dir, 'files.txt')
+        self._failed_file = os.path.join(store_dir, 'failed.txt')
+
+        # Rows are complete once their file name is journaled; drop anything after them
+        filenames = _read_lines(self._files_file)
+        self._header = None
+        self._data_offset = 0
+        if os.path.exists(self._features_file) and os.path.getsize(self._features_file):
+            self._header, self._data_offset = _read_store_header(self._features_file)
+            if np.dtype(self._header['dtype']) != self.dtype:
+                raise ValueError(f"{store_dir} holds {self._header['dtype']} rows, not {self.dtype}")
+        num_features = self._header['num_features'] if self._header else 0
+
+        self.done = set(filenames)
+        self.failed = set(_read_lines(self._failed_file)) - self.done
+        if not retry_failed:
+            self.done.update(self.failed)
+        self._retried = False
+        with open(self._files_file, 'w') as f:
+            f.writelines(filename + '\n' for filename in filenames)
+        self._features = open(self._features_file, 'ab')
+        self._features.truncate(self._data_offset + len(filenames) * num_features * self.dtype.itemsize)
+        self._labels = open(self._labels_file, 'ab')
+        self._labels.truncate(len(filenames) * np.dtype('<i4').itemsize)
+        self._files = open(self._files_file, 'a')
+        self._failed = open(self._failed_file, 'a')
+
+    def append(self, filename, features, label):
+        if filename in self.done:
+            return
+        if features is None:
+            _journal_failure(self, filename)
+        else:
+            if self._header is None:
+                self._write_header(len(features))
+            elif len(features) != self._header['num_features']:
+                raise ValueError(f"{filename}: {len(features)} features, the store has {self._header['num_features']}")
+            self._features.write(np.asarray(features, dtype=self.dtype).tobytes())
+            self._features.flush()
+            self._labels.write(np.int32(label).tobytes())
+            self._labels.flush()
+            self._files.write(filename + '\n')
+            self._files.flush()
+            _clear_failure(self, filename)
+        self.done.add(filename)
+
+    def _write_header(self, num_features):
+        if self.feature_names is not None and len(self.feature_names) != num_features:
+            raise ValueError(f"{len(self.feature_names)} feature names for {num_features} features")
+        self._header = {
+            'version': FEATURE_STORE_VERSION,
+            'dtype': self.dtype.newbyteorder('<').str,
+            'label_dtype': '<i4',
+            'num_features': num_features,
+            'feature_names': self.feature_names,
+        }
+        header = json.dumps(self._header).encode()
+        self._data_offset = -(-(len(FEATURE_STORE_MAGIC) + 4 + len(header)) // 64) * 64
+        self._features.write(FEATURE_STORE_MAGIC + struct.pack('<I', len(header)) + header)
+        self._features.write(b' ' * (self._data_offset - self._features.tell()))
+
+    def close(self):
+        self._features.close()
+        self._labels.close()
+        self._files.close()
+        _close_failures(self)
+
+# Functions to keep the failed.txt report of the shard and store writers: a failure is
+# journaled once, and files retried successfully are removed from it on close
+def _journal_failure(writer, filename):
+    if filename not in writer.failed:
+        writer._failed.write(filename + '\n')
+        writer._failed.flush()
+        writer.failed.add(filename)
+
+def _clear_failure(writer, filename):
+    if filename in writer.failed:
+        writer.failed.discard(filename)
+        writer._retried = True
+
+def _close_failures(writer):
+    writer._failed.close()
+    if writer._retried:
+        failed = [filename for filename in _read_lines(writer._failed_file) if filename in writer.failed]
+        with open(writer._failed_file + '.tmp', 'w') as f:
+            f.writelines(filename + '\n' for filename in failed)
+        os.replace(writer._failed_file + '.tmp', writer._failed_file)
+
+# Function to read the lines of a text file (empty if it does not exist)
+def _read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+# Function to memory-map the shards written by ShardFeatureWriter.
+# Returns the list of shard arrays and the list of file names of every row.
+def load_shards(shard_dir, mmap_mode='r'):
+    shards = []
+    filenames = []
+    for shard_file in _shard_files(shard_dir):
+        shards.append(np.load(shard_file, mmap_mode=mmap_mode))
+        filenames.extend(_read_lines(shard_file[:-len('.npy')] + '.txt'))
+    return shards, filenames
+
+# Function to load the labels of shards written with separate_labels, one int32 array
+# per shard array of load_shards
+def load_shard_labels(shard_dir):
+    return [np.load(shard_file[:-len('.npy')] + '.labels.npy') for shard_file in _shard_files(shard_dir)]
+
+# Function to read the layout of a shard directory: layout.json, or for directories
+# written before it existed, the dtype and width of the first shard (None without shards)
+def _read_shard_layout(layout_file, shard_files):
+    if os.path.exists(layout_file):
+        with open(layout_file) as f:
+            return json.load(f)
+    if not shard_files:
+        return None
+    rows = np.load(shard_files[0], mmap_mode='r')
+    return {'dtype': rows.dtype.str, 'separate_labels': os.path.exists(shard_files[0][:-len('.npy')] + '.labels.npy'),
+            'width': rows.shape[1]}
+
+# Function to list the row shards of a shard directory, in order
+def _shard_files(shard_dir):
+    return sorted(path for path in glob.glob(os.path.join(shard_dir, 'shard-*.npy'))
+                  if not path.endswith('.labels.npy'))
+
+# Function to read the header of a feature store's features.bin; returns the header
+# dict and the offset of the first row
+def _read_store_header(features_file):
+    with open(features_file, 'rb') as f:
+        prefix = f.read(len(FEATURE_STORE_MAGIC) + 4)
+        if len(prefix) < len(FEATURE_STORE_MAGIC) + 4 or prefix[:len(FEATURE_STORE_MAGIC)] != FEATURE_STORE_MAGIC:
+            raise ValueError(f"{features_file} is not a feature store")
+        header = json.loads(f.read(struct.unpack('<I', prefix[len(FEATURE_STORE_MAGIC):])[0]))
+        data_offset = -(-f.tell() // 64) * 64
+    if header['version'] > FEATURE_STORE_VERSION:
+        raise ValueError(f"{features_file} has feature store version {header['version']}")
+    return header, data_offset
+
+# Function to memory-map a store written by FeatureStoreWriter. Returns the
+# (rows, num_features) feature array (in the stored dtype), the int32 labels, the
+# feature names (None if the store has none) and the file name of every row. The
+# arrays can be passed to model.fit directly, or streamed as float32 batches with
+# feature_store_dataset.
+def load_feature_store(store_dir, mmap_mode='r'):
+    features_file = os.path.join(store_dir, 'features.bin')
+    header, data_offset = _read_store_header(features_file)
+    filenames = _read_lines(os.path.join(store_dir, 'files.txt'))
+    shape = (len(filenames), header['num_features'])
+    if not filenames:
+        return (np.zeros(shape, dtype=header['dtype']), np.zeros(0, dtype=header['label_dtype']),
+                header['feature_names'], filenames)
+
+    features = np.memmap(features_file, dtype=header['dtype'], mode=mmap_mode, offset=data_offset, shape=shape)
+    labels = np.memmap(os.path.join(store_dir, 'labels.bin'), dtype=header['label_dtype'], mode=mmap_mode,
+                       shape=shape[:1])
+    return features, labels, header['feature_names'], filenames
+
+# Function to build a tf.data pipeline of (features, labels) batches from a feature
+# store. Rows are read from the memory map batch by batch (in a new random order every
+# epoch with shuffle) and converted to float32, so the store never has to fit in memory.
+def feature_store_dataset(store_dir, batch_size=32, shuffle=True, seed=None):
+    import tensorflow as tf
+
+    features, labels, feature_names, filenames = load_feature_store(store_dir)
+    rng = np.random.default_rng(seed)
+
+    def batches():
+        order = rng.permutation(len(labels)) if shuffle else np.arange(len(labels))
+        for start in range(0, len(order), batch_size):
+            indices = np.sort(order[start:start + batch_size])  # Reads in file order
+            yield features[indices].astype(np.float32), np.asarray(labels[indices])
+
+    output_signature = (tf.TensorSpec(shape=(None, features.shape[1]), dtype=tf.float32),
+                        tf.TensorSpec(shape=(None,), dtype=tf.int32))
+    return tf.data.Dataset.from_generator(batches, output_signature=output_signature).prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,214 @@
+# inference_server.py
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from ..profiling import profiler
+from .stutter_classifier import StutterInferencePipeline
+
+# Dynamic micro-batching: feature vectors submitted from many threads are queued and
+# grouped into one predict call per batch. A batch is closed when it holds
+# max_batch_size vectors or when max_delay seconds have passed since its first vector
+# arrived, whichever comes first, so a lone request waits at most max_delay.
+# Malformed vectors are rejected by submit (num_features, when given, fixes the vector
+# width), and vectors of different shapes are predicted separately, so one bad request
+# never fails the other requests of its batch. Failed predict calls are counted (errors,
+# failed_vectors) and their exception is set on the futures of their vectors.
+class MicroBatcher:
+    def __init__(self, predict, max_batch_size=64, max_delay=0.005, num_features=None):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.num_features = num_features
+        self.batches = 0
+        self.vectors = 0
+        self.errors = 0
+        self.failed_vectors = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Function to queue one feature vector; the Future resolves to its probabilities
+    def submit(self, features):
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 1 or (self.num_features is not None and len(features) != self.num_features):
+            raise ValueError(f"expected a vector of {self.num_features or 'n'} features, got shape {features.shape}")
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for features, future in batch:
+                groups.setdefault(features.shape, []).append((features, future))
+            for group in groups.values():
+                self._predict_group(group)
+
+    def _predict_group(self, group):
+        futures = [future for features, future in group]
+        try:
+            probabilities = np.asarray(self.predict(np.stack([features for features, future in group])))
+        except Exception as e:
+            self.errors += 1
+            self.failed_vectors += len(group)
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.vectors += len(group)
+        for future, row in zip(futures, probabilities):
+            future.set_result(row)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'vectors': self.vectors,
+            'mean_batch_size': self.vectors / self.batches if self.batches else 0.0,
+            'errors': self.errors,
+            'failed_vectors': self.failed_vectors,
+        }
+
+# HTTP front end: POST /predict {"features": [[...], ...]} returns the probabilities and
+# predicted labels of every vector; GET /stats reports the batching counters and
+# GET /metrics the batching counters and the profiler's stage metrics (Prometheus text
+# format; stage metrics need profiling enabled, e.g. --profile). Malformed requests get
+# a 400, failures of the model itself a 500.
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            futures = [self.batcher.submit(features) for features in body['features']]
+        except (ValueError, TypeError, KeyError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        try:
+            probabilities = np.array([future.result() for future in futures])
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+            return
+        self._send(200, {
+            'probabilities': probabilities.tolist(),
+            'labels': np.argmax(probabilities, axis=1).tolist(),
+        })
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send(200, self.batcher.stats())
+        elif self.path == '/metrics':
+            self._send_text(200, self._metrics())
+        elif self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def _metrics(self):
+        stats = self.batcher.stats()
+        lines = [
+            "# TYPE ai_models_batches_total counter",
+            f"ai_models_batches_total {stats['batches']}",
+            "# TYPE ai_models_vectors_total counter",
+            f"ai_models_vectors_total {stats['vectors']}",
+            "# TYPE ai_models_prediction_errors_total counter",
+            f"ai_models_prediction_errors_total {stats['errors']}",
+        ]
+        return '\n'.join(lines) + '\n' + profiler.render_prometheus()
+
+    def _send(self, status, payload):
+        self._send_bytes(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send_text(self, status, text):
+        self._send_bytes(status, text.encode(), 'text/plain; version=0.0.4')
+
+    def _send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+# Threaded HTTP server with a listen backlog sized for many simultaneous clients
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+# Function to create (not start) an inference server around a predict function
+def create_server(predict, host='127.0.0.1', port=8500, max_batch_size=64, max_delay=0.005, num_features=None):
+    handler = type('Handler', (InferenceRequestHandler,), {
+        'batcher': MicroBatcher(predict, max_batch_size=max_batch_size, max_delay=max_delay,
+                                num_features=num_features),
+    })
+    return InferenceServer((host, port), handler)
+
+# Minimal client for the inference server
+class InferenceClient:
+    def __init__(self, url='http://127.0.0.1:8500'):
+        self.url = url.rstrip('/')
+
+    def predict(self, features):
+        data = json.dumps({'features': np.atleast_2d(features).tolist()}).encode()
+        request = urllib.request.Request(self.url + '/predict', data=data,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            return np.array(json.loads(response.read())['probabilities'])
+
+    def stats(self):
+        with urllib.request.urlopen(self.url + '/stats') as response:
+            return json.loads(response.read())
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the stutter classifier with dynamic micro-batching")
+    parser.add_argument('--model', default='stutter_classifier_model.h5')
+    parser.add_argument('--scaler', default='stutter_classifier_scaler.npz',
+                        help="scaler artifact from stutter_classifier.fit_scaler ('' to skip scaling)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8500)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-delay-ms', type=float, default=5.0)
+    parser.add_argument('--profile', action='store_true', help="record stage metrics for GET /metrics")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+
+    # The model is loaded once, up front, for the lifetime of the server
+    pipeline = StutterInferencePipeline(args.model, args.scaler or None)
+    pipeline.model
+
+    num_features = None if pipeline.offset is None else len(pipeline.offset)
+    server = create_server(pipeline.predict_proba, host=args.host, port=args.port,
+                           max_batch_size=args.max_batch_size, max_delay=args.max_delay_ms / 1000,
+                           num_features=num_features)
+    print(f"Serving {args.model} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
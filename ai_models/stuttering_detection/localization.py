@@ -0,0 +1,157 @@
+# localization.py
+
+import argparse
+import json
+
+import numpy as np
+
+from ..audio_io import load_audio
+from ..profiling import profiled, stage
+from .stutter_classifier import StutterInferencePipeline, _signal_frame_features
+from .stutter_features import aggregate_features
+
+# Sliding-window disfluency localization for whole sessions. The per-frame features of
+# the recording are computed once; every window's clip vector (the layout of
+# stutter_classifier.extract_features: mean and std of every feature over the window's
+# frames) is then read off prefix sums of the frames and of their squares, in O(1) per
+# window however much the windows overlap, and all windows are classified in batches.
+#
+# Windows aggregate the frames of the whole recording, so they differ slightly from
+# extract_features on audio cut to the window: the frames at the window edges see the
+# neighbouring audio instead of padding, and the chroma tuning is estimated once for the
+# recording.
+SAMPLE_RATE = 16000
+HOP_LENGTH = 512  # SpectralContext's hop_length
+
+# Function to compute the clip vectors of sliding windows over a (features x frames)
+# matrix. Windows hold window_frames frames and start every hop_frames frames; the last
+# window is aligned with the end of the recording, and a recording shorter than one
+# window gets a single window over all its frames. Returns the start frame of every
+# window, the window length in frames and the (windows, 2 * features) clip vectors.
+def window_features(frames, window_frames, hop_frames):
+    num_frames = frames.shape[1]
+    window_frames = min(window_frames, num_frames)
+    starts = np.arange(0, num_frames - window_frames + 1, hop_frames)
+    if starts[-1] + window_frames < num_frames:
+        starts = np.append(starts, num_frames - window_frames)
+    ends = starts + window_frames
+
+    # Centre the frames first: the variance from prefix sums of squares loses precision
+    # when a feature's mean is large compared to its spread (e.g. mel power)
+    frames = frames.T.astype(np.float64)
+    offset = np.mean(frames, axis=0)
+    frames -= offset
+    sums = np.zeros((num_frames + 1, frames.shape[1]))
+    np.cumsum(frames, axis=0, out=sums[1:])
+    squares = np.zeros_like(sums)
+    np.cumsum(frames ** 2, axis=0, out=squares[1:])
+
+    mean = (sums[ends] - sums[starts]) / window_frames
+    variance = (squares[ends] - squares[starts]) / window_frames - mean ** 2
+    return starts, window_frames, aggregate_features(mean + offset, np.sqrt(np.maximum(variance, 0)))
+
+# Function to classify sliding windows of a signal. Returns the (windows, 2) start/end
+# times in seconds and the class probabilities of every window.
+def scan_signal(y, pipeline, sr=SAMPLE_RATE, window_seconds=3.0, hop_seconds=0.5, batch_size=256):
+    frames = _signal_frame_features(y, sr)
+    with stage('localization.windows'):
+        window_frames = max(1, int(round(window_seconds * sr / HOP_LENGTH)))
+        hop_frames = max(1, int(round(hop_seconds * sr / HOP_LENGTH)))
+        starts, window_frames, features = window_features(frames, window_frames, hop_frames)
+
+    # Frame i is centred on i * HOP_LENGTH: a window spans its first to its last frame
+    duration = len(y) / sr
+    times = np.column_stack((starts, starts + window_frames)) * HOP_LENGTH / sr
+    times = np.minimum(times, duration)
+
+    with stage('localization.predict'):
+        probabilities = np.concatenate([pipeline.predict_proba(features[i:i + batch_size])
+                                        for i in range(0, len(features), batch_size)])
+    return times, probabilities
+
+# Function to merge disfluent windows into events. A window is disfluent when the
+# probability of all classes but fluent_class reaches threshold; runs of disfluent
+# windows whose times overlap form one event. Every event has its start/end time, the
+# disfluency class with the highest mean probability over its disfluent windows and the
+# peak disfluency probability.
+def disfluency_events(times, probabilities, fluent_class=0, threshold=0.5, class_names=None):
+    disfluent_probabilities = 1.0 - probabilities[:, fluent_class]
+    disfluent = disfluent_probabilities >= threshold
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], disfluent.astype(np.int8), [0]))))
+
+    # Runs whose windows overlap in time belong to the same event
+    runs = []
+    for first, last in zip(edges[0::2], edges[1::2]):
+        if runs and times[first, 0] <= times[runs[-1][-1] - 1, 1]:
+            runs[-1].append(last)
+        else:
+            runs.append([first, last])
+
+    events = []
+    for run in runs:
+        first, last = run[0], run[-1]
+        windows = np.flatnonzero(disfluent[first:last]) + first
+        class_probabilities = np.mean(probabilities[windows], axis=0)
+        class_probabilities[fluent_class] = -1.0
+        label = int(np.argmax(class_probabilities))
+        events.append({
+            'start': float(times[first, 0]),
+            'end': float(times[last - 1, 1]),
+            'label': class_names[label] if class_names else label,
+            'probability': float(np.max(disfluent_probabilities[first:last])),
+        })
+    return events
+
+# Function to build the disfluency timeline of an audio file: every window with its
+# class probabilities and the merged disfluency events (see disfluency_events)
+@profiled('localization.scan_file')
+def scan_file(audio_file, pipeline, window_seconds=3.0, hop_seconds=0.5, batch_size=256, fluent_class=0,
+              threshold=0.5, class_names=None):
+    with stage('localization.load'):
+        y, sr = load_audio(audio_file, sr=SAMPLE_RATE)
+    times, probabilities = scan_signal(y, pipeline, sr=sr, window_seconds=window_seconds, hop_seconds=hop_seconds,
+                                       batch_size=batch_size)
+    return {
+        'audio_file': audio_file,
+        'duration': len(y) / sr,
+        'window_seconds': window_seconds,
+        'hop_seconds': hop_seconds,
+        'windows': [{'start': float(start), 'end': float(end), 'probabilities': row.tolist()}
+                    for (start, end), row in zip(times, probabilities)],
+        'events': disfluency_events(times, probabilities, fluent_class=fluent_class, threshold=threshold,
+                                    class_names=class_names),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Locate disfluencies in recordings with sliding windows")
+    parser.add_argument('audio_files', nargs='+')
+    parser.add_argument('--model', default='stutter_classifier_model.h5')
+    parser.add_argument('--scaler', default='stutter_classifier_scaler.npz',
+                        help="scaler artifact from stutter_classifier.fit_scaler ('' to skip scaling)")
+    parser.add_argument('--window', type=float, default=3.0, help="window length in seconds")
+    parser.add_argument('--hop', type=float, default=0.5, help="seconds between window starts")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--fluent-class', type=int, default=0, help="model output index of fluent speech")
+    parser.add_argument('--threshold', type=float, default=0.5, help="disfluency probability of an event window")
+    parser.add_argument('--class-names', nargs='+', help="class names in model output order, e.g. fluent stutter")
+    parser.add_argument('--json', help="write the timelines to this JSON file")
+    args = parser.parse_args()
+
+    pipeline = StutterInferencePipeline(args.model, args.scaler or None)
+    timelines = []
+    for audio_file in args.audio_files:
+        timeline = scan_file(audio_file, pipeline, window_seconds=args.window, hop_seconds=args.hop,
+                             batch_size=args.batch_size, fluent_class=args.fluent_class, threshold=args.threshold,
+                             class_names=args.class_names)
+        timelines.append(timeline)
+        print(f"{audio_file}: {len(timeline['windows'])} windows, {len(timeline['events'])} disfluency events")
+        for event in timeline['events']:
+            print(f"  {event['start']:8.2f} - {event['end']:8.2f} s  {event['label']}  "
+                  f"p={event['probability']:.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(timelines, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# running_stats.py
+
+import numpy as np
+
+# One-pass aggregation of per-frame feature blocks into mean, std and percentiles.
+# Mean and variance are merged block by block (Welford / Chan et al.), percentiles come
+# from a mergeable quantile sketch, so memory does not grow with the number of frames.
+# Up to exact_max_frames frames are also kept verbatim and, while the clip stays that
+# short, the result is computed exactly with np.mean/np.std/np.percentile.
+class RunningFeatureStats:
+    def __init__(self, percentiles=(25, 75), exact_max_frames=6000, sketch_size=512):
+        self.percentiles = percentiles
+        self.exact_max_frames = exact_max_frames
+        self.count = 0
+        self._mean = None
+        self._m2 = None
+        self._has_nan = None
+        self._exact_blocks = []
+        self._sketch = _QuantileSketch(sketch_size)
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        if self._mean is None:
+            self._mean = np.zeros(block.shape[1])
+            self._m2 = np.zeros(block.shape[1])
+            self._has_nan = np.zeros(block.shape[1], dtype=bool)
+
+        # Merge the block mean/variance into the running moments
+        block_count = len(block)
+        block_mean = np.mean(block, axis=0)
+        block_m2 = np.sum((block - block_mean) ** 2, axis=0)
+        total = self.count + block_count
+        delta = block_mean - self._mean
+        self._mean += delta * block_count / total
+        self._m2 += block_m2 + delta ** 2 * self.count * block_count / total
+        self.count = total
+        self._has_nan |= np.any(np.isnan(block), axis=0)
+
+        # Keep frames for the exact path until the clip gets too long
+        if self._exact_blocks is not None:
+            self._exact_blocks.append(block)
+            if self.count > self.exact_max_frames:
+                for exact_block in self._exact_blocks:
+                    self._sketch.update(exact_block)
+                self._exact_blocks = None
+        else:
+            self._sketch.update(block)
+
+    def exact(self):
+        return self._exact_blocks is not None
+
+    # Function to return (mean, std, percentile_1, percentile_2, ...) concatenated
+    def result(self):
+        if self.exact():
+            features = np.concatenate(self._exact_blocks)
+            return np.concatenate(
+                [np.mean(features, axis=0), np.std(features, axis=0)]
+                + [np.percentile(features, q, axis=0) for q in self.percentiles]
+            )
+
+        quantiles = [self._sketch.quantile(q / 100) for q in self.percentiles]
+        for quantile in quantiles:
+            quantile[self._has_nan] = np.nan
+        return np.concatenate([self._mean, np.sqrt(self._m2 / self.count)] + quantiles)
+
+# Mergeable quantile sketch over feature columns (a vectorized KLL-style compactor stack).
+# Level i holds rows that each stand for 2**i frames; a full level is sorted per column and
+# every other row is promoted to the next level. Memory is O(size * log(frames / size)) rows
+# and the rank error of a quantile is roughly log2(frames / size) / size.
+class _QuantileSketch:
+    def __init__(self, size):
+        self.size = size
+        self._levels = []
+        self._offset = 0
+
+    def update(self, rows):
+        level = 0
+        while rows is not None:
+            if level == len(self._levels):
+                self._levels.append(rows)
+            else:
+                self._levels[level] = np.concatenate((self._levels[level], rows))
+
+            rows = None
+            if len(self._levels[level]) >= 2 * self.size:
+                # Alternate which half survives so the rounding does not bias the ranks
+                rows = np.sort(self._levels[level], axis=0)[self._offset::2]
+                self._offset ^= 1
+                self._levels[level] = self._levels[level][:0]
+            level += 1
+
+    def quantile(self, q):
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(rows), 2.0 ** level) for level, rows in enumerate(self._levels)])
+
+        order = np.argsort(values, axis=0)
+        sorted_values = np.take_along_axis(values, order, axis=0)
+        cumulative = np.cumsum(weights[order], axis=0)
+        index = np.argmax(cumulative >= q * cumulative[-1], axis=0)
+        return sorted_values[index, np.arange(values.shape[1])]
@@ -0,0 +1,314 @@
+# sequence_classifier.py
+
+import argparse
+import threading
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from ..audio_io import load_audio
+from ..profiling import profiled, profiler, stage
+from ..sequence_layers import sequence_encoder
+from .feature_cache import FeatureCache
+from .stutter_classifier import FEATURE_SET_VERSION, _signal_frame_features
+from .stutter_features import NUM_FRAME_FEATURES
+
+# Sequence-aware stutter classifier. Instead of the clip vector of stutter_classifier
+# (mean and std of every feature over the whole clip), the model reads the per-frame
+# feature matrix (frames x NUM_FRAME_FEATURES, the same features, optionally averaged
+# over groups of downsample frames) and classifies every frame; the clip probabilities
+# are the mean of the frame probabilities. The frame probabilities locate disfluencies
+# in time (predict_frames) without rescanning windows of the clip.
+#
+# Clips keep their own length: batches are built from clips of similar length
+# (length_batches) and zero-padded to the longest clip of the batch only, and a Masking
+# layer hides the padding from the encoder, the attention and the clip average, so the
+# result of a clip does not depend on the batch it is in and the work per clip grows
+# with its length. Padded steps are all-zero frames; scaled features are never all zero.
+#
+# Masking needs a recurrent encoder: the 'conv' architecture of sequence_layers does not
+# propagate the mask, so it is not available here.
+ARCHITECTURES = ('lstm', 'fast_lstm')
+
+# Frame step of the per-frame features (SpectralContext's hop_length at 16 kHz)
+SAMPLE_RATE = 16000
+HOP_LENGTH = 512
+
+# Function to average every group of factor consecutive frames of a (frames, features)
+# matrix (the last group may be shorter)
+def downsample_frames(frames, factor):
+    if factor == 1:
+        return frames
+    starts = np.arange(0, len(frames), factor)
+    counts = np.diff(np.append(starts, len(frames)))
+    return np.add.reduceat(frames, starts, axis=0) / counts[:, np.newaxis]
+
+# Function to return the (start, end) time in seconds of every sequence frame of a clip
+# (frame i of the STFT is centred on i * HOP_LENGTH). Without duration, the last frame
+# may end up to one frame past the end of the clip.
+def frame_times(num_frames, downsample=2, duration=None):
+    edges = (np.arange(num_frames + 1) * downsample - 0.5) * HOP_LENGTH / SAMPLE_RATE
+    edges = np.clip(edges, 0.0, duration)
+    return np.column_stack((edges[:-1], edges[1:]))
+
+# Function to extract the per-frame feature sequence of an audio file as a (frames,
+# NUM_FRAME_FEATURES) float32 matrix (optionally through a FeatureCache). Errors are
+# logged and return None.
+@profiled('sequence_classifier.extract_sequence')
+def extract_sequence(audio_file, downsample=2, cache=None):
+    try:
+        if cache is not None:
+            cache_key = cache.key(audio_file, feature_set=f"stutter_sequence/{FEATURE_SET_VERSION}",
+                                  sample_rate=SAMPLE_RATE, downsample=downsample)
+            cached_sequence = cache.get(cache_key)
+            if cached_sequence is not None:
+                return cached_sequence
+
+        with stage('sequence_classifier.load'):
+            y, sr = load_audio(audio_file, sr=SAMPLE_RATE)
+        frames = _signal_frame_features(y, sr).T
+        with stage('sequence_classifier.downsample'):
+            sequence = downsample_frames(frames, downsample).astype(np.float32)
+
+        if cache is not None:
+            cache.put(cache_key, sequence)
+        return sequence
+    except Exception as e:
+        profiler.failure('sequence_classifier.extract_sequence', e, audio_file=audio_file)
+        return None
+
+# Function to group sequence indices into batches of similar length (length bucketing).
+# Without shuffle the batches follow increasing length. With shuffle, lengths within
+# bucket_width frames of each other are mixed randomly, so batch compositions change
+# from epoch to epoch, and the batch order is shuffled.
+def length_batches(lengths, batch_size=32, shuffle=False, bucket_width=8, rng=None):
+    lengths = np.asarray(lengths, dtype=np.float64)
+    if shuffle:
+        rng = rng if rng is not None else np.random.default_rng()
+        order = np.argsort(lengths + rng.uniform(0, bucket_width, len(lengths)), kind='stable')
+    else:
+        order = np.argsort(lengths, kind='stable')
+    batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    if shuffle:
+        rng.shuffle(batches)
+    return batches
+
+# Function to zero-pad the sequences of a batch to its longest sequence
+def pad_batch(sequences, indices):
+    length = max(len(sequences[i]) for i in indices)
+    batch = np.zeros((len(indices), length, sequences[indices[0]].shape[1]), dtype=np.float32)
+    for row, i in enumerate(indices):
+        batch[row, :len(sequences[i])] = sequences[i]
+    return batch
+
+# Function to create the masked sequence model: per-frame class probabilities (layer
+# 'frame_probabilities') averaged over the unmasked frames into clip probabilities
+def create_sequence_classifier(num_features=NUM_FRAME_FEATURES, num_classes=2, architecture='lstm'):
+    from tensorflow.keras.layers import Input, Masking, Dense, Dropout, Attention, GlobalAveragePooling1D
+    from tensorflow.keras.models import Model
+
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"architecture {architecture!r} cannot mask padded frames, expected one of {ARCHITECTURES}")
+
+    inputs = Input(shape=(None, num_features))
+    masked = Masking(mask_value=0.0)(inputs)
+
+    # Sequence encoder and self-attention over the unpadded frames of each clip
+    x = sequence_encoder(masked, architecture=architecture)
+    x = Attention()([x, x])
+
+    # Frame-level classification, averaged into the clip prediction
+    x = Dense(64, activation='relu')(x)
+    x = Dropout(0.5)(x)
+    frame_outputs = Dense(num_classes, activation='softmax', name='frame_probabilities')(x)
+    outputs = GlobalAveragePooling1D(name='clip_probabilities')(frame_outputs)
+
+    model = Model(inputs=inputs, outputs=outputs)
+    return model
+
+# Function to fit the per-feature scaler over every frame of the training sequences and
+# save it with the downsampling factor of the sequences
+def fit_frame_scaler(sequences, scaler_path='stutter_sequence_scaler.npz', downsample=2):
+    frames = np.concatenate(sequences).astype(np.float64)
+    mean = np.mean(frames, axis=0)
+    scale = np.std(frames, axis=0)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0  # Constant features are left unscaled
+    np.savez(scaler_path, mean=mean, scale=scale, downsample=downsample)
+    return mean, scale
+
+# Function to build a tf.data pipeline of length-bucketed, padded (batch, labels) pairs.
+# Every epoch draws new batches when shuffle is set.
+def sequence_dataset(sequences, labels, batch_size=32, shuffle=True, bucket_width=8, seed=None):
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels, dtype=np.int32)
+
+    def batches():
+        for indices in length_batches([len(sequence) for sequence in sequences], batch_size, shuffle=shuffle,
+                                      bucket_width=bucket_width, rng=rng):
+            yield pad_batch(sequences, indices), labels[indices]
+
+    output_signature = (tf.TensorSpec(shape=(None, None, sequences[0].shape[1]), dtype=tf.float32),
+                        tf.TensorSpec(shape=(None,), dtype=tf.int32))
+    return tf.data.Dataset.from_generator(batches, output_signature=output_signature).prefetch(2)
+
+# Function to train and save the sequence classifier and its scaler on per-frame
+# feature sequences (see extract_sequence) and integer class labels. The model is saved
+# in the .keras format: Keras 3 cannot load the Masking layer back from an .h5 file.
+def train_sequence_classifier(sequences, labels, model_path='stutter_sequence_model.keras',
+                              scaler_path='stutter_sequence_scaler.npz', downsample=2, epochs=100,
+                              batch_size=32, bucket_width=8, architecture='lstm', num_classes=None):
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    labels = np.asarray(labels)
+    num_classes = num_classes or int(labels.max()) + 1
+    train_index, val_index = train_test_split(np.arange(len(sequences)), test_size=0.2, random_state=42)
+
+    # Scale with the statistics of the training frames
+    offset, scale = fit_frame_scaler([sequences[i] for i in train_index], scaler_path, downsample=downsample)
+    factor = (1.0 / scale).astype(np.float32)
+    offset = offset.astype(np.float32)
+    scaled = [(sequence - offset) * factor for sequence in sequences]
+
+    train_data = sequence_dataset([scaled[i] for i in train_index], labels[train_index], batch_size=batch_size,
+                                  bucket_width=bucket_width, seed=42)
+    validation_data = sequence_dataset([scaled[i] for i in val_index], labels[val_index], batch_size=batch_size,
+                                       shuffle=False)
+
+    # Compile the model
+    model = create_sequence_classifier(num_features=sequences[0].shape[1], num_classes=num_classes,
+                                       architecture=architecture)
+    optimizer = Adam(learning_rate=0.0001)  # Adjust learning rate as needed
+    model.compile(loss='sparse_categorical_crossentropy', optimizer=optimizer, metrics=['accuracy'])
+
+    # Train the model
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model.fit(train_data, validation_data=validation_data, epochs=epochs, callbacks=[early_stopping])
+
+    # Save the trained model
+    model.save(model_path)
+    return model
+
+# Inference pipeline of the sequence classifier: scales every frame with the training
+# scaler, batches clips by length and loads the Keras model on first use.
+class SequenceInferencePipeline:
+    def __init__(self, model_path='stutter_sequence_model.keras', scaler_path='stutter_sequence_scaler.npz',
+                 batch_size=32):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        scaler = np.load(scaler_path)
+        self.offset = scaler['mean'].astype(np.float32)
+        self.factor = (1.0 / scaler['scale']).astype(np.float32)
+        self.downsample = int(scaler['downsample'])
+        self._model = None
+        self._frame_model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from tensorflow.keras.models import load_model
+                    self._model = load_model(self.model_path)
+        return self._model
+
+    # Model returning the per-frame probabilities (shares the weights of model)
+    @property
+    def frame_model(self):
+        if self._frame_model is None:
+            model = self.model
+            with self._lock:
+                if self._frame_model is None:
+                    from tensorflow.keras.models import Model
+                    self._frame_model = Model(model.inputs, model.get_layer('frame_probabilities').output)
+        return self._frame_model
+
+    def transform(self, sequence):
+        with stage('sequence_classifier.scaling'):
+            return (np.asarray(sequence, dtype=np.float32) - self.offset) * self.factor
+
+    # Function to return the clip probabilities of a list of (frames, features) sequences
+    def predict_proba(self, sequences):
+        sequences = [self.transform(sequence) for sequence in sequences]
+        probabilities = None
+        for indices in length_batches([len(sequence) for sequence in sequences], self.batch_size):
+            with stage('sequence_classifier.predict'):
+                batch_probabilities = np.asarray(self.model.predict_on_batch(pad_batch(sequences, indices)))
+            if probabilities is None:
+                probabilities = np.zeros((len(sequences), batch_probabilities.shape[1]), dtype=np.float32)
+            probabilities[indices] = batch_probabilities
+        return probabilities
+
+    def predict(self, sequences):
+        return np.argmax(self.predict_proba(sequences), axis=1)
+
+    # Function to return the per-frame probabilities of one sequence
+    def predict_frames(self, sequence):
+        sequence = self.transform(sequence)
+        with stage('sequence_classifier.predict_frames'):
+            return np.asarray(self.frame_model.predict_on_batch(sequence[np.newaxis]))[0]
+
+    # Function to classify one audio file; returns None if feature extraction fails
+    def predict_file(self, audio_file, cache=None):
+        sequence = extract_sequence(audio_file, downsample=self.downsample, cache=cache)
+        if sequence is None:
+            return None
+        return self.predict_proba([sequence])[0]
+
+    # Function to locate disfluencies in one audio file: returns the (n, 2) start/end
+    # times in seconds of every sequence frame and its class probabilities, or None if
+    # feature extraction fails
+    def predict_file_frames(self, audio_file, cache=None):
+        sequence = extract_sequence(audio_file, downsample=self.downsample, cache=cache)
+        if sequence is None:
+            return None
+        return frame_times(len(sequence), self.downsample), self.predict_frames(sequence)
+
+# Function to extract one sequence in a worker process
+def _extract_sequence(path, downsample=2, cache_dir=None):
+    cache = FeatureCache(cache_dir) if cache_dir is not None else None
+    return extract_sequence(path, downsample=downsample, cache=cache)
+
+def main():
+    from .batch_scoring import collect_files, encode_labels
+
+    parser = argparse.ArgumentParser(description="Train the sequence-aware stutter classifier")
+    parser.add_argument('inputs', nargs='+', help="labeled directories (DIR=LABEL) or CSV manifests with 'path' "
+                                                  "and 'label' columns")
+    parser.add_argument('--model', default='stutter_sequence_model.keras')
+    parser.add_argument('--scaler', default='stutter_sequence_scaler.npz')
+    parser.add_argument('--downsample', type=int, default=2, help="average every N feature frames (32 ms each)")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--bucket-width', type=int, default=8,
+                        help="frames of length difference mixed between batches when shuffling")
+    parser.add_argument('--architecture', choices=ARCHITECTURES, default='lstm')
+    parser.add_argument('--workers', type=int, default=None, help="feature extraction processes (default: every core)")
+    parser.add_argument('--cache-dir', help="FeatureCache directory for the extracted sequences")
+    parser.add_argument('--class-names', nargs='+', help="class names in model output order, e.g. fluent stutter")
+    args = parser.parse_args()
+
+    files = [(path, label) for path, label in collect_files(args.inputs) if label is not None]
+    try:
+        label_indices = encode_labels(files, args.class_names)
+    except ValueError as e:
+        parser.error(str(e))
+    extract = partial(_extract_sequence, downsample=args.downsample, cache_dir=args.cache_dir)
+    with Pool(args.workers) as pool:
+        sequences = pool.map(extract, [path for path, label in files])
+
+    examples = [(sequence, label_indices[label]) for sequence, (path, label) in zip(sequences, files)
+                if sequence is not None]
+    print(f"Extracted {len(examples)} of {len(files)} labeled files")
+    train_sequence_classifier([sequence for sequence, label in examples], [label for sequence, label in examples],
+                              model_path=args.model, scaler_path=args.scaler, downsample=args.downsample,
+                              epochs=args.epochs, batch_size=args.batch_size, bucket_width=args.bucket_width,
+                              architecture=args.architecture, num_classes=len(args.class_names or []) or None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# spectral_context.py
+
+from functools import cached_property
+
+import librosa
+import numpy as np
+
+# Per-clip spectral context: the STFT of a signal is computed once and the magnitude,
+# power and mel spectrograms derived from it are cached, so every feature taken from
+# the context shares a single FFT pass. y may be a single signal or a batch of frames
+# (librosa's multichannel layout), in which case each row gets its own spectrogram.
+# A precomputed stft can be supplied instead (e.g. frames streamed in by the caller), and
+# a fixed chroma tuning skips the per-context tuning estimate.
+class SpectralContext:
+    def __init__(self, y, sr=16000, n_fft=2048, hop_length=512, stft=None, tuning=None):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.tuning = tuning
+        if stft is not None:
+            self.stft = stft
+
+    # Spectrograms (computed on first use, then reused)
+    @cached_property
+    def stft(self):
+        return librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+
+    @cached_property
+    def magnitude(self):
+        return np.abs(self.stft)
+
+    @cached_property
+    def power(self):
+        return self.magnitude ** 2
+
+    @cached_property
+    def mel(self):
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr, n_fft=self.n_fft)
+
+    @cached_property
+    def chroma(self):
+        return librosa.feature.chroma_stft(S=self.power, sr=self.sr, n_fft=self.n_fft, tuning=self.tuning)
+
+    # Derived features
+    def mfcc(self, n_mfcc=13):
+        return librosa.feature.mfcc(S=librosa.power_to_db(self.mel), n_mfcc=n_mfcc)
+
+    def spectral_contrast(self):
+        return librosa.feature.spectral_contrast(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)
+
+    def spectral_centroid(self):
+        return librosa.feature.spectral_centroid(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)
+
+    def spectral_bandwidth(self):
+        return librosa.feature.spectral_bandwidth(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)
+
+    def spectral_rolloff(self):
+        return librosa.feature.spectral_rolloff(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)
+
+    def spectral_flatness(self):
+        return librosa.feature.spectral_flatness(S=self.magnitude)
+
+    # By default chroma is recomputed from a constant-Q transform (librosa's default and
+    # the stutter classifier's feature, one extra full-signal pass); cqt=False uses the
+    # shared STFT chroma instead, e.g. for contexts built from a precomputed stft
+    def tonnetz(self, cqt=True):
+        if cqt:
+            if self.y is None:
+                raise ValueError("CQT tonnetz needs the time-domain signal, use cqt=False")
+            return librosa.feature.tonnetz(y=self.y, sr=self.sr)
+        return librosa.feature.tonnetz(chroma=self.chroma)
+
+    def zero_crossing_rate(self):
+        return librosa.feature.zero_crossing_rate(
+            self.y, frame_length=self.n_fft, hop_length=self.hop_length
+        )
@@ -0,0 +1,115 @@
+# streaming.py
+
+import collections
+
+import librosa
+import numpy as np
+
+from .spectral_context import SpectralContext
+from .stutter_features import NUM_FRAME_FEATURES, aggregate_features, frame_features
+
+# Incremental stutter detection over live audio. PCM chunks (any length, e.g. 20-100 ms)
+# are pushed with process_chunk(); complete STFT frames are cut from the buffered samples
+# as soon as they are available (the n_fft - hop_length overlap is carried over to the next
+# chunk), their per-frame features are added to running sums over the last window_seconds,
+# and the window's clip vector (same layout as stutter_classifier.extract_features) is
+# passed to predict. The work per chunk only depends on the chunk length, not on how long
+# the stream has been running. Without the whole signal there is no constant-Q transform,
+# so the tonnetz features are derived from the STFT chroma and only approximate the
+# classifier's.
+#
+# predict maps a (1, num_features) array to class probabilities, e.g. a fitted Keras
+# model's predict or an inference pipeline that also applies the training scaler.
+class StreamingStutterDetector:
+    def __init__(self, predict, sample_rate=16000, n_fft=2048, hop_length=512,
+                 window_seconds=3.0, min_seconds=0.5, tuning=0.0):
+        self.predict = predict
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.tuning = tuning
+        self.window_frames = max(1, int(round(window_seconds * sample_rate / hop_length)))
+        self.min_frames = max(1, int(round(min_seconds * sample_rate / hop_length)))
+        self._window = librosa.filters.get_window('hann', n_fft, fftbins=True)
+        self.reset()
+
+    def reset(self):
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._frames = collections.deque()
+        self._sum = np.zeros(NUM_FRAME_FEATURES)
+        self._sum_sq = np.zeros(NUM_FRAME_FEATURES)
+        self._updates = 0
+        self._odd_byte = b''
+        self.samples_seen = 0
+
+    # Function to push one chunk of PCM audio (float samples, int16 samples or raw int16
+    # bytes at sample_rate). Returns the latest prediction, or None until min_seconds of
+    # frames are available.
+    def process_chunk(self, chunk):
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            # Socket and pipe reads may split a sample: keep an odd last byte for the next chunk
+            chunk = self._odd_byte + bytes(chunk)
+            split = len(chunk) - len(chunk) % 2
+            chunk, self._odd_byte = chunk[:split], chunk[split:]
+        chunk = _to_float32(chunk)
+        self.samples_seen += len(chunk)
+        self._samples = np.concatenate((self._samples, chunk))
+        if len(self._samples) < self.n_fft:
+            return self._prediction()
+
+        # 1. Cut every complete frame and keep the overlap for the next chunk
+        frames = librosa.util.frame(self._samples, frame_length=self.n_fft, hop_length=self.hop_length, axis=0)
+        self._samples = self._samples[len(frames) * self.hop_length:]
+
+        # 2. Per-frame features of the new frames only
+        stft = np.fft.rfft(frames * self._window, axis=-1).T
+        context = SpectralContext(None, sr=self.sample_rate, n_fft=self.n_fft,
+                                  hop_length=self.hop_length, stft=stft, tuning=self.tuning)
+        zcr = librosa.feature.zero_crossing_rate(frames, frame_length=self.n_fft,
+                                                 hop_length=self.n_fft, center=False)[:, 0, 0]
+        new_frames = frame_features(context, zcr=zcr[np.newaxis], cqt_tonnetz=False).T.astype(np.float64)
+
+        # 3. Update the running sums over the sliding window
+        for frame in new_frames:
+            self._frames.append(frame)
+            self._sum += frame
+            self._sum_sq += frame ** 2
+        while len(self._frames) > self.window_frames:
+            frame = self._frames.popleft()
+            self._sum -= frame
+            self._sum_sq -= frame ** 2
+
+        # Recompute the sums exactly once per window to stop rounding drift
+        self._updates += len(new_frames)
+        if self._updates >= self.window_frames:
+            window = np.array(self._frames)
+            self._sum = np.sum(window, axis=0)
+            self._sum_sq = np.sum(window ** 2, axis=0)
+            self._updates = 0
+
+        return self._prediction()
+
+    def _prediction(self):
+        num_frames = len(self._frames)
+        if num_frames < self.min_frames:
+            return None
+
+        mean = self._sum / num_frames
+        std = np.sqrt(np.maximum(self._sum_sq / num_frames - mean ** 2, 0))
+        features = aggregate_features(mean, std)
+        probabilities = np.asarray(self.predict(features[np.newaxis]))[0]
+        return {
+            'time': self.samples_seen / self.sample_rate,
+            'window_seconds': num_frames * self.hop_length / self.sample_rate,
+            'probabilities': probabilities,
+            'label': int(np.argmax(probabilities)),
+        }
+
+# Function to convert a PCM chunk to float32 samples in [-1, 1]
+def _to_float32(chunk):
+    if isinstance(chunk, (bytes, bytearray, memoryview)):
+        chunk = np.frombuffer(chunk, dtype=np.int16)
+    chunk = np.asarray(chunk)
+    if np.issubdtype(chunk.dtype, np.integer):
+        return chunk.astype(np.float32) / -float(np.iinfo(chunk.dtype).min)
+    return chunk.astype(np.float32, copy=False)
@@ -1,71 +1,102 @@
 # stutter_classifier.py
 
-import librosa
+import threading
+
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from tensorflow.keras.models import load_model
-from tensorflow.keras.layers import Input, LSTM, Dense, Dropout, Bidirectional, Concatenate, Attention
-from tensorflow.keras.models import Model
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
-
-# Function to extract acoustic features from audio data
-def extract_features(audio_file):
+
+from ..audio_io import load_audio
+from ..lite_inference import LiteClassifier
+from ..profiling import profiled, profiler, stage
+from ..sequence_layers import sequence_encoder
+from .spectral_context import SpectralContext
+from .stutter_features import aggregate_features, frame_features
+from .voice_activity import detect_speech
+
+# Bump when the feature layout or computation changes (invalidates FeatureCache entries)
+FEATURE_SET_VERSION = 3
+
+# Function to compute the per-frame feature matrix of a signal
+def _signal_frame_features(y, sr):
+    # Compute the STFT once; every per-frame feature is derived from it
+    context = SpectralContext(y, sr=sr)
+    with stage('stutter_classifier.stft'):
+        context.power
+    return frame_features(context)
+
+# Function to cut the (start, end) segments in seconds out of a signal
+def _segment_signals(y, sr, segments):
+    return [y[int(start * sr):int(end * sr)] for start, end in segments]
+
+# Function to extract acoustic features from audio data (optionally through a FeatureCache).
+# vad=True only analyses the speech segments found by voice_activity.detect_speech (the
+# frames of all segments are aggregated together); recordings without detected speech
+# are analysed whole. Stages are timed by the profiling hooks; errors are logged and
+# return None.
+@profiled('stutter_classifier.extract_features')
+def extract_features(audio_file, cache=None, vad=False):
     try:
-        # Load audio file
-        y, sr = librosa.load(audio_file, sr=16000)  # Use a standard sampling rate
-
-        # Extract MFCCs
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        mfccs_mean = np.mean(mfccs.T, axis=0)
-        mfccs_std = np.std(mfccs.T, axis=0)
-
-        # Extract chroma features
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        chroma_mean = np.mean(chroma.T, axis=0)
-        chroma_std = np.std(chroma.T, axis=0)
-
-        # Extract mel spectrogram
-        mel = librosa.feature.melspectrogram(y=y, sr=sr)
-        mel_mean = np.mean(mel.T, axis=0)
-        mel_std = np.std(mel.T, axis=0)
-
-        # Extract spectral contrast
-        contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-        contrast_mean = np.mean(contrast.T, axis=0)
-        contrast_std = np.std(contrast.T, axis=0)
-
-        # Extract tonnetz features
-        tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
-        tonnetz_mean = np.mean(tonnetz.T, axis=0)
-        tonnetz_std = np.std(tonnetz.T, axis=0)
-
-        # Extract zero-crossing rate
-        zcr = librosa.feature.zero_crossing_rate(y)
-        zcr_mean = np.mean(zcr)
-        zcr_std = np.std(zcr)
-
-        # Concatenate all features
-        features = np.concatenate((
-            mfccs_mean, mfccs_std,
-            chroma_mean, chroma_std,
-            mel_mean, mel_std,
-            contrast_mean, contrast_std,
-            tonnetz_mean, tonnetz_std,
-            [zcr_mean], [zcr_std]
-        ))
+        # Return the cached vector for this audio content, if any
+        if cache is not None:
+            cache_key = cache.key(audio_file, feature_set=f"stutter_classifier/{FEATURE_SET_VERSION}", sample_rate=16000,
+                                  **({'vad': True} if vad else {}))  # Keys of whole-recording extractions are unchanged
+            cached_features = cache.get(cache_key)
+            if cached_features is not None:
+                return cached_features
 
+        # Load audio file
+        with stage('stutter_classifier.load'):
+            y, sr = load_audio(audio_file, sr=16000)  # Use a standard sampling rate
+
+        # Per-frame features of the whole recording or of its speech segments
+        signals = [y]
+        if vad:
+            with stage('stutter_classifier.vad'):
+                segments = detect_speech(y, sr)
+            signals = _segment_signals(y, sr, segments) or signals
+        frames = np.concatenate([_signal_frame_features(signal, sr) for signal in signals], axis=1)
+
+        # Mean and standard deviation of every feature group over all frames
+        with stage('stutter_classifier.aggregate'):
+            features = aggregate_features(np.mean(frames, axis=1), np.std(frames, axis=1))
+
+        if cache is not None:
+            cache.put(cache_key, features)
         return features
     except Exception as e:
-        print(f"Error extracting features from {audio_file}: {e}")
+        profiler.failure('stutter_classifier.extract_features', e, audio_file=audio_file)
+        return None
+
+# Function to extract one feature vector per speech segment (utterance) of an audio file.
+# Returns the (n, 2) segment times in seconds and the (n, num_features) feature matrix
+# (empty when no speech is found), or None on errors. vad_options are passed to
+# voice_activity.detect_speech.
+@profiled('stutter_classifier.extract_segment_features')
+def extract_segment_features(audio_file, **vad_options):
+    try:
+        with stage('stutter_classifier.load'):
+            y, sr = load_audio(audio_file, sr=16000)
+        with stage('stutter_classifier.vad'):
+            segments = detect_speech(y, sr, **vad_options)
+
+        features = []
+        for signal in _segment_signals(y, sr, segments):
+            frames = _signal_frame_features(signal, sr)
+            with stage('stutter_classifier.aggregate'):
+                features.append(aggregate_features(np.mean(frames, axis=1), np.std(frames, axis=1)))
+        return segments, np.array(features) if features else np.zeros((0, 0))
+    except Exception as e:
+        profiler.failure('stutter_classifier.extract_segment_features', e, audio_file=audio_file)
         return None
 
 # Function to create the BiLSTM with Attention model architecture
-def create_stutter_classifier(input_shape=(166,), num_classes=2):  # Adjust input_shape based on features
+def create_stutter_classifier(input_shape=(166,), num_classes=2, architecture='lstm'):  # Adjust input_shape based on features
+    from tensorflow.keras.layers import Input, Dense, Dropout, Attention
+    from tensorflow.keras.models import Model
+
     inputs = Input(shape=input_shape)
 
-    # Bidirectional LSTM layers
-    lstm_layer = Bidirectional(LSTM(128, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(inputs)
-    lstm_layer = Bidirectional(LSTM(64, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(lstm_layer)
+    # Sequence encoder (Bidirectional LSTM layers by default, see sequence_layers)
+    lstm_layer = sequence_encoder(inputs, architecture=architecture)
 
     # Attention layer
     attention_layer = Attention()([lstm_layer, lstm_layer])
@@ -79,35 +110,77 @@ def create_stutter_classifier(input_shape=(166,), num_classes=2):  # Adjust inpu
     model = Model(inputs=inputs, outputs=outputs)
     return model
 
-# Load the trained model
-model = load_model('stutter_classifier_model.h5')  # Replace with your model path
-
-# Load and preprocess the test dataset (implementation not shown)
-# ...
-
-# Extract features from the test dataset
-X_test = []
-for audio_file in test_audio_files:
-    features = extract_features(audio_file)
-    if features is not None:
-        X_test.append(features)
-X_test = np.array(X_test)
-
-# Scale the features
-scaler = StandardScaler()
-X_test = scaler.fit_transform(X_test)
-
-# Predict stutter vs. fluent
-y_pred = model.predict(X_test)
-y_pred_classes = np.argmax(y_pred, axis=1)
-
-# Evaluate the model
-accuracy = accuracy_score(y_true, y_pred_classes)
-conf_matrix = confusion_matrix(y_true, y_pred_classes)
-class_report = classification_report(y_true, y_pred_classes)
-
-print(f"Accuracy: {accuracy}")
-print("Confusion Matrix:")
-print(conf_matrix)
-print("Classification Report:")
-print(class_report)
\ No newline at end of file
+# Function to fit the feature scaler on the training features and save it as a compact
+# .npz artifact (StandardScaler semantics: per-feature mean and standard deviation)
+def fit_scaler(X_train, scaler_path='stutter_classifier_scaler.npz'):
+    X_train = np.asarray(X_train, dtype=np.float64)
+    mean = np.mean(X_train, axis=0)
+    scale = np.std(X_train, axis=0)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0  # Constant features are left unscaled
+    np.savez(scaler_path, mean=mean, scale=scale)
+    return mean, scale
+
+# Inference pipeline: applies the scaler fitted at training time as a precomputed affine
+# transform and loads the Keras model on first use, so importing this module or creating
+# the pipeline does not load TensorFlow. A .tflite model_path (see model_export) is run
+# with LiteClassifier instead. scaler_path=None feeds features through unscaled.
+class StutterInferencePipeline:
+    def __init__(self, model_path='stutter_classifier_model.h5', scaler_path='stutter_classifier_scaler.npz'):
+        self.model_path = model_path
+        self.offset = None
+        self.factor = None
+        if scaler_path is not None:
+            scaler = np.load(scaler_path)
+            self.offset = scaler['mean'].astype(np.float32)
+            self.factor = (1.0 / scaler['scale']).astype(np.float32)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None and self.model_path.endswith('.tflite'):
+                    self._model = LiteClassifier(self.model_path)
+                elif self._model is None:
+                    from tensorflow.keras.models import load_model
+                    self._model = load_model(self.model_path)
+        return self._model
+
+    def transform(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        if self.offset is None:
+            return X
+        with stage('stutter_classifier.scaling'):
+            return (X - self.offset) * self.factor
+
+    def predict_proba(self, X):
+        X = self.transform(X)
+        with stage('stutter_classifier.predict'):
+            return np.asarray(self.model.predict_on_batch(X))
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    # Function to classify one audio file; returns None if feature extraction fails
+    def predict_file(self, audio_file, cache=None, vad=False):
+        features = extract_features(audio_file, cache=cache, vad=vad)
+        if features is None:
+            return None
+        return self.predict_proba(features)[0]
+
+    # Function to classify every speech segment (utterance) of one audio file; returns the
+    # (n, 2) segment times in seconds and their class probabilities, or None on errors
+    def predict_segments(self, audio_file, **vad_options):
+        result = extract_segment_features(audio_file, **vad_options)
+        if result is None:
+            return None
+        segments, features = result
+        if not len(segments):
+            return segments, np.zeros((0, 0), dtype=np.float32)
+        return segments, self.predict_proba(features)
+
+if __name__ == '__main__':
+    # Evaluate the classifier on a test corpus (see batch_scoring)
+    from .batch_scoring import main
+    main()
@@ -0,0 +1,49 @@
+# stutter_features.py
+
+import numpy as np
+
+from ..profiling import stage
+
+# Per-frame feature groups behind stutter_classifier.extract_features, in row order
+# of frame_features(). The clip vector holds the mean and the std of every group.
+FEATURE_GROUPS = (
+    ('mfcc', 13),
+    ('chroma', 12),
+    ('mel', 128),
+    ('contrast', 7),
+    ('tonnetz', 6),
+    ('zcr', 1),
+)
+NUM_FRAME_FEATURES = sum(size for name, size in FEATURE_GROUPS)
+
+# Function to compute the per-frame feature matrix (features x frames) of a SpectralContext.
+# zcr can be passed in when the context has no time-domain signal (e.g. streamed frames);
+# such contexts also need cqt_tonnetz=False, which derives tonnetz from the STFT chroma
+# instead of the CQT chroma the trained classifiers use. Every group is a profiling stage
+# ('stutter_features.<group>'); mel comes first because mfcc is derived from it.
+def frame_features(context, zcr=None, cqt_tonnetz=True):
+    with stage('stutter_features.mel'):
+        mel = context.mel
+    with stage('stutter_features.mfcc'):
+        mfcc = context.mfcc(n_mfcc=13)
+    with stage('stutter_features.chroma'):
+        chroma = context.chroma
+    with stage('stutter_features.contrast'):
+        contrast = context.spectral_contrast()
+    with stage('stutter_features.tonnetz'):
+        tonnetz = context.tonnetz(cqt=cqt_tonnetz)
+    if zcr is None:
+        with stage('stutter_features.zcr'):
+            zcr = context.zero_crossing_rate()
+    return np.concatenate((mfcc, chroma, mel, contrast, tonnetz, zcr), axis=-2)
+
+# Function to build the clip feature vector from the per-frame means and stds
+# (mfcc mean, mfcc std, chroma mean, chroma std, ...). Rows of 2-D means and stds
+# (e.g. one per window) give one vector per row.
+def aggregate_features(mean, std):
+    parts = []
+    start = 0
+    for name, size in FEATURE_GROUPS:
+        parts += [mean[..., start:start + size], std[..., start:start + size]]
+        start += size
+    return np.concatenate(parts, axis=-1)
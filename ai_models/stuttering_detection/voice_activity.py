@@ -0,0 +1,76 @@
+# voice_activity.py
+
+import numpy as np
+
+# Energy/zero-crossing voice activity detection. Every frame gets the energy and ZCR
+# that extract_frame_features computes (mean square and sign-change rate). A frame is
+# speech when its energy is energy_margin_db above the recording's noise floor (10th
+# percentile of frame energy), or, for unvoiced consonants (fricatives, /s/ /f/), when
+# its ZCR exceeds zcr_threshold at half that margin. Runs of speech frames are joined
+# across pauses shorter than min_silence, runs shorter than min_speech are dropped and
+# the remaining segments are padded by padding seconds on both sides. The thresholds
+# adapt to the recording's level, so no calibration is needed; a recording whose
+# loudest frames stay below min_energy_db has no speech.
+
+# Function to compute the energy (mean square) and zero-crossing rate of every frame
+def frame_energy_zcr(y, frame_length=400, hop_length=160):
+    if len(y) < frame_length:
+        return np.zeros(0), np.zeros(0)
+    frames = np.lib.stride_tricks.sliding_window_view(y, frame_length)[::hop_length]
+    energy = np.einsum('ij,ij->i', frames, frames, dtype=np.float64) / frame_length
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+    return energy, zcr
+
+# Function to classify frames as speech (True) or silence from their energy and ZCR
+def speech_frames(energy, zcr, energy_margin_db=12.0, zcr_threshold=0.25, min_energy_db=-60.0):
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    energy_db = 10 * np.log10(energy + 1e-12)
+    floor, peak = np.percentile(energy_db, [10, 99])
+    if peak < min_energy_db:
+        return np.zeros(len(energy), dtype=bool)
+
+    # Recordings without pauses have their floor at speech level: cap the threshold
+    # below the peak so quieter speech is kept
+    threshold = max(min(floor + energy_margin_db, peak - energy_margin_db), min_energy_db)
+    voiced = energy_db > threshold
+    unvoiced = (zcr > zcr_threshold) & (energy_db > threshold - energy_margin_db / 2)
+    return voiced | unvoiced
+
+# Function to turn per-frame speech flags into (start, end) segments in seconds
+def frames_to_segments(is_speech, sample_rate=16000, frame_length=400, hop_length=160,
+                       min_speech=0.25, min_silence=0.3, padding=0.1, duration=None):
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], np.asarray(is_speech, dtype=np.int8), [0]))))
+    starts = edges[0::2] * hop_length / sample_rate
+    ends = ((edges[1::2] - 1) * hop_length + frame_length) / sample_rate
+    if duration is None:
+        duration = ((len(is_speech) - 1) * hop_length + frame_length) / sample_rate
+
+    segments = []
+    for start, end in zip(starts, ends):
+        if segments and start - segments[-1][1] < min_silence:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+    segments = [(start, end) for start, end in segments if end - start >= min_speech]
+
+    # Padding may make neighbours overlap again
+    padded = []
+    for start, end in segments:
+        start, end = max(start - padding, 0.0), min(end + padding, duration)
+        if padded and start <= padded[-1][1]:
+            padded[-1][1] = end
+        else:
+            padded.append([start, end])
+    return np.array(padded, dtype=np.float64).reshape(-1, 2)
+
+# Function to detect the speech segments of a signal; returns an (n, 2) array of
+# (start, end) times in seconds
+def detect_speech(y, sample_rate=16000, frame_length=400, hop_length=160, energy_margin_db=12.0,
+                  zcr_threshold=0.25, min_energy_db=-60.0, min_speech=0.25, min_silence=0.3, padding=0.1):
+    energy, zcr = frame_energy_zcr(y, frame_length, hop_length)
+    is_speech = speech_frames(energy, zcr, energy_margin_db=energy_margin_db, zcr_threshold=zcr_threshold,
+                              min_energy_db=min_energy_db)
+    return frames_to_segments(is_speech, sample_rate, frame_length, hop_length, min_speech=min_speech,
+                              min_silence=min_silence, padding=padding, duration=len(y) / sample_rate)
@@ -0,0 +1,71 @@
+# audio_io_test.py
+
+import numpy as np
+import pytest
+
+from ai_models.audio_io import WavFile, load_audio
+
+librosa = pytest.importorskip('librosa')
+soundfile = pytest.importorskip('soundfile')
+
+# Function to write two seconds of a tone with noise (channels x samples) to a WAV file
+def write_wav(path, sample_rate=16000, channels=1, subtype='PCM_16', format='WAV'):
+    rng = np.random.default_rng(channels)
+    t = np.arange(2 * sample_rate) / sample_rate
+    y = 0.5 * np.sin(2 * np.pi * 220 * t) + 0.1 * rng.standard_normal((channels, len(t)))
+    soundfile.write(str(path), np.clip(y, -1, 1).T, sample_rate, subtype=subtype, format=format)
+    return str(path)
+
+@pytest.mark.parametrize('subtype', ['PCM_U8', 'PCM_16', 'PCM_32', 'FLOAT', 'DOUBLE', 'PCM_24'])
+@pytest.mark.parametrize('channels', [1, 2])
+def test_load_audio_matches_librosa(tmp_path, subtype, channels):
+    path = write_wav(tmp_path / 'audio.wav', channels=channels, subtype=subtype)
+
+    y, sr = load_audio(path, sr=16000)
+    expected, expected_sr = librosa.load(path, sr=16000)
+
+    assert sr == expected_sr and y.dtype == np.float32
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-6)
+
+@pytest.mark.parametrize('offset, duration', [(0.0, None), (0.5, 1.0), (0.25, None), (1.9, 1.0), (3.0, None)])
+def test_time_windows_match_librosa(tmp_path, offset, duration):
+    path = write_wav(tmp_path / 'audio.wav', subtype='PCM_16')
+
+    y, _ = load_audio(path, sr=16000, offset=offset, duration=duration)
+    expected, _ = librosa.load(path, sr=16000, offset=offset, duration=duration)
+
+    assert len(y) == len(expected)
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-6)
+
+def test_stereo_without_mixing_is_channels_by_samples(tmp_path):
+    path = write_wav(tmp_path / 'audio.wav', channels=2, subtype='PCM_16', format='WAVEX')
+
+    y, _ = load_audio(path, sr=None, mono=False, offset=0.5, duration=0.5)
+    expected, _ = librosa.load(path, sr=None, mono=False, offset=0.5, duration=0.5)
+
+    assert y.shape == expected.shape == (2, 8000)
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-6)
+
+@pytest.mark.parametrize('res_type', ['soxr_hq', 'polyphase'])
+def test_resampling_matches_librosa(tmp_path, res_type):
+    path = write_wav(tmp_path / 'audio.wav', sample_rate=44100, subtype='PCM_16')
+
+    y, sr = load_audio(path, sr=16000, offset=0.5, duration=1.0, res_type=res_type)
+    expected, _ = librosa.load(path, sr=16000, offset=0.5, duration=1.0, res_type=res_type)
+
+    assert sr == 16000 and y.dtype == np.float32
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-5)
+
+def test_float32_mono_at_the_target_rate_is_a_view_of_the_file(tmp_path):
+    path = write_wav(tmp_path / 'audio.wav', subtype='FLOAT')
+
+    y, _ = load_audio(path, sr=16000)
+
+    assert not y.flags.owndata and not y.flags.writeable
+
+def test_files_that_are_not_wav_are_rejected(tmp_path):
+    path = tmp_path / 'audio.wav'
+    path.write_bytes(b'not a wave file')
+
+    with pytest.raises(ValueError):
+        WavFile(str(path))
@@ -0,0 +1,78 @@
+# batch_scoring_test.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_models.stuttering_detection import batch_scoring
+from ai_models.stuttering_detection.batch_scoring import collect_files, encode_labels, score_files
+
+# Stand-in pipeline: class 1 when the first feature is positive
+class StubPipeline:
+    def __init__(self):
+        self.batches = []
+
+    def predict_proba(self, X):
+        self.batches.append(len(X))
+        positive = (X[:, 0] > 0).astype(float)
+        return np.column_stack((1 - positive, positive))
+
+@pytest.fixture
+def stub_features(monkeypatch):
+    # Features from the file name: 'pos' files are positive, 'bad' files fail
+    def extract_features(path, cache=None, vad=False):
+        if 'bad' in path:
+            return None
+        return np.array([1.0 if 'pos' in path else -1.0, 0.0])
+
+    monkeypatch.setattr(batch_scoring, 'extract_features', extract_features)
+
+def test_collect_files_from_directories_and_manifests(tmp_path):
+    (tmp_path / 'stutter').mkdir()
+    for name in ('a.wav', 'b.wav'):
+        (tmp_path / 'stutter' / name).write_bytes(b'')
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text("path,label\nstutter/a.wav,fluent\nstutter/b.wav,\n")
+
+    files = collect_files([f"{tmp_path / 'stutter'}=stutter", str(manifest)])
+
+    assert sorted(files[:2]) == [(str(tmp_path / 'stutter' / 'a.wav'), 'stutter'),
+                                 (str(tmp_path / 'stutter' / 'b.wav'), 'stutter')]
+    assert files[2:] == [(os.path.join(str(tmp_path), 'stutter/a.wav'), 'fluent'),
+                         (os.path.join(str(tmp_path), 'stutter/b.wav'), None)]
+
+def test_encode_labels_accepts_indices_and_class_names():
+    files = [('a.wav', '1'), ('b.wav', 'fluent'), ('c.wav', None), ('d.wav', 'stutter')]
+
+    assert encode_labels(files, ['fluent', 'stutter']) == {'1': 1, 'fluent': 0, 'stutter': 1}
+    assert encode_labels(files[:1]) == {'1': 1}
+
+def test_named_labels_without_class_names_fail_before_scoring(tmp_path, stub_features):
+    files = [('pos-1.wav', '1'), ('neg-1.wav', 'stutter')]
+    pipeline = StubPipeline()
+    predictions = tmp_path / 'predictions.csv'
+
+    with pytest.raises(ValueError, match="'stutter'.*--class-names"):
+        score_files(files, pipeline, str(predictions), num_workers=1)
+
+    assert pipeline.batches == [] and not predictions.exists()
+
+def test_scores_are_written_in_batches_with_encoded_labels(tmp_path, stub_features):
+    files = [('pos-1.wav', 'stutter'), ('neg-1.wav', 'fluent'), ('bad.wav', 'stutter'), ('pos-2.wav', 'fluent'),
+             ('neg-2.wav', None)]
+    pipeline = StubPipeline()
+    predictions = tmp_path / 'predictions.csv'
+
+    y_true, y_pred, counts = score_files(files, pipeline, str(predictions), num_workers=1, batch_size=3,
+                                         class_names=['fluent', 'stutter'])
+
+    assert pipeline.batches == [3, 1]
+    assert counts == {'files': 5, 'failed': 1}
+    np.testing.assert_array_equal(y_true, [1, 0, 0])
+    np.testing.assert_array_equal(y_pred, [1, 0, 1])
+    rows = pd.read_csv(predictions, keep_default_na=False)
+    assert rows['path'].tolist() == ['pos-1.wav', 'neg-1.wav', 'pos-2.wav', 'neg-2.wav', 'bad.wav']
+    assert rows['prediction'].tolist() == ['stutter', 'fluent', 'stutter', 'fluent', '']
+    assert list(rows.columns[3:]) == ['probability_fluent', 'probability_stutter']
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# The ai_models packages are imported from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -0,0 +1,55 @@
+# feature_cache_test.py
+
+import os
+
+import numpy as np
+
+from ai_models.stuttering_detection.feature_cache import FeatureCache
+
+def test_key_depends_on_content_and_parameters(tmp_path):
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    for name, content in (('a.wav', b'audio'), ('copy.wav', b'audio'), ('b.wav', b'other')):
+        (tmp_path / name).write_bytes(content)
+
+    key = cache.key(str(tmp_path / 'a.wav'), sample_rate=16000)
+    assert cache.key(str(tmp_path / 'copy.wav'), sample_rate=16000) == key
+    assert cache.key(str(tmp_path / 'b.wav'), sample_rate=16000) != key
+    assert cache.key(str(tmp_path / 'a.wav'), sample_rate=8000) != key
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    cache.put('ab' * 32, np.arange(100.0))
+    path = cache._path('ab' * 32)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    assert cache.get('ab' * 32) is None
+    assert not os.path.exists(path)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache.put('ab' * 32, np.arange(100.0))
+    np.testing.assert_array_equal(cache.get('ab' * 32), np.arange(100.0))
+
+def test_overwriting_a_key_does_not_grow_the_size(tmp_path):
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    cache.put('cd' * 32, np.zeros(100))
+    cache.put('cd' * 32, np.zeros(100))
+    assert cache.stats()['bytes'] == os.path.getsize(cache._path('cd' * 32))
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry = np.zeros(100)
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    keys = ['01' * 32, '02' * 32, '03' * 32]
+    for age, key in enumerate(keys):
+        cache.put(key, entry)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+        entry_size = os.path.getsize(cache._path(key))
+
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = 3 * entry_size
+    cache.put('04' * 32, entry)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()['bytes'] == 3 * entry_size
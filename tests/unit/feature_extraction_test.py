@@ -0,0 +1,97 @@
+# feature_extraction_test.py
+
+import warnings
+
+import librosa
+import numpy as np
+import pywt
+import soundfile
+from python_speech_features import mfcc, logfbank, delta
+from scipy.stats import skew, kurtosis
+
+from ai_models.stuttering_detection.feature_extraction import (
+    FEATURE_TOLERANCE, extract_features_from_directory, extract_frame_features, track_pitch,
+)
+from ai_models.stuttering_detection.feature_store import load_feature_store, load_shard_labels, load_shards
+
+SAMPLE_RATE = 16000
+
+# Per-frame features of the original frame-by-frame loop (one library call per frame)
+def reference_frame_features(frame, sample_rate=SAMPLE_RATE):
+    zcr = librosa.feature.zero_crossing_rate(frame)[0, 0]
+    energy = np.sum(frame ** 2) / len(frame)
+    f0, voiced_flag, voiced_probs = librosa.pyin(frame, fmin=librosa.note_to_hz('C2'), fmax=librosa.note_to_hz('C7'))
+    f0 = np.nanmean(f0) if np.any(np.isfinite(f0)) else 0
+
+    mfcc_feat = mfcc(frame, samplerate=sample_rate, numcep=13, nfilt=26)
+    fbank_feat = logfbank(frame, samplerate=sample_rate, nfilt=26)
+    delta_mfcc_feat = delta(mfcc_feat, 2)
+    delta_fbank_feat = delta(fbank_feat, 2)
+    chroma_stft = librosa.feature.chroma_stft(y=frame, sr=sample_rate)
+    return np.concatenate((
+        [zcr, energy, f0],
+        np.mean(mfcc_feat, axis=0), np.std(mfcc_feat, axis=0), skew(mfcc_feat, axis=0), kurtosis(mfcc_feat, axis=0),
+        np.mean(fbank_feat, axis=0), np.std(fbank_feat, axis=0),
+        np.mean(delta_mfcc_feat, axis=0), np.std(delta_mfcc_feat, axis=0),
+        np.mean(delta_fbank_feat, axis=0), np.std(delta_fbank_feat, axis=0),
+        [librosa.feature.spectral_centroid(y=frame, sr=sample_rate)[0, 0],
+         librosa.feature.spectral_bandwidth(y=frame, sr=sample_rate)[0, 0],
+         librosa.feature.spectral_rolloff(y=frame, sr=sample_rate)[0, 0],
+         librosa.feature.spectral_flatness(y=frame)[0, 0]],
+        np.mean(chroma_stft, axis=0), np.std(chroma_stft, axis=0),
+        np.concatenate(pywt.wavedec(frame, 'db4', level=4)),
+    ))
+
+# Windowed, pre-emphasized analysis frames of a voiced test signal
+def voiced_frames(num_frames=6, frame_length=400, frame_step=160, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(frame_length + (num_frames - 1) * frame_step) / SAMPLE_RATE
+    y = (0.5 * np.sin(2 * np.pi * 180 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+    y = np.append(y[0], y[1:] - 0.97 * y[:-1])
+    frames = np.array(librosa.util.frame(y, frame_length=frame_length, hop_length=frame_step).T)
+    frames *= np.hamming(frame_length)
+    return frames
+
+def test_batched_frame_features_match_reference_loop():
+    frames = voiced_frames()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        batched = extract_frame_features(frames, SAMPLE_RATE)
+        reference = np.array([reference_frame_features(frame) for frame in frames])
+
+    assert batched.shape == reference.shape
+    np.testing.assert_array_equal(np.isnan(batched), np.isnan(reference))
+    finite = ~np.isnan(reference)
+    np.testing.assert_allclose(batched[finite], reference[finite], **FEATURE_TOLERANCE)
+
+def test_blocked_pyin_matches_one_call_over_the_signal():
+    rng = np.random.default_rng(1)
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    pitch = 120 + 60 * np.sin(2 * np.pi * 0.5 * t)
+    y = 0.5 * np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE) * (t % 1.0 < 0.7)
+    y = (y + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+    num_frames = 1 + (len(y) - 400) // 160
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        whole = track_pitch(y, SAMPLE_RATE, 400, 160, num_frames, block_frames=len(y))
+        blocked = track_pitch(y, SAMPLE_RATE, 400, 160, num_frames, block_frames=64)
+
+    assert np.count_nonzero(whole) > num_frames // 2
+    np.testing.assert_allclose(blocked, whole)
+
+def test_directory_shards_hold_float32_features_and_separate_labels(tmp_path):
+    rng = np.random.default_rng(0)
+    for i in range(2):
+        soundfile.write(str(tmp_path / f'{i}.wav'), 0.1 * rng.standard_normal(SAMPLE_RATE), SAMPLE_RATE)
+
+    extract_features_from_directory(str(tmp_path), 3, shard_dir=str(tmp_path / 'shards'),
+                                    store_dir=str(tmp_path / 'store'))
+
+    shards, filenames = load_shards(str(tmp_path / 'shards'))
+    features, labels, names, store_filenames = load_feature_store(str(tmp_path / 'store'))
+    assert filenames == store_filenames and len(filenames) == 2
+    assert shards[0].dtype == np.float32 and shards[0].shape == (2, len(names))
+    np.testing.assert_array_equal(shards[0], features)
+    np.testing.assert_array_equal(load_shard_labels(str(tmp_path / 'shards'))[0], labels)
+    np.testing.assert_array_equal(labels, [3, 3])
@@ -0,0 +1,278 @@
+# feature_store_test.py
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_models.stuttering_detection.feature_store import (
+    CsvFeatureWriter, FeatureStoreWriter, ShardFeatureWriter, load_feature_store, load_shard_labels, load_shards,
+)
+
+def test_csv_writer_resumes_after_last_journaled_row(tmp_path):
+    csv_file = str(tmp_path / 'features.csv')
+    writer = CsvFeatureWriter(csv_file)
+    writer.append('a.wav', np.array([1.0, 2.0]), 0)
+    writer.append('bad.wav', None, 0)
+    writer.close()
+
+    # A crash while writing leaves a partial row after the journaled ones
+    with open(csv_file, 'a') as f:
+        f.write('3.0,4.')
+
+    writer = CsvFeatureWriter(csv_file)
+    assert writer.done == {'a.wav', 'bad.wav'}
+    writer.append('a.wav', np.array([9.0, 9.0]), 1)  # already done: ignored
+    writer.append('b.wav', np.array([3.0, 4.0]), 1)
+    writer.close()
+
+    rows = pd.read_csv(csv_file, header=None).values
+    np.testing.assert_array_equal(rows, [[1.0, 2.0, 0], [3.0, 4.0, 1]])
+
+def test_shard_writer_keeps_pending_rows_and_failures(tmp_path):
+    shard_dir = str(tmp_path / 'shards')
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32)
+    writer.append('a.wav', [1.0, 2.0], 0)
+    writer.append('bad.wav', None, 0)
+    writer.append('b.wav', [3.0, 4.0], 1)  # completes the first shard
+    writer.append('c.wav', [5.0, 6.0], 1)  # pending when the process dies
+    del writer
+
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32)
+    assert writer.done == {'a.wav', 'bad.wav', 'b.wav', 'c.wav'}
+    writer.append('d.wav', [7.0, 8.0], 0)
+    writer.close()
+
+    shards, filenames = load_shards(shard_dir)
+    assert filenames == ['a.wav', 'b.wav', 'c.wav', 'd.wav']
+    np.testing.assert_array_equal(np.concatenate(shards),
+                                  [[1, 2, 0], [3, 4, 1], [5, 6, 1], [7, 8, 0]])
+
+def test_csv_writer_keeps_the_label_type(tmp_path):
+    csv_file = str(tmp_path / 'features.csv')
+    writer = CsvFeatureWriter(csv_file)
+    writer.append('a.wav', np.array([0.5, 0.25], dtype=np.float32), 1)
+    writer.append('b.wav', np.array([0.125, 2.0], dtype=np.float32), 'stutter')
+    writer.close()
+
+    with open(csv_file) as f:
+        assert f.read().splitlines() == ['0.5,0.25,1', '0.125,2.0,stutter']
+
+def test_shard_writer_stores_labels_apart(tmp_path):
+    shard_dir = str(tmp_path / 'shards')
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32, separate_labels=True)
+    writer.append('a.wav', [1.0, 2.0], 0)
+    writer.append('b.wav', [3.0, 4.0], 1)  # completes the first shard
+    writer.append('c.wav', [5.0, 6.0], 2)  # pending when the process dies
+    del writer
+
+    # A crash while writing leaves a partial label after the journaled ones
+    with open(tmp_path / 'shards' / 'pending.labels.bin', 'ab') as f:
+        f.write(b'\x07\x00')
+
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32, separate_labels=True)
+    writer.append('d.wav', [7.0, 8.0], 3)
+    writer.append('e.wav', [9.0, 10.0], 4)
+    writer.close()
+
+    shards, filenames = load_shards(shard_dir)
+    labels = load_shard_labels(shard_dir)
+    assert filenames == ['a.wav', 'b.wav', 'c.wav', 'd.wav', 'e.wav']
+    assert all(shard.dtype == np.float32 for shard in shards)
+    np.testing.assert_array_equal(np.concatenate(shards), [[1, 2], [3, 4], [5, 6], [7, 8], [9, 10]])
+    assert [len(shard) for shard in shards] == [len(shard_labels) for shard_labels in labels]
+    np.testing.assert_array_equal(np.concatenate(labels), [0, 1, 2, 3, 4])
+    assert np.concatenate(labels).dtype == np.int32
+
+# Function to write a shard directory with the old defaults (float64, label column),
+# one full shard and one pending row, then drop its layout.json as older versions did
+def legacy_shard_dir(tmp_path, shard_size=2, rows=3):
+    shard_dir = str(tmp_path / 'shards')
+    writer = ShardFeatureWriter(shard_dir, shard_size=shard_size)
+    for i in range(rows):
+        writer.append(f'{i}.wav', [float(i), float(i)], i)
+    del writer
+    os.remove(os.path.join(shard_dir, 'layout.json'))
+    return shard_dir
+
+def test_shard_writer_rejects_a_mismatched_reopen(tmp_path):
+    shard_dir = str(tmp_path / 'shards')
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32, separate_labels=True)
+    writer.append('a.wav', [1.0, 2.0], 0)
+    with pytest.raises(ValueError):
+        writer.append('b.wav', [1.0, 2.0, 3.0], 1)
+    del writer
+
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float64, separate_labels=True)
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32)
+    # The width is kept while no row is pending or written either
+    writer = ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32, separate_labels=True)
+    with pytest.raises(ValueError):
+        writer.append('b.wav', [1.0, 2.0, 3.0], 1)
+    writer.append('b.wav', [3.0, 4.0], 1)
+    writer.close()
+
+    np.testing.assert_array_equal(np.concatenate(load_shards(shard_dir)[0]), [[1, 2], [3, 4]])
+    np.testing.assert_array_equal(np.concatenate(load_shard_labels(shard_dir)), [0, 1])
+
+def test_shard_writer_infers_the_layout_of_older_shard_dirs(tmp_path):
+    shard_dir = legacy_shard_dir(tmp_path)
+
+    # Neither the pending rows nor the shards can be read with another layout
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=2, dtype=np.float32)
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=2, separate_labels=True)
+
+    writer = ShardFeatureWriter(shard_dir, shard_size=2)
+    writer.append('3.wav', [3.0, 3.0], 3)
+    writer.close()
+
+    shards, filenames = load_shards(shard_dir)
+    assert filenames == ['0.wav', '1.wav', '2.wav', '3.wav']
+    np.testing.assert_array_equal(np.concatenate(shards), [[i, i, i] for i in range(4)])
+    with open(os.path.join(shard_dir, 'layout.json')) as f:
+        assert json.load(f) == {'dtype': '<f8', 'separate_labels': False, 'width': 3}
+
+def test_shard_writer_does_not_reinterpret_older_pending_rows(tmp_path):
+    shard_dir = legacy_shard_dir(tmp_path, shard_size=10, rows=2)
+
+    # Pending float64 rows with a label column, and no shard to infer the layout from
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=10, separate_labels=True)
+    with pytest.raises(ValueError):
+        ShardFeatureWriter(shard_dir, shard_size=10, dtype=np.float32, separate_labels=True)
+    # The layout they were written with still resumes
+    writer = ShardFeatureWriter(shard_dir, shard_size=10)
+    writer.close()
+    np.testing.assert_array_equal(np.concatenate(load_shards(shard_dir)[0]), [[0, 0, 0], [1, 1, 1]])
+
+def test_feature_store_resumes_after_last_journaled_row(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    writer = FeatureStoreWriter(store_dir, feature_names=['x', 'y'])
+    writer.append('a.wav', np.array([1.0, 2.0]), 0)
+    writer.append('bad.wav', None, 0)
+    writer.append('b.wav', np.array([3.0, 4.0]), 1)
+    writer.close()
+
+    # A crash while writing leaves a row that was never journaled
+    with open(tmp_path / 'store' / 'features.bin', 'ab') as f:
+        f.write(np.array([5.0], dtype=np.float32).tobytes())
+    with open(tmp_path / 'store' / 'labels.bin', 'ab') as f:
+        f.write(np.int32(1).tobytes())
+
+    writer = FeatureStoreWriter(store_dir, feature_names=['x', 'y'])
+    assert writer.done == {'a.wav', 'bad.wav', 'b.wav'}
+    writer.append('a.wav', np.array([9.0, 9.0]), 1)  # already done: ignored
+    writer.append('c.wav', np.array([5.0, 6.0]), 2)
+    writer.close()
+
+    features, labels, names, filenames = load_feature_store(store_dir)
+    assert names == ['x', 'y']
+    assert filenames == ['a.wav', 'b.wav', 'c.wav']
+    assert features.dtype == np.float32 and labels.dtype == np.int32
+    np.testing.assert_array_equal(features, [[1, 2], [3, 4], [5, 6]])
+    np.testing.assert_array_equal(labels, [0, 1, 2])
+    with open(tmp_path / 'store' / 'failed.txt') as f:
+        assert f.read().split() == ['bad.wav']
+
+def test_feature_store_rejects_mismatched_rows_and_dtypes(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    writer = FeatureStoreWriter(store_dir, dtype=np.float16)
+    writer.append('a.wav', np.array([1.0, 2.0]), 0)
+    with pytest.raises(ValueError):
+        writer.append('b.wav', np.array([1.0, 2.0, 3.0]), 0)
+    writer.close()
+
+    with pytest.raises(ValueError):
+        FeatureStoreWriter(store_dir, dtype=np.float32)
+    with pytest.raises(ValueError):
+        FeatureStoreWriter(str(tmp_path / 'named'), feature_names=['x']).append('a.wav', np.zeros(2), 0)
+
+    features, labels, names, filenames = load_feature_store(store_dir)
+    assert features.dtype == np.float16 and names is None
+    np.testing.assert_array_equal(features, [[1, 2]])
+
+def test_feature_store_with_only_failures_resumes(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    writer = FeatureStoreWriter(store_dir)
+    writer.append('bad.wav', None, 0)
+    writer.close()
+
+    assert FeatureStoreWriter(store_dir).done == {'bad.wav'}
+
+# Function to write one good and one failed file, then reopen the writer and append
+# both again (the failed one now succeeding); returns the reopened writer's done set
+def rerun_with_a_failure(open_writer, retry_failed):
+    writer = open_writer()
+    writer.append('a.wav', np.array([1.0, 2.0]), 0)
+    writer.append('flaky.wav', None, 1)
+    writer.close()
+
+    writer = open_writer(retry_failed=retry_failed)
+    done = set(writer.done)
+    writer.append('a.wav', np.array([9.0, 9.0]), 0)
+    writer.append('flaky.wav', np.array([3.0, 4.0]), 1)
+    writer.close()
+    return done
+
+@pytest.mark.parametrize('retry_failed', [False, True])
+def test_csv_writer_retries_failed_files_on_request(tmp_path, retry_failed):
+    csv_file = str(tmp_path / 'features.csv')
+    done = rerun_with_a_failure(lambda **kwargs: CsvFeatureWriter(csv_file, **kwargs), retry_failed)
+
+    rows = pd.read_csv(csv_file, header=None).values
+    if retry_failed:
+        assert done == {'a.wav'}
+        np.testing.assert_array_equal(rows, [[1, 2, 0], [3, 4, 1]])
+        assert CsvFeatureWriter(csv_file, retry_failed=True).failed == set()
+    else:
+        assert done == {'a.wav', 'flaky.wav'}
+        np.testing.assert_array_equal(rows, [[1, 2, 0]])
+        assert CsvFeatureWriter(csv_file).failed == {'flaky.wav'}
+
+@pytest.mark.parametrize('retry_failed', [False, True])
+def test_shard_writer_retries_failed_files_on_request(tmp_path, retry_failed):
+    shard_dir = str(tmp_path / 'shards')
+    done = rerun_with_a_failure(lambda **kwargs: ShardFeatureWriter(shard_dir, shard_size=10, **kwargs),
+                                retry_failed)
+
+    shards, filenames = load_shards(shard_dir)
+    with open(tmp_path / 'shards' / 'failed.txt') as f:
+        failed = f.read().split()
+    if retry_failed:
+        assert done == {'a.wav'}
+        assert filenames == ['a.wav', 'flaky.wav'] and failed == []
+    else:
+        assert done == {'a.wav', 'flaky.wav'}
+        assert filenames == ['a.wav'] and failed == ['flaky.wav']
+
+@pytest.mark.parametrize('retry_failed', [False, True])
+def test_feature_store_retries_failed_files_on_request(tmp_path, retry_failed):
+    store_dir = str(tmp_path / 'store')
+    done = rerun_with_a_failure(lambda **kwargs: FeatureStoreWriter(store_dir, **kwargs), retry_failed)
+
+    features, labels, names, filenames = load_feature_store(store_dir)
+    with open(tmp_path / 'store' / 'failed.txt') as f:
+        failed = f.read().split()
+    if retry_failed:
+        assert done == {'a.wav'}
+        assert filenames == ['a.wav', 'flaky.wav'] and failed == []
+        np.testing.assert_array_equal(labels, [0, 1])
+    else:
+        assert done == {'a.wav', 'flaky.wav'}
+        assert filenames == ['a.wav'] and failed == ['flaky.wav']
+
+def test_a_file_failing_again_is_reported_once(tmp_path):
+    shard_dir = str(tmp_path / 'shards')
+    for _ in range(3):
+        writer = ShardFeatureWriter(shard_dir, retry_failed=True)
+        writer.append('broken.wav', None, 0)
+        writer.close()
+
+    with open(tmp_path / 'shards' / 'failed.txt') as f:
+        assert f.read().split() == ['broken.wav']
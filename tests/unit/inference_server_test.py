@@ -0,0 +1,90 @@
+# inference_server_test.py
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from ai_models.stuttering_detection.inference_server import InferenceClient, MicroBatcher, create_server
+
+NUM_FEATURES = 4
+
+# Stand-in model: fails on batches of the wrong width, like a Keras model would
+def predict(X):
+    if X.shape[1] != NUM_FEATURES:
+        raise ValueError(f"model expects {NUM_FEATURES} features")
+    logits = np.stack((X.sum(axis=1), -X.sum(axis=1)), axis=1)
+    return np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+
+def test_vectors_submitted_together_share_a_batch():
+    batcher = MicroBatcher(predict, max_batch_size=16, max_delay=0.2)
+    X = np.random.default_rng(0).standard_normal((16, NUM_FEATURES)).astype(np.float32)
+    futures = [batcher.submit(features) for features in X]
+    results = np.array([future.result(timeout=5) for future in futures])
+
+    np.testing.assert_allclose(results, predict(X), rtol=1e-6)
+    assert batcher.stats()['batches'] == 1
+
+def test_a_bad_vector_only_fails_its_own_future():
+    batcher = MicroBatcher(predict, max_batch_size=8, max_delay=0.2)
+    good = batcher.submit(np.ones(NUM_FEATURES))
+    bad = batcher.submit(np.ones(NUM_FEATURES - 1))
+
+    np.testing.assert_allclose(good.result(timeout=5), predict(np.ones((1, NUM_FEATURES)))[0], rtol=1e-6)
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+
+def test_submit_rejects_malformed_vectors():
+    batcher = MicroBatcher(predict, num_features=NUM_FEATURES)
+    for features in (np.ones(NUM_FEATURES + 1), np.ones((2, NUM_FEATURES)), ['a'] * NUM_FEATURES):
+        with pytest.raises(ValueError):
+            batcher.submit(features)
+
+# Function to start a server on a free port; returns the server and its URL
+def start_server(predict, **kwargs):
+    server = create_server(predict, port=0, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# Function to POST a body to /predict; returns the HTTP status and the JSON response
+def post(url, body):
+    request = urllib.request.Request(url + '/predict', data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_concurrent_requests_with_a_bad_client():
+    server, url = start_server(predict, max_delay=0.05, num_features=NUM_FEATURES)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(lambda features: post(url, {'features': features}),
+                                          [[[1.0] * NUM_FEATURES]] * 7 + [[[1.0] * 10]]))
+        assert [status for status, response in responses] == [200] * 7 + [400]
+        assert InferenceClient(url).predict(np.ones(NUM_FEATURES)).shape == (1, 2)
+        assert post(url, {'vectors': []})[0] == 400
+        assert post(url, {'features': [{'a': 1}]})[0] == 400
+        assert InferenceClient(url).stats()['errors'] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_model_failures_are_server_errors():
+    def broken_predict(X):
+        raise RuntimeError("model crashed")
+
+    server, url = start_server(broken_predict, max_delay=0.01, num_features=NUM_FEATURES)
+    try:
+        status, response = post(url, {'features': [[1.0] * NUM_FEATURES] * 3})
+        assert status == 500 and 'model crashed' in response['error']
+        stats = InferenceClient(url).stats()
+        assert stats['errors'] >= 1 and stats['failed_vectors'] == 3 and stats['vectors'] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
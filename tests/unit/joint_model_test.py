@@ -0,0 +1,27 @@
+# joint_model_test.py
+
+import numpy as np
+import pytest
+
+from ai_models.nlp.intent_classification import EXAMPLE_INTENTS, EXAMPLE_TEXTS as EXAMPLE_INTENT_TEXTS
+from ai_models.nlp.sentiment_analysis import EXAMPLE_SENTIMENTS, EXAMPLE_TEXTS as EXAMPLE_SENTIMENT_TEXTS
+
+def test_trained_model_reloads_for_inference(tmp_path, monkeypatch):
+    pytest.importorskip('tensorflow')
+    from ai_models.nlp.joint_model import JointTextClassifier, train_joint_model
+
+    monkeypatch.chdir(tmp_path)  # the model and checkpoint are saved to the working directory
+    texts = EXAMPLE_INTENT_TEXTS + EXAMPLE_SENTIMENT_TEXTS
+    intents = EXAMPLE_INTENTS + [None] * len(EXAMPLE_SENTIMENT_TEXTS)
+    sentiments = [None] * len(EXAMPLE_INTENT_TEXTS) + EXAMPLE_SENTIMENTS
+    model, vectorizer = train_joint_model(texts, intents, sentiments, epochs=1, architecture='conv')
+
+    classifier = JointTextClassifier('joint_nlp_model.keras', 'joint_nlp_model.vocab.json')
+    probabilities = classifier.predict_proba(texts[:3])
+    expected = model.predict_on_batch(vectorizer.transform(texts[:3], length=vectorizer.max_length))
+    np.testing.assert_allclose(probabilities['intent'], expected[0], atol=1e-6)
+    np.testing.assert_allclose(probabilities['sentiment'], expected[1], atol=1e-6)
+
+    predictions = classifier.predict(texts[:3])
+    assert all(prediction['intent'] in set(EXAMPLE_INTENTS) for prediction in predictions)
+    assert all(prediction['sentiment'] in set(EXAMPLE_SENTIMENTS) for prediction in predictions)
@@ -0,0 +1,85 @@
+# localization_test.py
+
+import numpy as np
+
+from ai_models.stuttering_detection.localization import disfluency_events, window_features
+from ai_models.stuttering_detection.stutter_features import NUM_FRAME_FEATURES, aggregate_features
+
+# Per-frame features with large offsets and small spreads, like mel power
+def feature_frames(num_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = 10.0 ** rng.uniform(-3, 4, NUM_FRAME_FEATURES)
+    return (offsets[:, np.newaxis] * (1 + 0.01 * rng.standard_normal((NUM_FRAME_FEATURES, num_frames))))
+
+# Clip vector of one window computed directly from its frames
+def reference_window(frames, start, window_frames):
+    window = frames[:, start:start + window_frames]
+    return aggregate_features(np.mean(window, axis=1), np.std(window, axis=1))
+
+def test_windows_match_mean_and_std_of_their_frames():
+    frames = feature_frames(1000)
+
+    starts, window_frames, features = window_features(frames, window_frames=94, hop_frames=16)
+
+    assert window_frames == 94
+    expected = np.array([reference_window(frames, start, window_frames) for start in starts])
+    # Relative to the scale of every feature (stds near zero have no relative precision)
+    assert np.all(np.abs(features - expected) <= 1e-7 * np.abs(expected).max(axis=0))
+
+def test_last_window_is_aligned_with_the_end():
+    frames = feature_frames(1000)
+
+    starts, window_frames, features = window_features(frames, window_frames=94, hop_frames=16)
+
+    # 0, 16, ..., 896 leave frames 990-999 uncovered: one more window ends on the last frame
+    assert starts[-2] == 896 and starts[-1] == 1000 - 94
+    assert np.all(np.diff(starts) > 0)
+    np.testing.assert_allclose(features[-1], reference_window(frames, 906, 94), rtol=1e-7)
+
+def test_windows_that_fit_exactly_are_not_repeated():
+    starts, window_frames, features = window_features(feature_frames(110), window_frames=94, hop_frames=16)
+
+    np.testing.assert_array_equal(starts, [0, 16])
+
+def test_recordings_shorter_than_a_window_get_one_window():
+    frames = feature_frames(30)
+
+    starts, window_frames, features = window_features(frames, window_frames=94, hop_frames=16)
+
+    np.testing.assert_array_equal(starts, [0])
+    assert window_frames == 30
+    np.testing.assert_allclose(features, [reference_window(frames, 0, 30)], rtol=1e-7)
+
+# Function to build window probabilities for (fluent, block, repetition) from the
+# disfluency probability of every window and the disfluency class it favours
+def window_probabilities(disfluent, classes):
+    probabilities = np.zeros((len(disfluent), 3))
+    probabilities[:, 0] = 1 - np.asarray(disfluent)
+    probabilities[np.arange(len(disfluent)), classes] += disfluent
+    return probabilities
+
+def test_overlapping_disfluent_windows_merge_into_events():
+    # 1 s windows every 0.5 s
+    times = np.column_stack((np.arange(8) * 0.5, np.arange(8) * 0.5 + 1.0))
+    disfluent = [0.1, 0.8, 0.9, 0.2, 0.1, 0.1, 0.7, 0.1]
+    probabilities = window_probabilities(disfluent, [1, 1, 2, 1, 1, 1, 2, 1])
+
+    events = disfluency_events(times, probabilities, threshold=0.5, class_names=['fluent', 'block', 'repetition'])
+
+    assert [(event['start'], event['end']) for event in events] == [(0.5, 2.0), (3.0, 4.0)]
+    # Classes by their mean probability over the event's disfluent windows
+    assert [event['label'] for event in events] == ['repetition', 'repetition']
+    np.testing.assert_allclose([event['probability'] for event in events], [0.9, 0.7])
+
+def test_runs_separated_by_a_fluent_window_merge_when_their_windows_overlap():
+    times = np.column_stack((np.arange(5) * 0.5, np.arange(5) * 0.5 + 1.0))
+    probabilities = window_probabilities([0.9, 0.1, 0.9, 0.1, 0.1], [1, 1, 1, 1, 1])
+
+    events = disfluency_events(times, probabilities)
+
+    assert [(event['start'], event['end'], event['label']) for event in events] == [(0.0, 2.0, 1)]
+
+def test_no_disfluent_windows_give_no_events():
+    times = np.array([[0.0, 1.0], [0.5, 1.5]])
+
+    assert disfluency_events(times, window_probabilities([0.1, 0.4], [1, 2])) == []
@@ -0,0 +1,94 @@
+# profiling_test.py
+
+import logging
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from ai_models.profiling import Profiler
+
+def test_disabled_stages_are_the_shared_no_op():
+    profiler = Profiler()
+
+    assert profiler.stage('a') is profiler.stage('b')
+    with profiler.stage('a'):
+        pass
+    assert profiler.snapshot() == {}
+
+def test_from_env_options():
+    assert not Profiler.from_env('').enabled
+    assert not Profiler.from_env('0').enabled
+    profiler = Profiler.from_env('log, allocations')
+    assert profiler.enabled and profiler.log and profiler.allocations
+
+def test_exceptions_and_reported_failures_are_counted(caplog):
+    profiler = Profiler(enabled=True)
+
+    @profiler.profiled('decorated')
+    def fail():
+        raise RuntimeError("boom")
+
+    with profiler.stage('block'):
+        pass
+    with pytest.raises(KeyError):
+        with profiler.stage('block'):
+            raise KeyError('missing')
+    with pytest.raises(RuntimeError):
+        fail()
+    with caplog.at_level(logging.ERROR, logger='ai_models'):
+        profiler.failure('block', ValueError("bad file"), audio_file='a.wav')
+
+    snapshot = profiler.snapshot()
+    assert (snapshot['block']['calls'], snapshot['block']['failures']) == (2, 2)
+    assert (snapshot['decorated']['calls'], snapshot['decorated']['failures']) == (1, 1)
+    assert 'ValueError: bad file' in caplog.text and 'a.wav' in caplog.text
+
+def test_failures_are_logged_but_not_counted_while_disabled(caplog):
+    profiler = Profiler()
+    with caplog.at_level(logging.ERROR, logger='ai_models'):
+        profiler.failure('block', ValueError("bad file"))
+
+    assert profiler.snapshot() == {}
+    assert 'bad file' in caplog.text
+
+def test_prometheus_histogram_buckets_are_cumulative():
+    profiler = Profiler(enabled=True, buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        profiler.record('stage', seconds)
+
+    lines = profiler.render_prometheus().splitlines()
+    assert 'ai_models_stage_seconds_bucket{stage="stage",le="0.1"} 2' in lines
+    assert 'ai_models_stage_seconds_bucket{stage="stage",le="1"} 3' in lines
+    assert 'ai_models_stage_seconds_bucket{stage="stage",le="+Inf"} 4' in lines
+    assert 'ai_models_stage_seconds_count{stage="stage"} 4' in lines
+    assert 'ai_models_stage_seconds_sum{stage="stage"} 2.65' in lines
+    assert 'ai_models_stage_failures_total{stage="stage"} 0' in lines
+
+@pytest.fixture
+def tracing():
+    was_tracing = tracemalloc.is_tracing()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+def test_nested_allocation_peaks(tracing):
+    profiler = Profiler(enabled=True, allocations=True)
+    size = 4 * 1024 * 1024
+
+    with profiler.stage('outer'):
+        kept = np.ones(size, dtype=np.uint8)
+        with profiler.stage('inner'):
+            temporary = np.ones(2 * size, dtype=np.uint8)
+            del temporary
+        with profiler.stage('after'):
+            pass
+    del kept
+
+    snapshot = profiler.snapshot()
+    # The inner peak is folded into the outer stage, on top of what the outer stage kept
+    assert 2 * size <= snapshot['inner']['max_allocated_bytes'] < 2.1 * size
+    assert 3 * size <= snapshot['outer']['max_allocated_bytes'] < 3.1 * size
+    # A later sibling does not see the freed peak of the earlier one
+    assert snapshot['after']['max_allocated_bytes'] < 0.1 * size
+    assert 'ai_models_stage_allocated_bytes_total{stage="inner"}' in profiler.render_prometheus()
@@ -0,0 +1,41 @@
+# running_stats_test.py
+
+import numpy as np
+
+from ai_models.stuttering_detection.running_stats import RunningFeatureStats
+
+def aggregate(blocks, **kwargs):
+    stats = RunningFeatureStats(**kwargs)
+    for block in blocks:
+        stats.update(block)
+    return stats
+
+def test_short_clips_are_aggregated_exactly():
+    frames = np.random.default_rng(0).standard_normal((500, 4)) * [1, 10, 100, 1000] + [0, 5, -5, 1e4]
+    stats = aggregate(np.array_split(frames, 7), exact_max_frames=6000)
+
+    assert stats.exact()
+    expected = np.concatenate([np.mean(frames, axis=0), np.std(frames, axis=0),
+                               np.percentile(frames, 25, axis=0), np.percentile(frames, 75, axis=0)])
+    np.testing.assert_allclose(stats.result(), expected, rtol=1e-12)
+
+def test_long_clips_stream_moments_and_sketch_percentiles():
+    frames = np.random.default_rng(1).standard_normal((20000, 3)) * [1, 2, 3] + 1e3
+    stats = aggregate(np.array_split(frames, 40), exact_max_frames=1000, sketch_size=256)
+
+    assert not stats.exact()
+    result = stats.result().reshape(4, 3)
+    np.testing.assert_allclose(result[0], np.mean(frames, axis=0), rtol=1e-12)
+    np.testing.assert_allclose(result[1], np.std(frames, axis=0), rtol=1e-9)
+
+    # Sketched percentiles: compare their ranks, not their values
+    for q, row in zip((25, 75), result[2:]):
+        ranks = np.mean(frames <= row, axis=0)
+        np.testing.assert_allclose(ranks, q / 100, atol=0.03)
+
+def test_nan_columns_stay_nan():
+    frames = np.random.default_rng(2).standard_normal((3000, 2))
+    frames[10, 1] = np.nan
+    result = aggregate(np.array_split(frames, 6), exact_max_frames=100).result().reshape(4, 2)
+    assert np.all(np.isfinite(result[:, 0]))
+    assert np.all(np.isnan(result[:, 1]))
@@ -0,0 +1,55 @@
+# sequence_classifier_test.py
+
+import numpy as np
+import pytest
+
+from ai_models.stuttering_detection.sequence_classifier import (
+    downsample_frames, frame_times, length_batches, pad_batch,
+)
+
+NUM_FEATURES = 8
+
+def test_downsample_averages_groups_of_frames():
+    frames = np.arange(10, dtype=np.float64).reshape(5, 2)
+
+    np.testing.assert_array_equal(downsample_frames(frames, 2), [[1, 2], [5, 6], [8, 9]])
+    assert downsample_frames(frames, 1) is frames
+    np.testing.assert_allclose(frame_times(3, downsample=2, duration=0.15)[[0, -1]],
+                               [[0.0, 0.048], [0.112, 0.15]])
+
+def test_length_batches_group_similar_lengths():
+    lengths = [5, 40, 7, 38, 6, 41]
+
+    batches = length_batches(lengths, batch_size=3)
+    assert [sorted(lengths[i] for i in batch) for batch in batches] == [[5, 6, 7], [38, 40, 41]]
+    shuffled = length_batches(lengths, batch_size=3, shuffle=True, bucket_width=4, rng=np.random.default_rng(0))
+    assert sorted(sorted(lengths[i] for i in batch) for batch in shuffled) == [[5, 6, 7], [38, 40, 41]]
+
+    sequences = [np.ones((length, 2)) for length in lengths]
+    batch = pad_batch(sequences, batches[0])
+    assert batch.shape == (3, 7, 2) and batch[0, 5:].sum() == 0
+
+def test_trained_model_reloads_and_is_batch_invariant(tmp_path, monkeypatch):
+    pytest.importorskip('tensorflow')
+    from ai_models.stuttering_detection.sequence_classifier import (
+        SequenceInferencePipeline, train_sequence_classifier,
+    )
+
+    monkeypatch.chdir(tmp_path)  # the model and scaler are saved to the working directory
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 40, size=24)
+    labels = np.arange(24) % 2
+    sequences = [(rng.standard_normal((length, NUM_FEATURES)) + label).astype(np.float32)
+                 for length, label in zip(lengths, labels)]
+    train_sequence_classifier(sequences, labels, epochs=1, batch_size=8, architecture='fast_lstm')
+
+    pipeline = SequenceInferencePipeline(batch_size=8)
+    batched = pipeline.predict_proba(sequences)
+    alone = np.concatenate([pipeline.predict_proba([sequence]) for sequence in sequences])
+    assert batched.shape == (24, 2)
+    np.testing.assert_allclose(batched, alone, atol=1e-6)
+
+    # The clip probabilities are the mean of the frame probabilities
+    frames = pipeline.predict_frames(sequences[0])
+    assert frames.shape == (lengths[0], 2)
+    np.testing.assert_allclose(frames.mean(axis=0), alone[0], atol=1e-6)
@@ -0,0 +1,46 @@
+# streaming_test.py
+
+import numpy as np
+
+from ai_models.stuttering_detection.streaming import StreamingStutterDetector
+
+SAMPLE_RATE = 16000
+
+def speech_like_signal(seconds=2.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    y = 0.4 * np.sin(2 * np.pi * 150 * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2 + 0.02 * rng.standard_normal(len(t))
+    return (y * 32767).astype(np.int16)
+
+# Function to stream chunks through a detector whose "model" returns the clip vector itself
+def stream(chunks):
+    detector = StreamingStutterDetector(lambda X: X, window_seconds=1.0, min_seconds=0.5)
+    results = [detector.process_chunk(chunk) for chunk in chunks]
+    return detector, [result for result in results if result is not None]
+
+def split(data, sizes):
+    chunks, start = [], 0
+    while start < len(data):
+        size = sizes[len(chunks) % len(sizes)]
+        chunks.append(data[start:start + size])
+        start += size
+    return chunks
+
+def test_window_features_do_not_depend_on_chunk_sizes():
+    samples = speech_like_signal()
+    detector_20ms, results_20ms = stream(split(samples, [320]))
+    detector_mixed, results_mixed = stream(split(samples, [1600, 77, 900]))
+
+    assert detector_20ms.samples_seen == detector_mixed.samples_seen == len(samples)
+    np.testing.assert_allclose(results_mixed[-1]['probabilities'], results_20ms[-1]['probabilities'],
+                               rtol=1e-6, atol=1e-9)
+
+def test_odd_sized_byte_chunks_are_reassembled():
+    samples = speech_like_signal()
+    data = samples.astype('<i2').tobytes()
+    detector_bytes, results_bytes = stream(split(data, [101, 333, 7, 1000]))
+    detector_samples, results_samples = stream(split(samples, [640]))
+
+    assert detector_bytes.samples_seen == len(samples)
+    np.testing.assert_allclose(results_bytes[-1]['probabilities'], results_samples[-1]['probabilities'],
+                               rtol=1e-6, atol=1e-9)
@@ -0,0 +1,34 @@
+# stutter_classifier_test.py
+
+import librosa
+import numpy as np
+import soundfile
+
+from ai_models.stuttering_detection.stutter_classifier import extract_features
+from ai_models.stuttering_detection.stutter_features import FEATURE_GROUPS
+
+SAMPLE_RATE = 16000
+
+# Function to return the (start, end) columns of a feature group's mean and std in the clip vector
+def group_columns(group):
+    start = 0
+    for name, size in FEATURE_GROUPS:
+        if name == group:
+            return start, start + 2 * size
+        start += 2 * size
+
+def test_tonnetz_columns_keep_the_cqt_chroma_of_trained_classifiers(tmp_path):
+    t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+    y = 0.3 * np.sin(2 * np.pi * 196 * t) + 0.2 * np.sin(2 * np.pi * 247 * t) + 0.1 * np.sin(2 * np.pi * 294 * t)
+    path = str(tmp_path / 'chord.wav')
+    soundfile.write(path, y, SAMPLE_RATE, subtype='FLOAT')
+
+    features = extract_features(path)
+
+    # The original extraction: tonnetz of the CQT chroma, mean then std over frames
+    y, sr = librosa.load(path, sr=SAMPLE_RATE)
+    tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
+    start, end = group_columns('tonnetz')
+    np.testing.assert_allclose(features[start:end], np.concatenate((np.mean(tonnetz.T, axis=0),
+                                                                     np.std(tonnetz.T, axis=0))),
+                               rtol=1e-5, atol=1e-6)
@@ -0,0 +1,101 @@
+# text_classifier_test.py
+
+import numpy as np
+import pytest
+
+from ai_models.nlp.text_preprocessing import TextVectorizer
+
+TEXTS = [
+    "What's the weather like today?",
+    "Book a table for two at 7 pm",
+    "Play some relaxing music",
+    "Turn off the lights in the kitchen and the living room please",
+    "Tell me a joke",
+]
+
+def test_batches_are_padded_to_the_longest_text_rounded_up_to_the_bucket_size():
+    vectorizer = TextVectorizer(max_length=12, bucket_size=4).fit(TEXTS)
+
+    assert vectorizer.transform(["Tell me a joke"]).shape == (1, 4)
+    assert vectorizer.transform(["Play some relaxing music", "Book a table for two at 7 pm"]).shape == (2, 8)
+    # Capped at max_length, and truncated at the end
+    padded = vectorizer.transform([TEXTS[3]])
+    assert padded.shape == (1, 12)
+    np.testing.assert_array_equal(padded[0], vectorizer.texts_to_sequences([TEXTS[3]])[0][:12])
+    # An explicit length overrides the bucketing
+    assert vectorizer.transform(["Tell me a joke"], length=100).shape == (1, 100)
+
+def test_padding_keeps_the_token_ids_and_pads_at_the_end():
+    vectorizer = TextVectorizer(max_length=None, bucket_size=8).fit(TEXTS)
+    texts = ["Turn off the music", "Tell me a joke about the weather today", "unknown words"]
+
+    padded = vectorizer.transform(texts)
+    assert padded.shape == (3, 8)
+    for row, sequence in zip(padded, vectorizer.texts_to_sequences(texts)):
+        np.testing.assert_array_equal(row[:len(sequence)], sequence)
+        assert not row[len(sequence):].any()
+    # Unknown words map to the OOV token, which comes first
+    np.testing.assert_array_equal(padded[2, :2], [1, 1])
+
+def test_empty_batches_and_texts_pad_to_one_bucket():
+    vectorizer = TextVectorizer(bucket_size=8).fit(TEXTS)
+
+    assert vectorizer.transform([]).shape == (0, 8)
+    np.testing.assert_array_equal(vectorizer.transform(["", "!!"]), np.zeros((2, 8)))
+
+def test_saved_vocabulary_gives_the_same_token_ids(tmp_path):
+    vectorizer = TextVectorizer(num_words=10, labels=['a', 'b']).fit(TEXTS)
+    vectorizer.save(tmp_path / 'vocab.json')
+    loaded = TextVectorizer.load(tmp_path / 'vocab.json')
+
+    assert loaded.labels == ['a', 'b']
+    np.testing.assert_array_equal(loaded.transform(TEXTS), vectorizer.transform(TEXTS))
+
+@pytest.fixture(scope='module')
+def text_model(tmp_path_factory):
+    pytest.importorskip('tensorflow')
+    from ai_models.model_export import export_tflite
+    from ai_models.nlp.intent_classification import create_intent_classifier
+
+    directory = tmp_path_factory.mktemp('text_model')
+    vectorizer = TextVectorizer(labels=['one', 'two', 'three']).fit(TEXTS)
+    vectorizer.save(directory / 'model.vocab.json')
+    model = create_intent_classifier(vectorizer.vocab_size, 16, None, 3, architecture='conv')
+    model.save(directory / 'model.keras')
+    export_tflite(str(directory / 'model.keras'), str(directory / 'model.tflite'), quantization='none')
+    return directory
+
+def test_tflite_text_model_sees_the_whole_utterance(text_model):
+    from ai_models.lite_inference import LiteClassifier
+    from ai_models.nlp.text_classifier import TextClassifier
+
+    assert LiteClassifier(str(text_model / 'model.tflite')).input_shape == (1, None)
+    lite = TextClassifier(str(text_model / 'model.tflite'), str(text_model / 'model.vocab.json'))
+    keras = TextClassifier(str(text_model / 'model.keras'), str(text_model / 'model.vocab.json'))
+
+    # Texts that share their first word still get different outputs
+    texts = ["Turn off the lights", "Turn on the music", "Turn the table"] + TEXTS
+    probabilities = lite.predict_proba(texts)
+    assert len({row.tobytes() for row in probabilities}) == len(texts)
+    np.testing.assert_allclose(probabilities, keras.predict_proba(texts), atol=1e-5)
+    # Single texts and batches give the same outputs
+    np.testing.assert_allclose(lite.predict_proba([TEXTS[3]]), keras.predict_proba([TEXTS[3]]), atol=1e-5)
+    lite.cache = type(lite.cache)(0)
+    keras.cache = type(keras.cache)(0)
+    np.testing.assert_allclose(lite.predict_proba(texts[:3]), keras.predict_proba(texts[:3]), atol=1e-5)
+
+@pytest.mark.parametrize('model_file', ['model.keras', 'model.tflite'])
+def test_predictions_do_not_depend_on_the_batch(text_model, model_file):
+    from ai_models.nlp.text_classifier import TextClassifier
+
+    def classifier():
+        return TextClassifier(str(text_model / model_file), str(text_model / 'model.vocab.json'), cache_size=0)
+
+    alone = classifier().predict_proba(["Tell me a joke"])
+    with_a_long_text = classifier().predict_proba([TEXTS[3], "Tell me a joke", "Play some relaxing music"])
+    np.testing.assert_allclose(with_a_long_text[1], alone[0], atol=1e-6)
+
+    # Padded to the training length, whatever the bucket length of the batch
+    model = classifier()
+    padded = model.vectorizer.transform(["Tell me a joke"], length=model.vectorizer.max_length)
+    np.testing.assert_allclose(alone, model.model.predict_on_batch(padded), atol=1e-6)
@@ -0,0 +1,77 @@
+# voice_activity_test.py
+
+import numpy as np
+import soundfile
+
+from ai_models.stuttering_detection.stutter_classifier import _signal_frame_features, extract_features
+from ai_models.stuttering_detection.stutter_features import aggregate_features
+from ai_models.stuttering_detection.voice_activity import detect_speech, frames_to_segments
+
+SAMPLE_RATE = 16000
+HOP_SECONDS = 160 / SAMPLE_RATE
+
+# Function to build a signal of tone bursts, given as (start, end) seconds, over a
+# -80 dB noise floor
+def tone_bursts(bursts, seconds):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    y = 1e-4 * rng.standard_normal(len(t))
+    for start, end in bursts:
+        inside = (t >= start) & (t < end)
+        y[inside] += 0.3 * np.sin(2 * np.pi * 220 * t[inside])
+    return y.astype(np.float32)
+
+def test_segments_are_padded_around_the_speech():
+    segments = detect_speech(tone_bursts([(1.0, 2.0)], 3.0), SAMPLE_RATE, padding=0.1)
+
+    assert segments.shape == (1, 2)
+    start, end = segments[0]
+    # Frame boundaries are one hop apart; a frame overlapping the burst edge may count
+    assert abs(start - 0.9) <= 2 * HOP_SECONDS + 0.025
+    assert abs(end - 2.1) <= 2 * HOP_SECONDS + 0.025
+
+def test_short_pauses_are_merged_and_long_pauses_split():
+    y = tone_bursts([(0.5, 1.0), (1.2, 1.6), (2.5, 3.0)], 3.5)
+
+    segments = detect_speech(y, SAMPLE_RATE, min_silence=0.3, padding=0.0)
+
+    assert len(segments) == 2
+    assert segments[0][0] < 0.55 and segments[0][1] > 1.55
+    assert segments[1][0] > 2.4
+
+def test_frames_to_segments_drops_short_runs_and_clips_the_padding():
+    is_speech = np.zeros(100, dtype=bool)
+    is_speech[0:30] = True    # at the start: padding is clipped at 0
+    is_speech[50:52] = True   # shorter than min_speech: dropped
+    is_speech[80:100] = True  # at the end: padding is clipped at the duration
+
+    segments = frames_to_segments(is_speech, sample_rate=100, frame_length=1, hop_length=1,
+                                  min_speech=0.1, min_silence=0.05, padding=0.05, duration=1.0)
+
+    np.testing.assert_allclose(segments, [[0.0, 0.35], [0.75, 1.0]])
+
+def test_silent_recordings_have_no_segments():
+    assert detect_speech(tone_bursts([], 2.0), SAMPLE_RATE).shape == (0, 2)
+    assert detect_speech(np.zeros(100, dtype=np.float32), SAMPLE_RATE).shape == (0, 2)
+
+def test_vad_features_fall_back_to_the_whole_recording(tmp_path):
+    path = str(tmp_path / 'silence.wav')
+    soundfile.write(path, tone_bursts([], 1.0), SAMPLE_RATE, subtype='FLOAT')
+
+    np.testing.assert_array_equal(extract_features(path, vad=True), extract_features(path))
+
+def test_vad_features_only_aggregate_the_speech(tmp_path):
+    y = tone_bursts([(1.0, 2.0)], 3.0)
+    path = str(tmp_path / 'burst.wav')
+    soundfile.write(path, y, SAMPLE_RATE, subtype='FLOAT')
+
+    # vad=False is the whole-recording aggregate, as before voice activity detection
+    frames = _signal_frame_features(y, SAMPLE_RATE)
+    whole = aggregate_features(np.mean(frames, axis=1), np.std(frames, axis=1))
+    np.testing.assert_allclose(extract_features(path), whole, rtol=1e-6)
+
+    (start, end), = detect_speech(y, SAMPLE_RATE)
+    frames = _signal_frame_features(y[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], SAMPLE_RATE)
+    speech = aggregate_features(np.mean(frames, axis=1), np.std(frames, axis=1))
+    np.testing.assert_allclose(extract_features(path, vad=True), speech, rtol=1e-6)
+    assert not np.allclose(speech, whole)